@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the cutting of a large upload.json.
+
+Compare the time and the peak memory of the previous implementation of
+``utils.cutting_upload``, which loads the whole manifest, with the current
+streaming one, on a synthetic manifest. Every implementation runs in its
+own process so the peak memory of one does not hide the other.
+
+Usage:
+    python help/benchmarks/cutting_upload_benchmark.py [entry_count] [max_resources_number]
+
+"""
+
+# Import built-in modules
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Import local modules
+from rayvision_sync.manifest import AssetWriter
+from rayvision_sync.utils import cutting_upload
+from rayvision_sync.utils import json_load
+from rayvision_sync.utils import write_json
+
+
+def legacy_cutting_upload(upload_path, max_resources_number, after_cutting_position):
+    """The previous implementation of ``cutting_upload``."""
+    upload_info = json_load(upload_path)
+    asset = upload_info.get("asset", [])
+    if max_resources_number >= len(asset):
+        return [upload_path]
+    count = 1
+    cut_json_pool = []
+    for per_index in range(0, len(asset) + 1, max_resources_number):
+        cut_info = {"asset": asset[per_index:per_index + max_resources_number]}
+        to_path = os.path.normpath(os.path.join(after_cutting_position, "upload_{}.json".format(count)))
+        write_json(to_path, cut_info)
+        count += 1
+        cut_json_pool.append(to_path)
+    return cut_json_pool
+
+
+def create_manifest(upload_path, entry_count):
+    """Write a synthetic upload.json."""
+    with AssetWriter(upload_path) as writer:
+        for index in range(entry_count):
+            local = "D:/project/scene_%04d/textures/texture_%08d.exr" % (index // 10000, index)
+            writer.write({"local": local, "server": "/" + local.replace(":", "")})
+
+
+def run_one(name, upload_path, max_resources_number):
+    """Cut the manifest once and print the time and the peak memory."""
+    output_dir = tempfile.mkdtemp()
+    try:
+        start = time.time()
+        if name == "legacy":
+            pool = legacy_cutting_upload(upload_path, max_resources_number, output_dir)
+        else:
+            pool = cutting_upload(upload_path, max_resources_number, output_dir)
+        elapsed = time.time() - start
+    finally:
+        shutil.rmtree(output_dir)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    print("%-10s %8.1f s %10.0f MB peak RSS %6s chunks" % (name, elapsed, peak, len(pool)))
+
+
+def main():
+    """Create the manifest and cut it with every implementation."""
+    entry_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000000
+    max_resources_number = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    work_dir = tempfile.mkdtemp()
+    try:
+        upload_path = os.path.join(work_dir, "upload.json")
+        create_manifest(upload_path, entry_count)
+        print("%s entries, %.0f MB manifest, %s entries per chunk" % (
+            entry_count, os.path.getsize(upload_path) / 1024.0 / 1024.0, max_resources_number))
+        for name in ("legacy", "streaming"):
+            subprocess.check_call([sys.executable, __file__, "--run", name, upload_path,
+                                   str(max_resources_number)])
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        run_one(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+    else:
+        main()
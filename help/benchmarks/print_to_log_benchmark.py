@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the parsing of the transmitter output.
+
+Compare the lines per second of the previous line-by-line implementation of
+``utils.print_to_log`` with the current one, on synthetic transmitter
+output. Redis is simulated with a fixed round trip of 0.1 ms.
+
+Usage, from the root of the repository so rayvision_sync is importable:
+    PYTHONPATH=. python help/benchmarks/print_to_log_benchmark.py [line_count]
+
+"""
+
+# Import built-in modules
+import io
+import re
+import sys
+import time
+
+# Import local modules
+from rayvision_sync.utils import print_to_log
+from rayvision_sync.utils import str2unicode
+
+
+class FakeProcess(object):
+    """Stand-in for ``subprocess.Popen`` reading from memory."""
+
+    def __init__(self, data):
+        self.stdout = io.BytesIO(data)
+
+
+class NullRedis(object):
+    """Redis stand-in, every round trip costs ``ROUND_TRIP`` seconds."""
+
+    ROUND_TRIP = 0.0001
+
+    def hset(self, *args, **kwargs):
+        """Discard the record after one round trip."""
+        time.sleep(self.ROUND_TRIP)
+
+    def pipeline(self, transaction=True):
+        """Get a pipeline, the round trip is paid on ``execute``."""
+        return NullPipeline()
+
+
+class NullPipeline(object):
+    """Pipeline of ``NullRedis``."""
+
+    def hset(self, *args, **kwargs):
+        """Queue the command."""
+
+    def execute(self):
+        """Send the queued commands in one round trip."""
+        time.sleep(NullRedis.ROUND_TRIP)
+
+
+def legacy_print_to_log(cmd, logger, is_record=False, redis_obj=None):
+    """The previous implementation of ``print_to_log``."""
+    err_messages = []
+    while True:
+        result_line = cmd.stdout.readline()
+        if result_line:
+            result_line = result_line.strip()
+            if result_line:
+                result_line = str2unicode(result_line)
+                if is_record:
+                    complite = re.compile(r".*?upload file done.*?\((.*?)\).*")
+                    obj = re.search(complite, result_line)
+                    if obj:
+                        redis_obj.hset("upload_done", obj.group(1).strip(), int(time.time()))
+                if logger:
+                    logger(result_line)
+                    if ('upload file fail' in result_line or
+                            ('get path' in result_line and
+                             'info failed' in result_line)):
+                        err_messages.append(result_line)
+        else:
+            break
+    return err_messages
+
+
+def make_output(line_count):
+    """Build synthetic transmitter output, mostly "upload file done" lines."""
+    lines = []
+    for index in range(line_count):
+        if index % 1000 == 0:
+            lines.append(u"upload file fail (D:/project/cache/file_%s.bgeo)" % index)
+        elif index % 100 == 0:
+            lines.append(u"progress: %s%%" % (index * 100 // line_count))
+        else:
+            lines.append(u"[INFO] upload file done (D:/project/cache/file_%s.bgeo)" % index)
+    return u"\n".join(lines).encode("utf-8")
+
+
+def measure(func, data, line_count, is_record):
+    """Get the lines per second of one implementation."""
+    start = time.time()
+    func(FakeProcess(data), lambda *args: None, is_record=is_record,
+         redis_obj=NullRedis())
+    return line_count / (time.time() - start)
+
+
+def main():
+    """Run the benchmark."""
+    line_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    data = make_output(line_count)
+    print("lines: %s" % line_count)
+    for is_record in (False, True):
+        before = measure(legacy_print_to_log, data, line_count, is_record)
+        after = measure(print_to_log, data, line_count, is_record)
+        print("is_record=%s before: %.0f lines/s, after: %.0f lines/s" % (
+            is_record, before, after))
+
+
+if __name__ == "__main__":
+    main()
@@ -14,3 +14,16 @@ download = RayvisionDownload(api)
 # download.download(download_filename_format="true", server_path="40112885_muti_layer_test")
 # download.auto_download([41372307], download_filename_format="false")
 # download.auto_download_after_task_completed([41372307], download_filename_format="true", engine_type="raysync")
+
+# Download the outputs of several tasks and layers in parallel, the failed
+# outputs are reported by DownloadFailed.failed_outputs.
+# download.auto_download_after_task_completed([41372307, 41372308], workers=10)
+
+# Check every task when its next frame is expected instead of every sleep_time,
+# the waiting tasks are checked less and less often.
+# from rayvision_sync.polling import PollScheduler
+# download.auto_download([41372307, 41372308], poll_scheduler=PollScheduler(min_interval=2, max_interval=300))
+
+# auto_download only starts a transmitter for the tasks with new frames since
+# their last download, and once more when they end. Download every cycle with:
+# download.auto_download([41372307], skip_unchanged=False)
@@ -47,14 +47,60 @@ custom_info_to_upload = [
 # upload_pool = cutting_upload(r"D:\test\test_upload\1586250829\upload.json", max_resources_number=800)
 # print(upload_pool)
 
+# cut upload into chunks of about the same size, one per upload thread
+# upload_pool = cutting_upload(r"D:\test\test_upload\1586250829\upload.json", by_size=True, pool_size=20)
+
 
 # Multi-thread upload
 # UPLOAD.multi_thread_upload(upload_pool, thread_num=20)
 
 # Thread pool upload
 # UPLOAD.thread_pool_upload(upload_pool, pool_size=20)
+
+# Thread pool upload adapting the number of threads to the throughput
+# reports = UPLOAD.thread_pool_upload(upload_pool, pool_size=8, adaptive=True, max_workers=40)
+# print([report for report in reports if not report.success])
 #
 
+# Upload from a work queue instead of cutting then uploading with a thread pool
+# report = UPLOAD.queue_upload(r"D:\test\test_upload\1586250829\upload.json", workers=20)
+# print(report.failed_files)
+
+# Upload with many transmitters read from one thread
+# UPLOAD.supervised_upload(upload_pool, max_processes=50)
+
+# Only upload the files changed since the last upload, force=True uploads them all again
+# UPLOAD = RayvisionUpload(api, upload_index=True)
+# UPLOAD.upload_asset(r"D:\test\test_upload\1586250829\upload.json", force=False)
+# UPLOAD.upload_index.invalidate([r"D:\project\scene.mb"])
+
+# Fingerprint the assets of an upload.json, pip install xxhash for the fastest hashing
+# from rayvision_sync.fingerprint import FingerprintStore, fingerprint_asset
+# report = fingerprint_asset(r"D:\test\test_upload\1586250829\upload.json",
+#                            FingerprintStore(r"D:\renderfarm_sdk\fingerprint.db"), workers=16)
+# print("%s files hashed at %.2f GB/s" % (report.hashed_files, report.throughput))
+
+# Stat the files first: folders are expanded and missing files dropped before the transmitter runs
+# UPLOAD.upload_asset(r"D:\test\test_upload\1586250829\upload.json", preflight=True)
+# from rayvision_sync.preflight import preflight_asset
+# report = preflight_asset(r"D:\test\test_upload\1586250829\upload.json")
+# upload_pool = cutting_upload(report.upload_json_path, by_size=True, pool_size=10)
+
+# Upload the configuration files and the assets at the same time
+# UPLOAD.upload(task_id="41235091", task_json_path=r"C:\workspace\work\task.json",
+#               tips_json_path=r"C:\workspace\work\tips.json", asset_json_path=r"C:\workspace\work\asset.json",
+#               upload_json_path=r"C:\workspace\work\upload.json", pipelined=True)
+
+# Share one lazily resolved context between the transfers of the same api
+# from rayvision_sync.context import TransferContext
+# context = TransferContext(api)
+# UPLOAD = RayvisionUpload(api, context=context)
+# DOWNLOAD = RayvisionDownload(api, context=context)
+
+# Keep the transfer lines and the Raysync key on disk for the next processes
+# from rayvision_sync.bootstrap_cache import BootstrapCache
+# context = TransferContext(api, bootstrap_cache=BootstrapCache(ttl=3600))
+
 upload_method = 2
 if upload_method == 1:
 #     # step4.1:Json files are uploaded in conjunction with CG resources
@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+"""Asyncio facade of the upload and download.
+
+The transmitter is started with ``asyncio.create_subprocess_exec`` and the
+Raysync tasks are polled with ``asyncio.sleep``, so hundreds of transfers
+are multiplexed on one event loop instead of one thread per transfer.
+Cancelling a transfer kills its transmitter or stops polling its Raysync
+task. The requests to the API and to the local Raysync service are short
+and still use ``requests``, they run in the default executor, like every
+call that can resolve the lazy transfer context.
+
+"""
+
+# Import built-in modules
+import asyncio
+import functools
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+
+# Import local modules
+from rayvision_sync.constants import COMMAND_NOT_FOUND_CODE
+from rayvision_sync.exception import DownloadFailed
+from rayvision_sync.exception import UnsupportedEngineType
+from rayvision_sync.output_parser import TransmitterOutputParser
+from rayvision_sync.rayvision_raysync.constants import STATU_SLEEP
+from rayvision_sync.rayvision_raysync.exception import TransferTimeout
+from rayvision_sync.utils import check_upload_result
+from rayvision_sync.utils import handle_cmd_result
+from rayvision_sync.utils import str2unicode
+
+# Maximum length of one line of the transmitter output.
+STREAM_LIMIT = 1024 * 1024
+
+
+async def run_cmd_async(argv, print_log=True, flag=None, logger=None, parser=None, answer="y", env=None):
+    """Run the transmitter as an asyncio subprocess.
+
+    Args:
+        argv (list): Transmitter executable followed by its arguments.
+        print_log (bool, optional): Print log, True: print, False: not print.
+        flag (bool, optional): default is None.
+        logger (logging, optional): Log object.
+        parser (TransmitterOutputParser, optional): Parser of the output.
+        answer (str, optional): Written to the stdin of the transmitter.
+        env (dict, optional): Environment of the process.
+
+    Returns:
+        int: Status code.
+
+    """
+    logger = logger or logging.getLogger(__name__)
+    log = logger.info if print_log else logger.debug
+    log(u'cmd...%s', subprocess.list2cmdline([str2unicode(arg) for arg in argv]))
+    parser = parser or TransmitterOutputParser()
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT, env=env, limit=STREAM_LIMIT)
+    except OSError as err:
+        return handle_cmd_result(flag, COMMAND_NOT_FOUND_CODE, [str(err)], log)
+
+    if answer:
+        process.stdin.write((answer + "\n").encode("utf-8"))
+    process.stdin.close()
+    try:
+        while True:
+            line = await process.stdout.readline()
+            if not line:
+                break
+            event = parser.parse_line(line)
+            if event is not None:
+                log(event.line)
+        await process.wait()
+    except asyncio.CancelledError:
+        if process.returncode is None:
+            process.kill()
+            await asyncio.shield(process.wait())
+        raise
+    return handle_cmd_result(flag, process.returncode, parser.errors, log)
+
+
+class _AsyncTransferBase(object):
+    """Shared helpers of the async facades."""
+
+    def __init__(self, transfer, max_concurrency=None):
+        """Initialize the facade.
+
+        Args:
+            transfer (RayvisionUpload or RayvisionDownload): Synchronous
+                object providing the configuration and the engines.
+            max_concurrency (int, optional): Maximum number of transfers
+                running at the same time, no limit by default.
+
+        """
+        self._transfer = transfer
+        self.logger = transfer.logger
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._raysync_lock = None
+
+    @staticmethod
+    async def _run_in_executor(func, *args, **kwargs):
+        """Run a blocking call in the default executor."""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    def _limit(self):
+        """Get the semaphore bounding the running transfers."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency or 2 ** 31)
+        return self._semaphore
+
+    async def _run_cmd(self, argv, **kwargs):
+        """Run one transmitter within the concurrency limit."""
+        async with self._limit():
+            # The first call prepares the transmitter runtime on the disk.
+            env = await self._run_in_executor(self._transfer.trans.runtime.env)
+            return await run_cmd_async(argv, logger=self.logger, env=env, **kwargs)
+
+    async def _start_raysync(self, max_timeout=18000, **params):
+        """Create a Raysync task and poll its status until it ends.
+
+        Same as ``RayvisionTransferRaysync.start_transfer``.
+
+        Returns:
+            int: Status code.
+
+        """
+        engine = self._transfer.raysync_engine
+        if self._raysync_lock is None:
+            self._raysync_lock = asyncio.Lock()
+        async with self._limit():
+            # The service settings are global, create the tasks one by one.
+            async with self._raysync_lock:
+                transfer_task_id = await self._run_in_executor(engine.prepare_transfer, **params)
+            polls = 0
+            while True:
+                if polls >= max_timeout / STATU_SLEEP:
+                    raise TransferTimeout(
+                        "Transmission timeout! The maximum transmission time is 5 hours by default!")
+                polls += 1
+                await asyncio.sleep(STATU_SLEEP)
+                result_code = await self._run_in_executor(
+                    engine.check_task_status, transfer_task_id,
+                    params.get("failed_key", params.get("task_id")), params.get("task_type"))
+                if result_code is not None:
+                    return result_code
+
+    @staticmethod
+    def _check_engine_type(engine_type):
+        """Raise for an unsupported engine."""
+        if engine_type not in ("aspera", "raysyncproxy"):
+            msg = "{} is not a supported transport engine, " \
+                  "currently only support 'aspera' and 'raysyncproxy'".format(engine_type)
+            raise UnsupportedEngineType(msg)
+
+
+class AsyncRayvisionUpload(_AsyncTransferBase):
+    """Upload configuration files and asset files on an event loop.
+
+    Examples::
+
+        upload = AsyncRayvisionUpload(RayvisionUpload(api), max_concurrency=50)
+        await asyncio.gather(*[upload.upload_asset(path) for path in upload_pool])
+
+    """
+
+    async def upload(self, task_id, task_json_path, tips_json_path, asset_json_path, upload_json_path,
+                     max_speed=None, transmit_type="upload_json", engine_type="aspera", server_ip=None,
+                     server_port=None, network_mode=0, proxy_ip=None, proxy_port=None, upload_num=2):
+        """Upload the configuration files, then the assets.
+
+        The arguments are the same as ``RayvisionUpload.upload``.
+
+        Returns:
+            bool: True is success, False is failure.
+
+        Raises:
+            RayvisionError: The upload of the assets failed.
+
+        """
+        config_file_list = [task_json_path, tips_json_path, asset_json_path, upload_json_path]
+        result_config = await self.upload_config(
+            task_id, config_file_list, max_speed=max_speed, engine_type=engine_type, server_ip=server_ip,
+            server_port=server_port, network_mode=network_mode, proxy_ip=proxy_ip, proxy_port=proxy_port,
+            upload_num=upload_num)
+        if not result_config:
+            return False
+        return await self.upload_asset(
+            upload_json_path, max_speed=max_speed, transmit_type=transmit_type, engine_type=engine_type,
+            server_ip=server_ip, server_port=server_port, network_mode=network_mode, proxy_ip=proxy_ip,
+            proxy_port=proxy_port, upload_num=upload_num)
+
+    async def upload_config(self, task_id, config_file_list, max_speed=None, engine_type="aspera",
+                            server_ip=None, server_port=None, network_mode=0, proxy_ip=None, proxy_port=None,
+                            upload_num=2):
+        """Upload the configuration files.
+
+        The arguments are the same as ``RayvisionUpload.upload_config``.
+
+        Returns:
+            bool: True is success, False is failure.
+
+        """
+        self._check_engine_type(engine_type)
+        upload = self._transfer
+        max_speed = max_speed if max_speed is not None else "1048576"
+        work_dir = tempfile.mkdtemp(prefix="rayvision_config_")
+        try:
+            config_json_path = await self._run_in_executor(upload.config_upload_json, task_id, config_file_list,
+                                                           work_dir)
+            if config_json_path is None:
+                return True
+            if engine_type == "aspera":
+                cmd = await self._run_in_executor(upload.config_cmd, config_json_path, max_speed, engine_type,
+                                                  server_ip, server_port, network_mode)
+                result = await self._run_cmd(cmd, flag=True)
+            else:
+                result = await self._start_raysync(**await self._run_in_executor(
+                    upload.config_raysync_params, task_id, config_json_path, max_speed, server_ip, server_port,
+                    network_mode, proxy_ip, proxy_port, upload_num))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        if result:
+            self.logger.info('%s upload failed, status code is %s', config_file_list, result)
+            return False
+        return True
+
+    async def upload_asset(self, upload_json_path, max_speed=None, is_db=True, engine_type="aspera",
+                           server_ip=None, server_port=None, transmit_type="upload_json", network_mode=0,
+                           proxy_ip=None, proxy_port=None, upload_num=2):
+        """Upload the assets of an upload.json.
+
+        The arguments are the same as ``RayvisionUpload.upload_asset``, the
+        failed transfers are retried with its ``retry_policy``. Unlike the
+        synchronous upload, every attempt uploads the whole upload.json:
+        the upload index, the pre-flight and the retry of the files not
+        done only are not applied.
+
+        Returns:
+            bool: True is success.
+
+        Raises:
+            RayvisionError: The upload failed, see ``utils.check_upload_result``.
+
+        """
+        self._check_engine_type(engine_type)
+        upload = self._transfer
+        max_speed = max_speed if max_speed is not None else "1048576"
+        main_input_bid, main_user_id = await self._run_in_executor(upload.share_info.resolve)
+        if engine_type == "aspera":
+            cmd = await self._run_in_executor(
+                upload.asset_cmd, upload_json_path, max_speed, is_db, engine_type, server_ip, server_port,
+                transmit_type, network_mode, main_input_bid, main_user_id)
+        else:
+            params = await self._run_in_executor(
+                upload.asset_raysync_params, upload_json_path, max_speed, server_ip, server_port, network_mode,
+                proxy_ip, proxy_port, upload_num, main_input_bid, main_user_id)
+        policy = upload.retry_policy
+        start = policy.clock()
+        attempt = 0
+        while True:
+            attempt += 1
+            if engine_type == "aspera":
+                result = await self._run_cmd(cmd, flag=True)
+            else:
+                result = await self._start_raysync(**params)
+            if result == 0:
+                return True
+            delay = policy.retry_delay(result, attempt, start)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+        await self._run_in_executor(upload.context.transfer_failed, result)
+        return check_upload_result(result)
+
+
+class AsyncRayvisionDownload(_AsyncTransferBase):
+    """Download the task outputs on an event loop.
+
+    Examples::
+
+        download = AsyncRayvisionDownload(RayvisionDownload(api), max_concurrency=20)
+        await asyncio.gather(*[download.download([task_id]) for task_id in task_id_list])
+
+    """
+
+    async def download(self, task_id_list=None, max_speed=None, print_log=True, download_filename_format="true",
+                       local_path=None, server_path=None, engine_type="aspera", server_ip=None, server_port=None,
+                       network_mode=0, proxy_ip=None, proxy_port=None, enable_hash=False, asset=False,
+                       download_num=2):
+        """Download the outputs of the tasks.
+
+        The arguments are the same as ``RayvisionDownload.download``.
+
+        Returns:
+            bool: True is success.
+
+        Raises:
+            DownloadFailed: An output failed to download.
+
+        """
+        self._check_engine_type(engine_type)
+        download = self._transfer
+        if asset and not local_path:
+            local_path = os.path.dirname(server_path)
+        download.check_params(task_id_list, server_path)
+        local_path = str2unicode(download._check_local_path(local_path))
+        if not os.path.exists(local_path):
+            os.makedirs(local_path)
+        max_speed = max_speed if max_speed is not None else "1048576"
+        output_file_names = await self._run_in_executor(download.output_file_names, task_id_list, server_path)
+        for output_file_name in output_file_names:
+            if asset:
+                bid, user_id = await self._run_in_executor(download.share_info.resolve)
+            else:
+                bid, user_id = output_file_name["bid"], output_file_name["user_id"]
+            if engine_type == "aspera":
+                cmd = await self._run_in_executor(
+                    download.output_cmd, output_file_name, local_path, max_speed, download_filename_format,
+                    server_ip, server_port, network_mode, bid, user_id)
+                transfer_code = await self._run_cmd(cmd, print_log=print_log)
+            else:
+                transfer_code = await self._start_raysync(**await self._run_in_executor(
+                    download.output_raysync_params, output_file_name, task_id_list, local_path, max_speed,
+                    download_filename_format, server_ip, server_port, network_mode, proxy_ip, proxy_port,
+                    enable_hash, asset, download_num, bid, user_id))
+            if transfer_code != 0:
+                raise DownloadFailed('%s Download failed' % output_file_name)
+        return True
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""Share one bandwidth budget between concurrent transfers.
+
+Every transfer holds a ``BandwidthLease`` while it runs. The coordinator
+splits its total speed between the active leases, a transfer asking for
+less than its share keeps its own limit and leaves the rest to the others.
+The shares are computed again whenever a transfer starts or ends:
+
+* a transmitter reads its speed once, new shares apply to the transmitters
+  started afterwards;
+* the Raysync client has one speed for all its tasks, it is set live with
+  ``set_transfer_speed`` to the sum of the shares of its tasks.
+
+All speeds are in KB/S, like ``max_speed``.
+
+"""
+
+# Import built-in modules
+import logging
+import threading
+
+DEFAULT_SPEED = 1048576
+
+
+class BandwidthLease(object):
+    """Share of the bandwidth held by one transfer."""
+
+    def __init__(self, coordinator, max_speed=None, engine=None, network_mode=0):
+        """Initialize the lease.
+
+        Args:
+            coordinator (BandwidthCoordinator): Owner of the lease, None for
+                a fixed speed.
+            max_speed (int or str, optional): Speed asked by the transfer.
+            engine (RayvisionTransferRaysync, optional): Raysync client of
+                the transfer, None for a transmitter.
+            network_mode (int): Network mode of the transfer.
+
+        """
+        self.coordinator = coordinator
+        self.max_speed = int(max_speed) if max_speed is not None else None
+        self.engine = engine
+        self.network_mode = network_mode
+        self.share = self.max_speed or DEFAULT_SPEED
+
+    @property
+    def speed(self):
+        """str: Speed to pass to the transmitter, in KB/S."""
+        return str(int(self.share))
+
+    @property
+    def engine_speed(self):
+        """str: Speed to set on the Raysync client of the lease, in KB/S."""
+        if self.coordinator is None or self.engine is None:
+            return self.speed
+        return str(int(self.coordinator.engine_speed(self.engine)))
+
+    def release(self):
+        """Give the share back."""
+        if self.coordinator is not None:
+            self.coordinator.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class BandwidthCoordinator(object):
+    """Split a total speed between the active transfers.
+
+    Examples::
+
+        bandwidth = BandwidthCoordinator(total_speed=102400)
+        upload = RayvisionUpload(api, bandwidth=bandwidth)
+        download = RayvisionDownload(api, bandwidth=bandwidth)
+
+    """
+
+    def __init__(self, total_speed, min_speed=1024, logger=None):
+        """Initialize the coordinator.
+
+        Args:
+            total_speed (int): Speed shared by all the transfers, in KB/S.
+            min_speed (int): Lowest share of one transfer, in KB/S, a
+                transfer asking for less keeps its own limit. It is
+                lowered to an equal share when the transfers are too many
+                to get it, the shares never exceed ``total_speed``.
+            logger (logging.Logger, optional): Log object.
+
+        """
+        self.total_speed = int(total_speed)
+        self.min_speed = int(min_speed)
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._push_lock = threading.Lock()
+        self._leases = []
+
+    def acquire(self, max_speed=None, engine=None, network_mode=0):
+        """Start a transfer.
+
+        Args:
+            max_speed (int or str, optional): Speed asked by the transfer,
+                no limit but the total by default.
+            engine (RayvisionTransferRaysync, optional): Raysync client of
+                the transfer, None for a transmitter.
+            network_mode (int): Network mode of the transfer.
+
+        Returns:
+            BandwidthLease: Share of the transfer, release it at the end.
+
+        """
+        lease = BandwidthLease(self, max_speed, engine, network_mode)
+        with self._lock:
+            self._leases.append(lease)
+            self._rebalance()
+        self._push()
+        return lease
+
+    def release(self, lease):
+        """End a transfer."""
+        with self._lock:
+            if lease not in self._leases:
+                return
+            self._leases.remove(lease)
+            self._rebalance()
+        self._push()
+
+    @property
+    def active(self):
+        """int: Number of active transfers."""
+        return len(self._leases)
+
+    def engine_speed(self, engine):
+        """Get the sum of the shares of the tasks of a Raysync client."""
+        with self._lock:
+            return sum(lease.share for lease in self._leases if lease.engine is engine)
+
+    def _rebalance(self):
+        """Split the total speed, the smallest asks are served first."""
+        remaining = float(self.total_speed)
+        leases = sorted(self._leases, key=lambda lease: lease.max_speed or float("inf"))
+        if not leases:
+            return
+        min_speed = min(self.min_speed, self.total_speed // len(leases))
+        for index, lease in enumerate(leases):
+            share = max(remaining / (len(leases) - index), min_speed)
+            if lease.max_speed is not None:
+                # The speed asked by the transfer wins over the floor.
+                share = min(share, lease.max_speed)
+            lease.share = int(share)
+            remaining = max(remaining - lease.share, 0)
+
+    def _push(self):
+        """Set the new speed of every Raysync client with active tasks.
+
+        The pushes are serialized, so the last speed set on a client is the
+        one of the latest shares.
+
+        """
+        with self._push_lock:
+            with self._lock:
+                speeds = {}
+                modes = {}
+                for lease in self._leases:
+                    if lease.engine is not None:
+                        speeds[id(lease.engine)] = speeds.get(id(lease.engine), 0) + lease.share
+                        modes[id(lease.engine)] = (lease.engine, lease.network_mode)
+            for key, (client, network_mode) in modes.items():
+                try:
+                    client.set_transfer_speed(speeds[key], network_mode)
+                except Exception as err:  # pylint: disable=broad-except
+                    self.logger.warning("Set the Raysync speed to %s KB/S failed: %s", speeds[key], err)
+
+
+def acquire_bandwidth(coordinator, max_speed=None, engine=None, network_mode=0):
+    """Get a share of a coordinator, or a fixed speed without coordinator.
+
+    Args:
+        coordinator (BandwidthCoordinator): Coordinator, or None.
+        max_speed (int or str, optional): Speed asked by the transfer.
+        engine (RayvisionTransferRaysync, optional): Raysync client of the
+            transfer, None for a transmitter.
+        network_mode (int): Network mode of the transfer.
+
+    Returns:
+        BandwidthLease: Share of the transfer.
+
+    """
+    if coordinator is None:
+        return BandwidthLease(None, max_speed, engine, network_mode)
+    return coordinator.acquire(max_speed, engine, network_mode)
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""Keep the transfer bootstrap between processes.
+
+A new process asks the API for the transfer lines and the Raysync key
+before its first transfer. ``BootstrapCache`` stores them in a JSON file
+readable by the user only, by domain, platform and user, so short-lived
+processes skip these requests while the entries are fresh. The file is
+replaced atomically, a reader never sees a partial write. A
+``TransferContext`` forgets its entries when a transfer fails.
+
+Only the threads of one process are serialized: two processes writing at
+the same time each replace the file with their own copy, so the entries
+of one of them can be lost. A lost entry only costs one more request to
+the API.
+
+"""
+
+# Import built-in modules
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Import local modules
+from rayvision_sync.constants import LINUX_LOCAL_ENV
+from rayvision_sync.constants import RENDERFARM_SDK
+from rayvision_sync.constants import WINDOWS_LOCAL_ENV
+from rayvision_sync.utils import replace_file
+
+
+def default_cache_path():
+    """Get the path of the cache in the renderfarm_sdk folder of the user."""
+    home_env = WINDOWS_LOCAL_ENV if sys.platform.startswith("win") else LINUX_LOCAL_ENV
+    return os.path.join(os.environ.get(home_env, tempfile.gettempdir()), RENDERFARM_SDK, "bootstrap_cache.json")
+
+
+class BootstrapCache(object):
+    """On-disk TTL cache of the transfer lines and Raysync keys.
+
+    Examples::
+
+        cache = BootstrapCache(ttl=3600)
+        context = TransferContext(api, bootstrap_cache=cache)
+        upload = RayvisionUpload(api, context=context)
+
+    """
+
+    def __init__(self, path=None, ttl=3600, clock=time.time, logger=None):
+        """Initialize the cache.
+
+        Args:
+            path (str, optional): Path of the cache file, see
+                ``default_cache_path``.
+            ttl (float): Seconds an entry is used.
+            clock (func): Time function, replaceable in tests.
+            logger (logging.Logger, optional): Log object.
+
+        """
+        self.path = path or default_cache_path()
+        self.ttl = ttl
+        self.clock = clock
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(domain, platform, user_id):
+        """Get the key of the entries of a user."""
+        return "%s|%s|%s" % (domain, platform, user_id)
+
+    def get(self, key, name):
+        """Get a fresh entry.
+
+        Args:
+            key (str): Key of the user, see ``key``.
+            name (str): Name of the entry.
+
+        Returns:
+            object: The value, None if it is missing or expired.
+
+        """
+        with self._lock:
+            entry = self._read().get(key, {}).get(name)
+        if entry is None or self.clock() >= entry["expires"]:
+            return None
+        return entry["value"]
+
+    def put(self, key, name, value):
+        """Store an entry.
+
+        Args:
+            key (str): Key of the user, see ``key``.
+            name (str): Name of the entry.
+            value (object): JSON serializable value.
+
+        """
+        with self._lock:
+            data = self._read()
+            data.setdefault(key, {})[name] = {"value": value, "expires": self.clock() + self.ttl}
+            self._write(data)
+
+    def invalidate(self, key=None, name=None):
+        """Forget entries.
+
+        Args:
+            key (str, optional): Key of the user, all users by default.
+            name (str, optional): Name of the entry, all entries of the user
+                by default.
+
+        """
+        with self._lock:
+            data = self._read()
+            if key is None:
+                data = {}
+            elif name is None:
+                data.pop(key, None)
+            else:
+                data.get(key, {}).pop(name, None)
+            self._write(data)
+
+    def _read(self):
+        """Read the cache file, empty when missing or broken."""
+        try:
+            with open(self.path) as cache_file:
+                data = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _write(self, data):
+        """Replace the cache file, a failure only loses the cache.
+
+        The file is replaced atomically, except on Python 2 where it is
+        removed first and a reader can find no entry for a moment.
+
+        """
+        folder = os.path.dirname(self.path)
+        try:
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+            # mkstemp creates the file readable by the user only.
+            handle, temp_path = tempfile.mkstemp(prefix=".bootstrap_", dir=folder)
+            try:
+                with os.fdopen(handle, "w") as temp_file:
+                    json.dump(data, temp_file)
+                replace_file(temp_path, self.path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+        except (IOError, OSError) as err:
+            self.logger.debug("Write the bootstrap cache %s failed: %s", self.path, err)
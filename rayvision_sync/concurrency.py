@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Adapt the number of parallel uploads to the link.
+
+``AdaptiveConcurrency`` measures the bytes the transmitters report as
+uploaded and moves its limit of parallel uploads AIMD-style: one more
+upload while the throughput holds, one less when it drops, and half as
+many when uploads fail.
+
+"""
+
+# Import built-in modules
+import collections
+import threading
+import time
+
+ChunkReport = collections.namedtuple(
+    "ChunkReport", ["upload_json_path", "success", "error", "elapsed", "done_files", "done_bytes"])
+
+
+class AdaptiveConcurrency(object):
+    """AIMD controller of the number of parallel uploads."""
+
+    def __init__(self, initial=4, min_workers=1, max_workers=32, interval=10.0, tolerance=0.05,
+                 decrease_factor=0.5, clock=time.time):
+        """Initialize the controller.
+
+        Args:
+            initial (int): Limit of parallel uploads to start with.
+            min_workers (int): Lowest limit.
+            max_workers (int): Highest limit.
+            interval (float): Seconds of one throughput measure.
+            tolerance (float): Relative throughput drop still seen as
+                steady.
+            decrease_factor (float): Factor applied to the limit on failures,
+                at most once per interval.
+            clock (func): Time function, replaceable in tests.
+
+        """
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        self.limit = min(max(initial, self.min_workers), self.max_workers)
+        self.interval = interval
+        self.tolerance = tolerance
+        self.decrease_factor = decrease_factor
+        self.clock = clock
+        self.throughput = None
+        self.history = []
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._failed = False
+        self._window_start = clock()
+        self._last_decrease = None
+
+    def record_bytes(self, size):
+        """Count bytes reported as uploaded."""
+        with self._lock:
+            self._bytes += size
+
+    def record_failure(self):
+        """Shrink the limit after a failed file or upload."""
+        with self._lock:
+            now = self.clock()
+            self._failed = True
+            if self._last_decrease is not None and now - self._last_decrease < self.interval:
+                return
+            self._last_decrease = now
+            self._set_limit(int(self.limit * self.decrease_factor))
+
+    def update(self):
+        """Close the measure window once ``interval`` passed.
+
+        Returns:
+            int: The limit of parallel uploads.
+
+        """
+        with self._lock:
+            now = self.clock()
+            elapsed = now - self._window_start
+            if elapsed < self.interval:
+                return self.limit
+            throughput = self._bytes / float(elapsed)
+            if self._failed:
+                pass
+            elif self.throughput is None or throughput >= self.throughput * (1 - self.tolerance):
+                self._set_limit(self.limit + 1)
+            else:
+                self._set_limit(self.limit - 1)
+            self.history.append((now, throughput, self.limit))
+            self.throughput = throughput
+            self._bytes = 0
+            self._failed = False
+            self._window_start = now
+            return self.limit
+
+    def _set_limit(self, limit):
+        """Set the limit within the bounds."""
+        self.limit = min(max(limit, self.min_workers), self.max_workers)
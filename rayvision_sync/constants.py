@@ -52,6 +52,9 @@ TASK_STATUS_DESCRIPTION = {
 
 TASK_END_STATUS_CODE_LIST = ['10', '20', '23', '25', '30', '35', '45']
 
+# Most task ids the task info API answers in one request.
+TASK_INFO_PAGE_SIZE = 100
+
 TRANSFER_LOG = "RAYVISION_LOG"
 RAYVISION_DB = "RAYVISION_DB"
 
@@ -61,6 +64,9 @@ RENDERFARM_SDK = "renderfarm_sdk"
 
 ENGINE_TYPE = ['aspera', 'raysyncproxy']
 
+# Status code of a transmitter command that could not be started.
+COMMAND_NOT_FOUND_CODE = 127
+
 PLATFORM_ALIAS_MAP = {
             '2': 'www2',
             '3': 'www3',
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""State shared by the uploads and downloads of one api.
+
+Building a ``RayvisionUpload`` or a ``RayvisionDownload`` used to ask the
+API for the transfer lines and the Raysync key, and to read db_config.ini,
+every time. A ``TransferContext`` resolves each of them the first time a
+transfer needs it, once for all the objects sharing the context:
+
+* the transfer lines when a transfer needs its server;
+* the Raysync key when a Raysync transfer starts;
+* db_config.ini and the log files once per context.
+
+With a ``BootstrapCache`` the transfer lines and the Raysync key are also
+kept on disk for the next processes, and forgotten when a transfer fails.
+
+All the properties are safe to use from several threads.
+
+"""
+
+# Import built-in modules
+import logging
+import os
+import threading
+
+# Import local modules
+from rayvision_sync.constants import PACKAGE_NAME
+from rayvision_sync.rayvision_raysync.transfer_raysync import RayvisionTransferRaysync
+from rayvision_sync.share_info import ShareInfoResolver
+from rayvision_sync.transfer import RayvisionTransfer
+from rayvision_sync.utils import create_transfer_params
+from rayvision_sync.utils import read_ini_config
+from rayvision_log import init_logger
+
+
+def load_db_config(db_config_path=None):
+    """Read db_config.ini.
+
+    Args:
+        db_config_path (str, optional): Customize db_config.ini absolute
+            path, the one of the package by default.
+
+    Returns:
+        tuple: Transfer log path, Redis, SQLite and database configurations.
+
+    """
+    if not bool(db_config_path) or not os.path.exists(db_config_path):
+        db_config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "db_config.ini"))
+    conf = read_ini_config(db_config_path)
+    database_config = {
+        "on": conf.get("DATABASE_CONFIG", "on"),
+        "type": conf.get("DATABASE_CONFIG", "type"),
+        "db_path": conf.get("DATABASE_CONFIG", "db_path")
+    }
+    redis_config = {
+        "host": conf.get("REDIS", "host"),
+        "port": int(conf.get("REDIS", "port")),
+        "password": conf.get("REDIS", "password"),
+        "table_index": conf.get("REDIS", "table_index"),
+        "timeout": conf.get("REDIS", "timeout")
+    }
+    sqlite_config = {
+        "temporary": conf.get("SQLITE", "temporary")
+    }
+    transfer_log_path = conf.get("TRANSFER_LOG_PATH", "transfer_log_path")
+    return transfer_log_path, redis_config, sqlite_config, database_config
+
+
+class ContextAttribute(object):
+    """Attribute read from the ``context`` of its object unless it is set.
+
+    Examples::
+
+        class RayvisionUpload(object):
+            trans = ContextAttribute("trans")
+
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.key = "_%s_override" % name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = instance.__dict__.get(self.key)
+        if value is None:
+            value = getattr(instance.context, self.name)
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.key] = value
+
+    def __delete__(self, instance):
+        instance.__dict__.pop(self.key, None)
+
+
+class TransferContext(object):
+    """Lazily resolved state of the transfers of one api.
+
+    Examples::
+
+        context = TransferContext(api)
+        upload = RayvisionUpload(api, context=context)
+        download = RayvisionDownload(api, context=context)
+
+    """
+
+    def __init__(self, api, transports_json="", transmitter_exe="", automatic_line=True, internet_provider="",
+                 logger=None, log_folder=None, log_name=None, log_level="DEBUG", bootstrap_cache=None):
+        """Initialize the context, nothing is resolved yet.
+
+        Args:
+            api (object): rayvision api object.
+            transports_json (string): Customize the absolute path of the transfer configuration file.
+            transmitter_exe (string): Customize the absolute path of the transfer execution file.
+            automatic_line (bool): Whether to automatically obtain the transmission line.
+            internet_provider (string): Network provider.
+            logger (object): Customize log object.
+            log_folder (string): Customize the absolute path of the folder where logs are stored.
+            log_name (string): Custom log file name.
+            log_level (string): Set log level, example: "DEBUG","INFO","WARNING","ERROR"
+            bootstrap_cache (BootstrapCache): On-disk cache of the transfer lines and the Raysync
+                key, shared with other processes.
+
+        """
+        self.api = api
+        self.transports_json = transports_json
+        self.transmitter_exe = transmitter_exe
+        self.automatic_line = automatic_line
+        self.internet_provider = internet_provider
+        self.log_folder = log_folder
+        self.log_name = log_name
+        self.log_level = log_level
+        self.bootstrap_cache = bootstrap_cache
+        self._logger = logger
+        self._lock = threading.RLock()
+        self._values = {}
+
+    def _resolve(self, key, factory):
+        """Get a value, it is created by ``factory`` on the first call."""
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = factory()
+            return self._values[key]
+
+    def get_logger(self, name):
+        """Get the log object of a module, the log files are set up once.
+
+        Args:
+            name (str): Name of the module.
+
+        Returns:
+            logging.Logger: The customized log object if any, the one of the
+                module otherwise.
+
+        """
+        if self._logger:
+            return self._logger
+        self._resolve("logging", lambda: init_logger(PACKAGE_NAME, self.log_folder, self.log_name) or True)
+        logger = logging.getLogger(name)
+        logger.setLevel(level=self.log_level.upper())
+        return logger
+
+    @property
+    def trans(self):
+        """RayvisionTransfer: Transmitter command builder, its transfer lines are resolved on use."""
+        return self._resolve("trans", self._create_transfer)
+
+    @property
+    def raysync_engine(self):
+        """RayvisionTransferRaysync: Raysync client, the Raysync key is asked on first use."""
+        return self._resolve("raysync_engine", self._create_raysync_engine)
+
+    @property
+    def share_info(self):
+        """ShareInfoResolver: Cache of the main account information."""
+        return self._resolve("share_info", lambda: ShareInfoResolver(self.api))
+
+    def db_config(self, db_config_path=None):
+        """Get the configuration of db_config.ini, read once per path.
+
+        Returns:
+            tuple: Same as ``load_db_config``.
+
+        """
+        return self._resolve(("db_config", db_config_path), lambda: load_db_config(db_config_path))
+
+    def _create_transfer(self):
+        """Create the transmitter command builder."""
+        params = create_transfer_params(self.api)
+        params["transports_json"] = self.transports_json
+        params["transmitter_exe"] = self.transmitter_exe
+        params["automatic_line"] = self.automatic_line
+        params["internet_provider"] = self.internet_provider
+        params["bootstrap_cache"] = self.bootstrap_cache
+        return RayvisionTransfer(self.api, **params)
+
+    def _create_raysync_engine(self):
+        """Create the Raysync client."""
+        trans = self.trans
+        return RayvisionTransferRaysync(self.api.user_info.get("domain"), trans.user_id,
+                                        self.api.user_info.get("user_name"), self._raysync_user_key(),
+                                        trans.platform, self.get_logger(RayvisionTransferRaysync.__module__),
+                                        timeout=self.api.connect.timeout)
+
+    def _raysync_user_key(self):
+        """Get the Raysync key from the bootstrap cache, or ask the API."""
+        if self.bootstrap_cache is not None:
+            user_key = self.bootstrap_cache.get(self.trans.bootstrap_key, "raysync_user_key")
+            if user_key is not None:
+                return user_key
+        user_key = self.api.query.get_raysync_user_key().get('raySyncUserKey')
+        if self.bootstrap_cache is not None and user_key:
+            self.bootstrap_cache.put(self.trans.bootstrap_key, "raysync_user_key", user_key)
+        return user_key
+
+    def transfer_failed(self, code=None):
+        """Forget the bootstrap after a failed transfer, it may be stale.
+
+        Nothing is forgotten without bootstrap cache, or for missing files
+        (status code 11), which do not come from the bootstrap. The Raysync
+        client is kept, a new client would restart the service and stop the
+        transfers still running; only its key is asked again.
+
+        Args:
+            code (int, optional): Status code of the transfer.
+
+        """
+        if self.bootstrap_cache is None or code == 11:
+            return
+        self.trans.forget_transport_info()
+        engine = self._values.get("raysync_engine")
+        if engine is not None:
+            engine.set_user_key(self._raysync_user_key(), self.trans.platform)
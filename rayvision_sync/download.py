@@ -7,23 +7,28 @@ the un-downloaded task is recorded (the task is rendered).
 
 """
 
+import collections
 import os
 # Import built-in modules
 import time
-import logging
 
-from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
 
 from rayvision_sync.manage import RayvisionManageTask
+from rayvision_sync.polling import PollScheduler
+from rayvision_sync.polling import ProgressGate
 # Import local modules
-from rayvision_sync.transfer import RayvisionTransfer
+from rayvision_sync.bandwidth import acquire_bandwidth
 from rayvision_sync.exception import DownloadFailed, UnsupportedEngineType
-from rayvision_sync.utils import create_transfer_params
+from rayvision_sync.retry import RetryPolicy
 from rayvision_sync.utils import run_cmd
-from rayvision_sync.utils import str2unicode, get_share_info
-from rayvision_log import init_logger
-from rayvision_sync.constants import PACKAGE_NAME
-from rayvision_sync.rayvision_raysync.transfer_raysync import RayvisionTransferRaysync
+from rayvision_sync.utils import str2unicode
+from rayvision_sync.context import ContextAttribute
+from rayvision_sync.context import TransferContext
+
+OutputReport = collections.namedtuple(
+    "OutputReport", ["task_id", "output_name", "success", "code", "error", "elapsed"])
+
 
 class RayvisionDownload(object):
     """Downloader.
@@ -32,6 +37,10 @@ class RayvisionDownload(object):
 
     """
 
+    # Resolved by the context when a transfer needs them.
+    trans = ContextAttribute("trans")
+    raysync_engine = ContextAttribute("raysync_engine")
+
     def __init__(self, api,
                  transports_json="",
                  transmitter_exe="",
@@ -41,6 +50,10 @@ class RayvisionDownload(object):
                  log_folder=None,
                  log_name=None,
                  log_level="DEBUG",
+                 retry_policy=None,
+                 bandwidth=None,
+                 share_info=None,
+                 context=None,
                  ):
         """Initialize instance.
 
@@ -54,23 +67,22 @@ class RayvisionDownload(object):
             log_folder (string): Customize the absolute path of the folder where logs are stored.
             log_name (string): Custom log file name, the system user name will be searched by default.
             log_level (string):  Set log level, example: "DEBUG","INFO","WARNING","ERROR"
+            retry_policy (RetryPolicy): Retry policy of the downloads, default is ``RetryPolicy()``.
+            bandwidth (BandwidthCoordinator): Bandwidth shared with other transfers, the
+                ``max_speed`` of every download is then only an upper bound.
+            share_info (ShareInfoResolver): Cache of the main account information, may be
+                shared with other transfers of the same api.
+            context (TransferContext): Lazily resolved state shared with other transfers of the
+                same api, the transfer arguments and the log arguments are then ignored.
         """
-        params = create_transfer_params(api)
-        params["transports_json"] = transports_json
-        params["transmitter_exe"] = transmitter_exe
-        params["automatic_line"] = automatic_line
-        params["internet_provider"] = internet_provider
+        self.context = context or TransferContext(api, transports_json, transmitter_exe, automatic_line,
+                                                  internet_provider, logger, log_folder, log_name, log_level)
         self.api = api
-        self.trans = RayvisionTransfer(api, **params)
-        self.manage_task = self.trans.manage_task or RayvisionManageTask(api.query)
-        self.logger = logger
-        if not self.logger:
-            init_logger(PACKAGE_NAME, log_folder, log_name)
-            self.logger = logging.getLogger(__name__)
-            self.logger.setLevel(level=log_level.upper())
-        self.raysync_engine = RayvisionTransferRaysync(self.api.user_info.get("domain"), self.trans.user_id, self.api.user_info.get("user_name"),
-                                                       self.api.query.get_raysync_user_key().get('raySyncUserKey'),
-                                                       self.trans.platform, self.logger, timeout=self.api.connect.timeout)
+        self.share_info = share_info or self.context.share_info
+        self.manage_task = RayvisionManageTask(api.query)
+        self.logger = self.context.get_logger(__name__)
+        self.retry_policy = retry_policy or RetryPolicy(logger=self.logger)
+        self.bandwidth = bandwidth
 
     def _download_log(self, task_id_list, local_path):
         """Download log Settings.
@@ -115,7 +127,8 @@ class RayvisionDownload(object):
 
     def download(self, task_id_list=None, max_speed=None, print_log=True, download_filename_format="true",
                  local_path=None, server_path=None, engine_type="aspera", server_ip=None, server_port=None,
-                 network_mode=0, proxy_ip=None, proxy_port=None, enable_hash=False, asset=False, download_num=2):
+                 network_mode=0, proxy_ip=None, proxy_port=None, enable_hash=False, asset=False, download_num=2,
+                 workers=1):
         """Download and update the undownloaded record.
 
         Args:
@@ -148,10 +161,15 @@ class RayvisionDownload(object):
             enable_hash(bool): Enable hash verification.
             asset(bool): Download assets or render images True: render images False: assets default False.
             download_num(int): Maximum number of downloads, default is 2.
+            workers(int): Number of outputs downloaded at the same time, default is 1.
 
         Returns:
             bool: True is success.
 
+        Raises:
+            DownloadFailed: Outputs failed to download, the other outputs are
+                downloaded first, see ``failed_outputs``.
+
         """
         if asset and not local_path:
             local_path = os.path.dirname(server_path)
@@ -164,14 +182,14 @@ class RayvisionDownload(object):
                            download_filename_format, server_path,
                            engine_type=engine_type, server_ip=server_ip, server_port=server_port,
                            network_mode=network_mode, proxy_ip=proxy_ip, proxy_port=proxy_port,
-                           enable_hash=enable_hash, asset=asset, download_num=download_num)
+                           enable_hash=enable_hash, asset=asset, download_num=download_num, workers=workers)
         self.logger.info("[Rayvision_sync end download.....]")
         return True
 
     def auto_download(self, task_id_list=None, max_speed=None, print_log=False, sleep_time=10,
                       download_filename_format="true", local_path=None, engine_type="aspera", server_ip=None,
                       server_port=None, network_mode=0, is_test_stop=False, proxy_ip=None, proxy_port=None,
-                      enable_hash=False, download_num=2):
+                      enable_hash=False, download_num=2, workers=1, poll_scheduler=None, skip_unchanged=True):
         """Automatic download (complete one frame download).
 
         Wait for all downloads to update undownloaded records.
@@ -205,6 +223,12 @@ class RayvisionDownload(object):
             proxy_port(str): proxy port, only supports raysyncproxy engine eg:5555.
             enable_hash(bool): Enable hash verification.
             download_num(int): Maximum number of downloads, default is 2.
+            workers(int): Number of outputs downloaded at the same time, across
+                the tasks, default is 1.
+            poll_scheduler(PollScheduler): Schedule the check of every task from
+                its progress, by default every task is checked every ``sleep_time``.
+            skip_unchanged(bool): Only download a task when its done frames or
+                status changed, and once more when it ends, default is True.
 
         Returns:
             bool: True is success.
@@ -219,7 +243,8 @@ class RayvisionDownload(object):
                                  is_test_stop, download_filename_format,
                                  engine_type=engine_type, server_ip=server_ip, server_port=server_port,
                                  network_mode=network_mode,  proxy_ip=proxy_ip, proxy_port=proxy_port,
-                                 enable_hash=enable_hash, download_num=download_num)
+                                 enable_hash=enable_hash, download_num=download_num, workers=workers,
+                                 poll_scheduler=poll_scheduler, skip_unchanged=skip_unchanged)
         self.logger.info("[Rayvision_sync end auto_download.....]")
         return True
 
@@ -228,7 +253,7 @@ class RayvisionDownload(object):
                             download_filename_format="true",
                             engine_type=None, server_ip=None, server_port=None,
                             network_mode=0, proxy_ip=None, proxy_port=None,enable_hash=False,
-                            download_num=2):
+                            download_num=2, workers=1, poll_scheduler=None, skip_unchanged=False):
         """Automatic download (complete one frame download).
 
         Args:
@@ -256,36 +281,72 @@ class RayvisionDownload(object):
             proxy_port(str): proxy port, only supports raysyncproxy engine eg:5555
             enable_hash(bool): Enable hash verification.
             download_num(int): Maximum number of downloads, default is 2.
+            workers(int): Number of outputs downloaded at the same time.
+            poll_scheduler(PollScheduler): Schedule of the checks, by default
+                every task is checked every ``sleep_time``.
+            skip_unchanged(bool): Skip the tasks without new frame since their
+                last download, the ended tasks are always downloaded.
 
         """
         download_failed_list = list()
-        while True:
-            if task_id_list:
-                time.sleep(float(sleep_time))
-                task_id_list_copy = deepcopy(task_id_list)
-                for task_id in task_id_list:
-                    download_flag = True
-                    is_task_end = self.manage_task.is_task_end(task_id, is_test_stop)
-                    try:
-                        self._run_download([task_id], local_path, max_speed,
-                                           print_log, download_filename_format,
-                                           engine_type=engine_type, server_ip=server_ip, server_port=server_port,
-                                           network_mode=network_mode, proxy_ip=proxy_ip, proxy_port=proxy_port,
-                                           enable_hash=enable_hash, download_num=download_num)
-                    except DownloadFailed:
-                        download_flag = False
-
-                    if is_task_end is True and download_flag is False:
-                        download_failed_list.append(task_id)
-
-                    if is_task_end is True:
-                        self.logger.info('The tasks end: %s', task_id)
-                        task_id_list_copy.remove(task_id)
-                task_id_list = deepcopy(task_id_list_copy)
-            else:
-                break
+        failed_outputs = []
+        progress_gate = ProgressGate() if skip_unchanged else None
+        if poll_scheduler is None:
+            sleep_time = float(sleep_time)
+            poll_scheduler = PollScheduler(sleep_time, sleep_time, sleep_time)
+        for task_id in task_id_list or []:
+            poll_scheduler.add(task_id)
+        while poll_scheduler:
+            time.sleep(poll_scheduler.next_delay())
+            task_id_list = poll_scheduler.pop_due()
+            if not task_id_list:
+                continue
+            # One request per page of ids, shared by the end check and the downloads.
+            task_status_by_id = self.manage_task.get_task_status_by_id(task_id_list)
+            task_end = dict((task_id, self.manage_task.task_status_end(task_status_by_id.get(str(task_id), []),
+                                                                       is_test_stop))
+                            for task_id in task_id_list)
+            # The ended tasks are downloaded a last time, the others once they progressed.
+            download_task_ids = [task_id for task_id in task_id_list if progress_gate is None or
+                                 task_end[task_id] is True or
+                                 progress_gate.changed(task_id, task_status_by_id.get(str(task_id), []))]
+            failed_reports = {}
+            if download_task_ids:
+                task_status_list = [task_status_dict for task_id in download_task_ids
+                                    for task_status_dict in task_status_by_id.get(str(task_id), [])]
+                try:
+                    self._run_download(download_task_ids, local_path, max_speed,
+                                       print_log, download_filename_format,
+                                       engine_type=engine_type, server_ip=server_ip, server_port=server_port,
+                                       network_mode=network_mode, proxy_ip=proxy_ip, proxy_port=proxy_port,
+                                       enable_hash=enable_hash, download_num=download_num,
+                                       task_status_list=task_status_list, workers=workers)
+                except DownloadFailed as err:
+                    for report in err.failed_outputs:
+                        failed_reports.setdefault(str(report.task_id), []).append(report)
+            if progress_gate is not None:
+                for task_id in download_task_ids:
+                    # A failed task is downloaded again at its next check.
+                    if str(task_id) not in failed_reports:
+                        progress_gate.mark(task_id, task_status_by_id.get(str(task_id), []))
+
+            for task_id in task_id_list:
+                is_task_end = task_end[task_id]
+
+                if is_task_end is True and str(task_id) in failed_reports:
+                    download_failed_list.append(task_id)
+                    failed_outputs.extend(failed_reports[str(task_id)])
+
+                if is_task_end is True:
+                    self.logger.info('The tasks end: %s', task_id)
+                    poll_scheduler.remove(task_id)
+                    if progress_gate is not None:
+                        progress_gate.forget(task_id)
+                else:
+                    poll_scheduler.update(task_id, task_status_by_id.get(str(task_id), []))
         if download_failed_list:
-            raise DownloadFailed('Finally tasks download failed: %s' % str(download_failed_list))
+            raise DownloadFailed('Finally tasks download failed: %s' % str(download_failed_list),
+                                 failed_outputs=failed_outputs)
 
     def auto_download_after_task_completed(self, task_id_list=None,
                                            max_speed=None, print_log=True,
@@ -294,7 +355,7 @@ class RayvisionDownload(object):
                                            local_path=None,
                                            engine_type="aspera", server_ip=None, server_port=None,
                                            network_mode=0,  is_test_stop=False, proxy_ip=None, proxy_port=None,
-                                           enable_hash=False, download_num=2):
+                                           enable_hash=False, download_num=2, workers=1):
         """Auto download after the tasks render completed.
 
         Args:
@@ -325,44 +386,64 @@ class RayvisionDownload(object):
             proxy_ip(str): proxy ip, only supports raysyncproxy engine eg:10.14.88.66
             proxy_port(str): proxy port, only supports raysyncproxy engine eg:5555
             enable_hash(bool): Enable hash verification.
-            download_num(int): Maximum number of downloads, default is 2.  
-            
+            download_num(int): Maximum number of downloads, default is 2.
+            workers(int): Number of outputs downloaded at the same time, across
+                the tasks ending together, default is 1.
+
         Returns:
             bool: True is success.
 
+        Raises:
+            DownloadFailed: Outputs of ended tasks failed to download, the
+                other tasks are still downloaded, see ``failed_outputs``.
+
         """
         local_path = self._check_local_path(local_path)
         self.logger.info("[Rayvision_sync start"
                          "auto_download_after_task_completed .....]")
         self._download_log(task_id_list, local_path)
 
+        failed_outputs = []
         while True:
             if task_id_list:
                 time.sleep(float(sleep_time))
-                for task_id in task_id_list:
-                    is_task_end = self.manage_task.is_task_end(task_id, is_test_stop)
+                task_status_by_id = self.manage_task.get_task_status_by_id(task_id_list)
+                end_task_ids = [task_id for task_id in task_id_list if self.manage_task.task_status_end(
+                    task_status_by_id.get(str(task_id), []), is_test_stop) is True]
 
-                    if is_task_end is True:
-                        time.sleep(float(5))
-                        self.logger.info('The tasks end: %s', task_id)
-                        self._run_download([task_id], local_path,
+                if end_task_ids:
+                    time.sleep(float(5))
+                    self.logger.info('The tasks end: %s', end_task_ids)
+                    try:
+                        self._run_download(end_task_ids, local_path,
                                            max_speed, print_log,
                                            download_filename_format,
                                            engine_type=engine_type, server_ip=server_ip, server_port=server_port,
                                            network_mode=network_mode, proxy_ip=proxy_ip, proxy_port=proxy_port,
-                                           enable_hash=enable_hash, download_num=download_num)
+                                           enable_hash=enable_hash, download_num=download_num,
+                                           task_status_list=[task_status_dict for task_id in end_task_ids
+                                                             for task_status_dict in
+                                                             task_status_by_id[str(task_id)]],
+                                           workers=workers)
+                    except DownloadFailed as err:
+                        failed_outputs.extend(err.failed_outputs)
+                    for task_id in end_task_ids:
                         task_id_list.remove(task_id)
             else:
                 break
         self.logger.info("[Rayvision_sync end -- "
                          "auto_download_after_task_completed......]")
+        if failed_outputs:
+            raise DownloadFailed('Finally tasks download failed: %s' % sorted(set(
+                str(report.task_id) for report in failed_outputs)), failed_outputs=failed_outputs)
 
         return True
 
     def _run_download(self, task_id_list, local_path, max_speed=None,
                       print_log=True, download_filename_format="true",
                       server_path=None, engine_type="aspera", server_ip=None, server_port=None,
-                      network_mode=0, proxy_ip=None, proxy_port=None, enable_hash=False, asset=False, download_num=2):
+                      network_mode=0, proxy_ip=None, proxy_port=None, enable_hash=False, asset=False, download_num=2,
+                      task_status_list=None, workers=1):
         """Execute the cmd command for multitasking download.
 
         Args:
@@ -390,9 +471,18 @@ class RayvisionDownload(object):
             enable_hash(bool): Enable hash verification.
             asset(bool): Download assets or render images True: render images False: assets default False.
             download_num(int): Maximum number of downloads, default is 2.
+            task_status_list (list, optional): Information of the tasks already
+                asked, see ``RayvisionManageTask.get_task_status``.
+            workers(int): Number of outputs downloaded at the same time.
+
+        Returns:
+            list of OutputReport: Result of every output.
+
+        Raises:
+            DownloadFailed: Outputs failed to download, the other outputs are
+                downloaded first.
 
         """
-        transmit_type = 'download_path'
         local_path = str2unicode(local_path)
         if not os.path.exists(local_path):
             os.makedirs(local_path)
@@ -400,56 +490,167 @@ class RayvisionDownload(object):
         #  means 1 GB/S.
         max_speed = max_speed if max_speed is not None else "1048576"
 
-        if not server_path:
-            task_status_list = self.manage_task.get_task_status(task_id_list)
-            output_file_names = (self.manage_task.
-                                 output_file_names(task_status_list))
+        options = {
+            "max_speed": max_speed, "print_log": print_log, "download_filename_format": download_filename_format,
+            "engine_type": engine_type, "server_ip": server_ip, "server_port": server_port,
+            "network_mode": network_mode, "proxy_ip": proxy_ip, "proxy_port": proxy_port,
+            "enable_hash": enable_hash, "asset": asset, "download_num": download_num,
+        }
+        jobs = self._output_jobs(task_id_list, server_path, task_status_list)
+        if workers > 1 and len(jobs) > 1:
+            with ThreadPoolExecutor(min(workers, len(jobs))) as pool:
+                reports = list(pool.map(lambda job: self._download_job(job, local_path, options), jobs))
         else:
-            if isinstance(server_path, str):
-                output_file_names = [{"output_name": server_path, "user_id": self.trans.user_id,
-                                      "bid": self.trans.output_bid}]
-            elif isinstance(server_path, list):
-                isinstance(server_path, list)
-                output_file_names = [{"output_name": one_path, "user_id": self.trans.user_id,
-                                      "bid": self.trans.output_bid} for one_path in server_path ]
-            else:
-                raise Exception("custom_server_output_path must a list or str.")
-
-        for output_file_name in output_file_names:
-            cmd_params = [transmit_type, local_path, output_file_name["output_name"],
-                          max_speed, download_filename_format, 'output_bid']
-            main_input_bid, main_user_id = get_share_info(self.api)
-            bid = main_input_bid if asset else output_file_name["bid"]
-            user_id = main_user_id if asset else output_file_name["user_id"]
-
-            if engine_type == "aspera":
-                cmd = self.trans.create_cmd(cmd_params, engine_type=engine_type,
-                                            server_ip=server_ip, server_port=server_port, bid=bid,
-                                            network_mode=network_mode, main_user_id=user_id)
-                transfer_code = run_cmd(cmd, print_log=print_log, logger=self.logger)
-                
-            elif engine_type == "raysyncproxy":
-                transfer_code = self.raysync_engine.start_transfer(**{
-                    "server_ip": server_ip if server_ip else self.trans.transport_info['raysyncproxy']['server_ip'],
-                    "server_port": server_port if server_port else self.trans.transport_info['raysyncproxy']['server_port'],
-                    "local_path": local_path,
-                    "server_path": output_file_name["output_name"] if download_filename_format == "true" else output_file_name["output_name"].rstrip('\\/')+'/',
-                    "storage_id": bid or self.trans.output_bid,
-                    "task_type": "download",
-                    "task_id": task_id_list[0],
-                    "user_id":  user_id,
-                    "max_speed": max_speed,
-                    "network_mode": network_mode,
-                    "proxy_ip": proxy_ip,
-                    "proxy_port": proxy_port,
-                    "enable_hash": enable_hash,
-                    "trans_storage": "input" if asset else "output",
-                    "download_num": download_num
-                })
+            reports = [self._download_job(job, local_path, options) for job in jobs]
+
+        failed_outputs = [report for report in reports if not report.success]
+        if failed_outputs:
+            raise DownloadFailed('%s Download failed' % [report.output_name for report in failed_outputs],
+                                 failed_outputs=failed_outputs)
+        return reports
+
+    def _output_jobs(self, task_id_list, server_path=None, task_status_list=None):
+        """Get the task id list and the output of every download."""
+        if server_path:
+            return [(task_id_list, output_file_name)
+                    for output_file_name in self.output_file_names(task_id_list, server_path)]
+        if task_status_list is None:
+            task_status_list = self.manage_task.get_task_status(task_id_list)
+        # The API answers the ids as strings, the ids of the caller are kept.
+        task_ids = dict((str(task_id), task_id) for task_id in task_id_list or [])
+        jobs = []
+        for task_status_dict in task_status_list:
+            task_id = task_ids.get(task_status_dict['task_id'], task_status_dict['task_id'])
+            jobs.extend(([task_id], output_file_name)
+                        for output_file_name in self.manage_task.output_file_names([task_status_dict]))
+        return jobs
+
+    def _download_job(self, job, local_path, options):
+        """Download one output, its failure does not stop the other outputs.
+
+        Returns:
+            OutputReport: Result of the output.
+
+        """
+        task_id_list, output_file_name = job
+        task_id = task_id_list[0] if task_id_list else None
+        start = time.time()
+        try:
+            if options["asset"]:
+                bid, user_id = self.share_info.resolve()
             else:
-                msg = "{} is not a supported transport engine, " \
-                      "currently only support 'aspera' and 'raysyncproxy'".format(engine_type)
-                raise UnsupportedEngineType(msg)
+                bid, user_id = output_file_name["bid"], output_file_name["user_id"]
+            transfer_code = self.retry_policy.call(
+                self._download_output, output_file_name, task_id_list, local_path, bid=bid, user_id=user_id,
+                **options)
+        except UnsupportedEngineType:
+            raise
+        except Exception as err:  # pylint: disable=broad-except
+            self.logger.error("%s download failed: %s", output_file_name["output_name"], err)
+            return OutputReport(task_id, output_file_name["output_name"], False, None, err, time.time() - start)
+        if transfer_code != 0:
+            self.context.transfer_failed(transfer_code)
+            self.logger.error("%s download failed, status code is %s", output_file_name["output_name"],
+                              transfer_code)
+        return OutputReport(task_id, output_file_name["output_name"], transfer_code == 0, transfer_code, None,
+                            time.time() - start)
+
+    def _download_output(self, output_file_name, task_id_list, local_path, max_speed, print_log,
+                         download_filename_format, engine_type, server_ip, server_port, network_mode, proxy_ip,
+                         proxy_port, enable_hash, asset, download_num, bid, user_id):
+        """Download one output once.
+
+        Returns:
+            int: Status code, 0 is success.
+
+        """
+        if engine_type == "aspera":
+            with acquire_bandwidth(self.bandwidth, max_speed, network_mode=network_mode) as lease:
+                cmd = self.output_cmd(output_file_name, local_path, lease.speed, download_filename_format,
+                                      server_ip, server_port, network_mode, bid, user_id)
+                return run_cmd(cmd, print_log=print_log, logger=self.logger, env=self.trans.runtime.env())
+        if engine_type == "raysyncproxy":
+            with acquire_bandwidth(self.bandwidth, max_speed, self.raysync_engine, network_mode) as lease:
+                return self.raysync_engine.start_transfer(**self.output_raysync_params(
+                    output_file_name, task_id_list, local_path, lease.engine_speed, download_filename_format,
+                    server_ip, server_port, network_mode, proxy_ip, proxy_port, enable_hash, asset, download_num,
+                    bid, user_id))
+        msg = "{} is not a supported transport engine, " \
+              "currently only support 'aspera' and 'raysyncproxy'".format(engine_type)
+        raise UnsupportedEngineType(msg)
+
+    def output_file_names(self, task_id_list, server_path=None, task_status_list=None):
+        """Get the outputs to download, from the tasks or the custom server paths.
+
+        Args:
+            task_id_list (list of int): Task ids.
+            server_path (str or list, optional): Custom server paths
+                downloaded instead of the outputs of the tasks.
+            task_status_list (list, optional): Status of the tasks, requested
+                from the API when not given.
+
+        Returns:
+            list of dict: Output name, user id and bucket of every output.
 
-            if transfer_code != 0:
-                raise DownloadFailed('%s Download failed' % output_file_name)
\ No newline at end of file
+        """
+        if not server_path:
+            if task_status_list is None:
+                task_status_list = self.manage_task.get_task_status(task_id_list)
+            return self.manage_task.output_file_names(task_status_list)
+        if isinstance(server_path, str):
+            return [{"output_name": server_path, "user_id": self.trans.user_id,
+                     "bid": self.trans.output_bid}]
+        if isinstance(server_path, list):
+            return [{"output_name": one_path, "user_id": self.trans.user_id,
+                     "bid": self.trans.output_bid} for one_path in server_path]
+        raise Exception("custom_server_output_path must a list or str.")
+
+    def output_cmd(self, output_file_name, local_path, max_speed, download_filename_format, server_ip,
+                   server_port, network_mode, bid, user_id):
+        """Get the transmitter command downloading one output.
+
+        The arguments are the same as ``download``, the transport
+        information may be requested from the API on first use.
+
+        Returns:
+            list: Argument list of the transmitter.
+
+        """
+        cmd_params = ['download_path', local_path, output_file_name["output_name"],
+                      max_speed, download_filename_format, 'output_bid']
+        return self.trans.create_cmd_argv(cmd_params, engine_type="aspera",
+                                          server_ip=server_ip, server_port=server_port, bid=bid,
+                                          network_mode=network_mode, main_user_id=user_id)
+
+    def output_raysync_params(self, output_file_name, task_id_list, local_path, max_speed,
+                              download_filename_format, server_ip, server_port, network_mode, proxy_ip,
+                              proxy_port, enable_hash, asset, download_num, bid, user_id):
+        """Get the Raysync task parameters downloading one output.
+
+        The arguments are the same as ``download``, the transport
+        information may be requested from the API on first use.
+
+        Returns:
+            dict: Keyword arguments of ``RayvisionTransferRaysync.start_transfer``.
+
+        """
+        output_name = output_file_name["output_name"]
+        return {
+            "server_ip": server_ip if server_ip else self.trans.transport_info['raysyncproxy']['server_ip'],
+            "server_port": server_port if server_port else self.trans.transport_info['raysyncproxy']['server_port'],
+            "local_path": local_path,
+            "server_path": output_name if download_filename_format == "true" else output_name.rstrip('\\/')+'/',
+            "storage_id": bid or self.trans.output_bid,
+            "task_type": "download",
+            "task_id": task_id_list[0] if task_id_list else None,
+            # Every output of a task restarts its own failed transfer.
+            "failed_key": "%s|%s" % (task_id_list[0] if task_id_list else None, output_name),
+            "user_id":  user_id,
+            "max_speed": max_speed,
+            "network_mode": network_mode,
+            "proxy_ip": proxy_ip,
+            "proxy_port": proxy_port,
+            "enable_hash": enable_hash,
+            "trans_storage": "input" if asset else "output",
+            "download_num": download_num
+        }
@@ -27,6 +27,10 @@ class UnsupportedEngineType(Exception):
     """Engine Only Support aspera and raysyncproxy"""
 
 
+class TransferCancelled(Exception):
+    """The transfer was cancelled before its end"""
+
+
 class DownloadFailed(Exception):
     """Download failed"""
 
@@ -36,8 +40,11 @@ class DownloadFailed(Exception):
         Args:
             error (str): Error message.
             args (set): Other parameters.
-            kwargs (dict): Other keyword parameters.
+            kwargs (dict): Other keyword parameters, ``failed_outputs`` is
+                the list of ``OutputReport`` of the failed outputs.
 
         """
+        failed_outputs = kwargs.pop("failed_outputs", None)
         super(DownloadFailed, self).__init__(self, error, *args, **kwargs)
         self.error = error
+        self.failed_outputs = failed_outputs or []
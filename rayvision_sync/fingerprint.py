@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""Fingerprint the content of asset files.
+
+The files of an upload.json are hashed by a thread pool, the hash
+functions release the GIL while they read the data. ``xxhash`` is used when
+it is installed, ``hashlib.blake2b`` otherwise. Small files are read in one
+call, large files are memory mapped. The fingerprints are kept in a SQLite
+store with the size, modification time and inode of the file, an unchanged
+file is not read again.
+
+"""
+
+# Import built-in modules
+import collections
+import hashlib
+import mmap
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Import local modules
+from rayvision_sync.index import QUERY_BATCH
+from rayvision_sync.index import file_identity
+from rayvision_sync.manifest import iter_asset
+
+# Files larger than this are memory mapped.
+MMAP_THRESHOLD = 4 * 1024 * 1024
+
+FingerprintReport = collections.namedtuple(
+    "FingerprintReport", ["fingerprints", "hashed_files", "skipped_files", "missing_files", "hashed_bytes",
+                          "elapsed", "throughput"])
+
+
+def default_algorithm():
+    """Get the fastest hash algorithm available.
+
+    Returns:
+        str: "xxh3_128" or "xxh64" with ``xxhash``, "blake2b" otherwise.
+
+    """
+    try:
+        import xxhash  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return "blake2b"
+    return "xxh3_128" if hasattr(xxhash, "xxh3_128") else "xxh64"
+
+
+def new_hasher(algorithm):
+    """Create a hash object of an algorithm given by ``default_algorithm``."""
+    if algorithm == "blake2b":
+        return hashlib.blake2b(digest_size=16)
+    import xxhash  # pylint: disable=import-outside-toplevel
+    return getattr(xxhash, algorithm)()
+
+
+def hash_file(path, algorithm=None, mmap_threshold=MMAP_THRESHOLD):
+    """Hash the content of a file.
+
+    Args:
+        path (str): Local path.
+        algorithm (str, optional): Hash algorithm, see ``default_algorithm``.
+        mmap_threshold (int): Files larger than this are memory mapped.
+
+    Returns:
+        str: Hex digest of the content.
+
+    """
+    hasher = new_hasher(algorithm or default_algorithm())
+    with open(path, "rb") as file_:
+        size = os.fstat(file_.fileno()).st_size
+        if size > mmap_threshold:
+            mapped = mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                hasher.update(mapped)
+            finally:
+                mapped.close()
+        else:
+            hasher.update(file_.read())
+    return hasher.hexdigest()
+
+
+class FingerprintStore(object):
+    """SQLite store of the fingerprints."""
+
+    def __init__(self, db_path):
+        """Open the store, it is created if needed.
+
+        Args:
+            db_path (str): Path of the SQLite database.
+
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprint ("
+                "local TEXT NOT NULL, algorithm TEXT NOT NULL, size INTEGER, mtime_ns INTEGER, "
+                "inode INTEGER, digest TEXT, PRIMARY KEY (local, algorithm))")
+
+    def get(self, local_paths, algorithm):
+        """Get the stored fingerprints.
+
+        Args:
+            local_paths (list of str): Local paths.
+            algorithm (str): Hash algorithm of the fingerprints.
+
+        Returns:
+            dict: Identity and digest by local path, see ``index.file_identity``.
+
+        """
+        found = {}
+        for index in range(0, len(local_paths), QUERY_BATCH):
+            batch = local_paths[index:index + QUERY_BATCH]
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT local, size, mtime_ns, inode, digest FROM fingerprint WHERE algorithm = ? "
+                    "AND local IN (%s)" % ",".join("?" * len(batch)), [algorithm] + batch).fetchall()
+            for row in rows:
+                found[row[0]] = (tuple(row[1:4]), row[4])
+        return found
+
+    def put(self, entries, algorithm):
+        """Store fingerprints.
+
+        Args:
+            entries (iterable of tuple): Local path, identity and digest.
+            algorithm (str): Hash algorithm of the fingerprints.
+
+        """
+        rows = [(local, algorithm) + tuple(identity) + (digest,) for local, identity, digest in entries]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO fingerprint VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._conn.close()
+
+
+def fingerprint_asset(asset, store=None, workers=8, algorithm=None, mmap_threshold=MMAP_THRESHOLD,
+                      batch_size=1000, clock=time.time):
+    """Fingerprint the files of an upload.json.
+
+    Examples::
+
+        store = FingerprintStore(r"D:/renderfarm_sdk/fingerprint.db")
+        report = fingerprint_asset(r"D:/project/upload.json", store, workers=16)
+        print("%.2f GB/s" % report.throughput)
+
+    Args:
+        asset (str or iterable of dict): Path to an upload.json, or its
+            ``asset`` entries.
+        store (FingerprintStore, optional): Store of the fingerprints, the
+            files are always hashed without store.
+        workers (int): Number of hashing threads.
+        algorithm (str, optional): Hash algorithm, see ``default_algorithm``.
+        mmap_threshold (int): Files larger than this are memory mapped.
+        batch_size (int): Files looked up and stored together.
+        clock (func): Time function, replaceable in tests.
+
+    Returns:
+        FingerprintReport: Digest by local path, numbers of hashed,
+            skipped and missing files, bytes hashed, seconds spent and
+            throughput of the hashing in GB/s.
+
+    """
+    if isinstance(asset, str):
+        asset = iter_asset(asset)
+    algorithm = algorithm or default_algorithm()
+    start = clock()
+    fingerprints = {}
+    counts = collections.Counter()
+
+    def hash_one(entry):
+        """Hash one file unless its stored fingerprint is still valid."""
+        local, stored = entry
+        identity = file_identity(local)
+        if identity is None:
+            return local, None, None, False
+        if stored is not None and stored[0] == identity:
+            return local, identity, stored[1], True
+        try:
+            return local, identity, hash_file(local, algorithm, mmap_threshold), False
+        except (IOError, OSError, ValueError):
+            return local, None, None, False
+
+    def run_batch(batch):
+        """Fingerprint a batch of files, the stored ones are checked first."""
+        known = store.get(batch, algorithm) if store is not None else {}
+        hashed = []
+        for local, identity, digest, skipped in executor.map(hash_one, [(local, known.get(local))
+                                                                        for local in batch]):
+            if digest is None:
+                counts["missing"] += 1
+                continue
+            fingerprints[local] = digest
+            if skipped:
+                counts["skipped"] += 1
+                continue
+            counts["hashed"] += 1
+            counts["bytes"] += identity[0]
+            hashed.append((local, identity, digest))
+        if store is not None and hashed:
+            store.put(hashed, algorithm)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        batch = []
+        seen = set()
+        for item in asset:
+            if item["local"] in seen:
+                continue
+            seen.add(item["local"])
+            batch.append(item["local"])
+            if len(batch) >= batch_size:
+                run_batch(batch)
+                batch = []
+        if batch:
+            run_batch(batch)
+
+    elapsed = clock() - start
+    throughput = counts["bytes"] / float(1024 ** 3) / elapsed if elapsed > 0 else 0.0
+    return FingerprintReport(fingerprints, counts["hashed"], counts["skipped"], counts["missing"],
+                             counts["bytes"], elapsed, throughput)
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""Local index of the uploaded files.
+
+The index remembers which version of a local file, identified by its size,
+modification time and inode, was uploaded to which server path of which
+storage. ``RayvisionUpload.upload_asset`` uses it to upload only the new
+or changed files of an upload.json when a project is submitted again.
+
+"""
+
+# Import built-in modules
+import os
+import sqlite3
+import threading
+import time
+
+# Maximum number of parameters of one SQLite query.
+QUERY_BATCH = 500
+
+
+def file_identity(path):
+    """Get the identity of a local file.
+
+    Args:
+        path (str): Local path.
+
+    Returns:
+        tuple: Size, modification time in nanoseconds and inode, None if the
+            file cannot be read.
+
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    mtime_ns = getattr(stat, "st_mtime_ns", None)
+    if mtime_ns is None:
+        mtime_ns = int(stat.st_mtime * 1e9)
+    return stat.st_size, mtime_ns, stat.st_ino
+
+
+class UploadIndex(object):
+    """SQLite index of the uploaded files.
+
+    Examples::
+
+        index = UploadIndex(r"D:/renderfarm_sdk/upload_index.db")
+        changed = index.changed(asset, storage_id="46456")
+        ...
+        index.record(changed, storage_id="46456")
+
+    """
+
+    def __init__(self, db_path):
+        """Open the index, it is created if needed.
+
+        Args:
+            db_path (str): Path of the SQLite database.
+
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS uploaded ("
+                "local TEXT NOT NULL, server TEXT NOT NULL, storage_id TEXT NOT NULL, "
+                "size INTEGER, mtime_ns INTEGER, inode INTEGER, uploaded_at INTEGER, "
+                "PRIMARY KEY (local, server, storage_id))")
+
+    def changed(self, asset, storage_id):
+        """Keep the files not uploaded yet in their current version.
+
+        Args:
+            asset (iterable of dict): Files of an upload.json.
+            storage_id (str): Storage the files are uploaded to.
+
+        Yields:
+            tuple: The file and its identity, see ``file_identity``.
+
+        """
+        batch = []
+        for item in asset:
+            batch.append(item)
+            if len(batch) >= QUERY_BATCH:
+                for changed in self._changed_batch(batch, storage_id):
+                    yield changed
+                batch = []
+        for changed in self._changed_batch(batch, storage_id):
+            yield changed
+
+    def _changed_batch(self, batch, storage_id):
+        """Compare one batch of files with the index."""
+        if not batch:
+            return []
+        locals_ = list(set(item["local"] for item in batch))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT local, server, size, mtime_ns, inode FROM uploaded WHERE storage_id = ? "
+                "AND local IN (%s)" % ",".join("?" * len(locals_)), [str(storage_id)] + locals_).fetchall()
+        known = dict(((row[0], row[1]), tuple(row[2:])) for row in rows)
+        changed = []
+        for item in batch:
+            identity = file_identity(item["local"])
+            if identity is None or known.get((item["local"], item["server"])) != identity:
+                changed.append((item, identity))
+        return changed
+
+    def record(self, uploaded, storage_id):
+        """Record uploaded files.
+
+        Args:
+            uploaded (iterable of tuple): Files and their identities, as
+                given by ``changed``. Files without identity are skipped.
+            storage_id (str): Storage the files were uploaded to.
+
+        """
+        now = int(time.time())
+        rows = [(item["local"], item["server"], str(storage_id)) + tuple(identity) + (now,)
+                for item, identity in uploaded if identity is not None]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO uploaded VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def invalidate(self, local_paths=None, storage_id=None):
+        """Forget uploaded files so they are uploaded again.
+
+        Args:
+            local_paths (iterable of str, optional): Files to forget, all by
+                default.
+            storage_id (str, optional): Only forget the files of this storage.
+
+        """
+        condition, params = "1", []
+        if storage_id is not None:
+            condition, params = "storage_id = ?", [str(storage_id)]
+        with self._lock, self._conn:
+            if local_paths is None:
+                self._conn.execute("DELETE FROM uploaded WHERE %s" % condition, params)
+                return
+            local_paths = list(local_paths)
+            for index in range(0, len(local_paths), QUERY_BATCH):
+                batch = local_paths[index:index + QUERY_BATCH]
+                self._conn.execute("DELETE FROM uploaded WHERE %s AND local IN (%s)" % (
+                    condition, ",".join("?" * len(batch))), params + batch)
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._conn.close()
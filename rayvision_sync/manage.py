@@ -6,6 +6,7 @@ from builtins import str
 from rayvision_sync.utils import get_task_status_description
 
 from rayvision_sync.constants import TASK_END_STATUS_CODE_LIST
+from rayvision_sync.constants import TASK_INFO_PAGE_SIZE
 
 
 # pylint: disable=useless-object-inheritance
@@ -26,12 +27,26 @@ class RayvisionManageTask(object):
             bool: True: end of task rendering, False/None: Task rendering is
                 not over.
 
+        """
+        return self.task_status_end(self.get_task_status([task_id]), is_test_stop)
+
+    def task_status_end(self, task_status_list, is_test_stop=False):
+        """Check if the rendering ends from the information of a task.
+
+        Args:
+            task_status_list (list): Information of the task, see
+                ``get_task_status``.
+            is_test_stop (bool): The test frame stop also ends the task.
+
+        Returns:
+            bool: True: end of task rendering, False/None: Task rendering is
+                not over.
+
         """
         TASK_END_STATUS_CODE_LIST_CP = deepcopy(TASK_END_STATUS_CODE_LIST)
         if is_test_stop:
             TASK_END_STATUS_CODE_LIST_CP.append("40")
         result = None
-        task_status_list = self.get_task_status([task_id])
         task_status_codes = self.find_task_status_codes(task_status_list)
         if task_status_codes:
             for task_status_code in task_status_codes:
@@ -47,7 +62,7 @@ class RayvisionManageTask(object):
         """Get information about each task in the task id list.
 
         Call the API interface to get the ``items`` information of each task,
-        and process it.
+        and process it. The ids are asked ``TASK_INFO_PAGE_SIZE`` at a time.
 
         Args:
             task_id_list (list of int): Task id list.
@@ -77,12 +92,33 @@ class RayvisionManageTask(object):
                     ]
 
         """
-        task_info_list = self._query.task_info(task_id_list).get(
-            'items',
-            [])
+        task_info_list = []
+        for index in range(0, len(task_id_list), TASK_INFO_PAGE_SIZE):
+            task_info_list.extend(self._query.task_info(
+                task_id_list[index:index + TASK_INFO_PAGE_SIZE]).get('items', []))
         task_status_list = self.task_info_iterater(task_info_list)
         return task_status_list
 
+    def get_task_status_by_id(self, task_id_list):
+        """Get the information of many tasks, one request per page of ids.
+
+        Args:
+            task_id_list (list of int): Task id list.
+
+        Returns:
+            dict: Information list of each task id, see ``get_task_status``,
+                the tasks the API does not know are missing.
+                e.g.:
+                    {
+                        "111": [{"task_id": "111", "task_status_code": "25", ...}]
+                    }
+
+        """
+        task_status_by_id = {}
+        for task_status_dict in self.get_task_status(list(task_id_list)):
+            task_status_by_id.setdefault(task_status_dict['task_id'], []).append(task_status_dict)
+        return task_status_by_id
+
     def task_info_iterater(self, task_info_list):
         """Item information for each task, extracted and organized.
 
@@ -164,7 +200,11 @@ class RayvisionManageTask(object):
                             "task_status_description":"Done",
                             "is_opener":"0",
                             "output_file_name":"111_test",
-                            "sub_task_status":[]
+                            "sub_task_status":[],
+                            "total_frames": 10,
+                            "done_frames": 4,
+                            "executing_frames": 2,
+                            "start_time": 1563356906040
                         },
                         {
                             "userId": "1566",
@@ -211,6 +251,10 @@ class RayvisionManageTask(object):
             task_status_dict['sub_task_status'] = sub_task_status
             task_status_dict['userId'] = task_info.get('userId')
             task_status_dict['bid'] = task_info.get('bid')
+            task_status_dict['total_frames'] = task_info.get('totalFrames')
+            task_status_dict['done_frames'] = task_info.get('doneFrames')
+            task_status_dict['executing_frames'] = task_info.get('executingFrames')
+            task_status_dict['start_time'] = task_info.get('startTime')
 
             task_status_list.append(task_status_dict)
 
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""Stream the files of an upload.json.
+
+Manifests of millions of files do not fit comfortably in memory once loaded
+with ``json.load``. ``iter_asset`` decodes the ``asset`` array one item at a
+time from a bounded buffer and ``AssetWriter`` writes the items of a new
+upload.json as they come, so cutting a manifest costs the memory of one
+buffer whatever its size.
+
+"""
+
+# Import built-in modules
+import codecs
+import json
+
+READ_SIZE = 1024 * 1024
+WHITESPACE = " \t\n\r"
+
+
+class _JsonStream(object):
+    """Buffered text stream decoding one JSON value at a time."""
+
+    def __init__(self, stream, read_size=READ_SIZE):
+        self._stream = stream
+        self._read_size = read_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """Read more text, drop the consumed part of the buffer."""
+        if self._eof:
+            return False
+        data = self._stream.read(self._read_size)
+        if not data:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + data
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """Get the next non whitespace character, None at the end."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return None
+
+    def expect(self, chars):
+        """Consume the next character, it must be one of ``chars``."""
+        char = self.peek()
+        if char is None or char not in chars:
+            raise ValueError("Expecting one of %r at offset %s, got %r" % (chars, self._pos, char))
+        self._pos += 1
+        return char
+
+    def value(self):
+        """Decode the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except ValueError:
+                if self._fill():
+                    continue
+                raise
+            # A number can end at the buffer boundary and continue after it.
+            if end == len(self._buffer) and not self._eof and self._fill():
+                continue
+            self._pos = end
+            return value
+
+
+def iter_asset(upload_path, read_size=READ_SIZE):
+    """Iterate over the files of an upload.json without loading it.
+
+    Args:
+        upload_path (str): upload.json absolute path.
+        read_size (int): Number of characters read at a time.
+
+    Yields:
+        dict: One item of the ``asset`` array.
+
+    Raises:
+        ValueError: The file is not a JSON object.
+
+    """
+    with codecs.open(upload_path, "r", encoding="utf-8") as f_upload:
+        stream = _JsonStream(f_upload, read_size)
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+        while True:
+            key = stream.value()
+            stream.expect(":")
+            if key != "asset":
+                stream.value()
+            else:
+                stream.expect("[")
+                if stream.peek() == "]":
+                    stream.expect("]")
+                else:
+                    while True:
+                        yield stream.value()
+                        if stream.expect(",]") == "]":
+                            break
+            if stream.expect(",}") == "}":
+                return
+
+
+class AssetWriter(object):
+    """Write the files of an upload.json one at a time.
+
+    Examples::
+
+        with AssetWriter("upload_1.json") as writer:
+            for item in items:
+                writer.write(item)
+
+    """
+
+    def __init__(self, path):
+        """Open the upload.json.
+
+        Args:
+            path (str): Path of the new upload.json.
+
+        """
+        self.path = path
+        self.count = 0
+        self._file = codecs.open(path, "w", "utf-8")
+        self._file.write('{"asset": [')
+
+    def write(self, item):
+        """Append one item to the ``asset`` array."""
+        self._file.write(",\n" if self.count else "\n")
+        self._file.write(json.dumps(item, ensure_ascii=False))
+        self.count += 1
+
+    def close(self):
+        """Close the array and the file."""
+        if self._file.closed:
+            return
+        self._file.write("\n]}\n")
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
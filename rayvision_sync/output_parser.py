@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""Parse the output of the transmitter.
+
+The transmitter reports its work one line at a time on stdout. The parser
+turns those lines into typed events so the callers no longer need to
+decode and pattern match every line themselves.
+
+"""
+
+# Import built-in modules
+import collections
+import re
+import sys
+
+EVENT_FILE_DONE = "file_done"
+EVENT_FILE_FAILED = "file_failed"
+EVENT_PROGRESS = "progress"
+EVENT_SUMMARY = "summary"
+EVENT_MESSAGE = "message"
+
+# Patterns are compiled once at import time, the substring checks in
+# ``TransmitterOutputParser.parse_line`` guard them so most lines never
+# reach the regex engine. "upload file done" lines, by far the most common,
+# are handled with plain string searches, and ``TransmitterOutputParser.scan``
+# skips the lines that are about no failed file when nobody needs events.
+FILE_FAILED_PATTERN = re.compile(r"upload file fail.*?\((.*?)\)")
+PATH_INFO_FAILED_PATTERN = re.compile(r"get path(.*?)info failed")
+PROGRESS_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+SUMMARY_PATTERN = re.compile(r"\b(?:total|summary|finished)\b", re.IGNORECASE)
+
+TransmitterEvent = collections.namedtuple(
+    "TransmitterEvent", ["type", "line", "path", "percent"])
+
+
+def decode_line(line):
+    """Decode one line of the transmitter output.
+
+    The same fallback order as ``utils.str2unicode`` is used, utf-8 first,
+    then gbk and at last the file system encoding.
+
+    Args:
+        line (bytes or str): Raw line.
+
+    Returns:
+        str: Decoded line.
+
+    """
+    if not isinstance(line, bytes):
+        return line
+    for encoding in ("utf-8", "gbk"):
+        try:
+            return line.decode(encoding)
+        except UnicodeError:
+            continue
+    return line.decode(sys.getfilesystemencoding(), "replace")
+
+
+class ErrorMessages(object):
+    """Bounded record of the error lines of one transmitter run.
+
+    Only the latest ``maxlen`` messages are kept, but every message is
+    counted so nothing silently disappears from the summary.
+
+    """
+
+    def __init__(self, maxlen=1000):
+        """Initialize the record.
+
+        Args:
+            maxlen (int): Maximum number of messages to keep.
+
+        """
+        self._messages = collections.deque(maxlen=maxlen)
+        self.counts = collections.Counter()
+        self.total = 0
+
+    def append(self, message, kind=EVENT_FILE_FAILED):
+        """Record an error message.
+
+        Args:
+            message (str): Error line.
+            kind (str): Event type of the error.
+
+        """
+        self._messages.append(message)
+        self.counts[kind] += 1
+        self.total += 1
+
+    @property
+    def dropped(self):
+        """int: Number of messages that no longer fit in the record."""
+        return self.total - len(self._messages)
+
+    def __iter__(self):
+        return iter(self._messages)
+
+    def __len__(self):
+        return len(self._messages)
+
+    def __bool__(self):
+        return self.total > 0
+
+    __nonzero__ = __bool__
+
+
+class TransmitterOutputParser(object):
+    """Turn transmitter output lines into ``TransmitterEvent`` objects."""
+
+    def __init__(self, max_errors=1000, track_done=True):
+        """Initialize the parser.
+
+        Args:
+            max_errors (int): Maximum number of error lines to keep.
+            track_done (bool): Count the uploaded files and keep their paths
+                in ``done_paths``.
+
+        """
+        self.track_done = track_done
+        self.errors = ErrorMessages(max_errors)
+        self.done_count = 0
+        self.done_paths = set()
+
+    def parse_line(self, line):
+        """Parse one line.
+
+        Args:
+            line (bytes or str): Raw line read from the transmitter.
+
+        Returns:
+            TransmitterEvent: The event, None for blank lines.
+
+        """
+        line = _clean_line(line)
+        if not line:
+            return None
+        if "upload file done" in line or "fail" in line:
+            kind, path = self._record(line)
+            if kind is not None:
+                return TransmitterEvent(kind, line, path, None)
+        if "%" in line:
+            match = PROGRESS_PATTERN.search(line)
+            if match:
+                return TransmitterEvent(EVENT_PROGRESS, line, None,
+                                        float(match.group(1)))
+        if _may_be_summary(line) and SUMMARY_PATTERN.search(line):
+            return TransmitterEvent(EVENT_SUMMARY, line, None, None)
+        return TransmitterEvent(EVENT_MESSAGE, line, None, None)
+
+    def scan(self, stream, logger=None):
+        """Parse a whole stream without building any event.
+
+        Much faster than ``parse_line`` when nobody consumes the events,
+        only the errors and the uploaded files are recorded.
+
+        Args:
+            stream (file): Stdout of the transmitter process.
+            logger (func, optional): Called with every non blank line.
+
+        """
+        record = self._record
+        track_done = self.track_done
+        for line in stream:
+            if isinstance(line, bytes):
+                try:
+                    line = line.decode("utf-8")
+                except UnicodeError:
+                    line = decode_line(line)
+            line = line.strip()
+            if not line:
+                continue
+            if logger:
+                logger(line)
+            if "upload file done" in line:
+                if track_done:
+                    record(line)
+            elif "fail" in line:
+                record(line)
+
+    def _record(self, line):
+        """Record a done or failed file line.
+
+        Returns:
+            tuple: Event type and path of the file, (None, None) when the
+                line is about no file.
+
+        """
+        if "upload file done" in line:
+            path = _path_in_parentheses(line, line.find("upload file done"))
+            if path is not None:
+                if self.track_done:
+                    self.done_count += 1
+                    self.done_paths.add(path)
+                return EVENT_FILE_DONE, path
+        if "upload file fail" in line:
+            match = FILE_FAILED_PATTERN.search(line)
+            return self._failed(line, match.group(1).strip() if match else None)
+        if "info failed" in line and "get path" in line:
+            match = PATH_INFO_FAILED_PATTERN.search(line)
+            return self._failed(line, match.group(1).strip() if match else None)
+        return None, None
+
+    def _failed(self, line, path):
+        """Record a failed file."""
+        self.errors.append(line, EVENT_FILE_FAILED)
+        return EVENT_FILE_FAILED, path
+
+
+def _clean_line(line):
+    """Decode and strip one raw line."""
+    if isinstance(line, bytes):
+        try:
+            line = line.decode("utf-8")
+        except UnicodeError:
+            line = decode_line(line)
+    return line.strip()
+
+
+def _may_be_summary(line):
+    """Check with substring searches whether a line can match ``SUMMARY_PATTERN``."""
+    lowered = line.lower()
+    return "total" in lowered or "summary" in lowered or "finished" in lowered
+
+
+def _path_in_parentheses(line, start):
+    """Get the text between the first parentheses after ``start``."""
+    left = line.find("(", start)
+    if left == -1:
+        return None
+    right = line.find(")", left)
+    if right == -1:
+        return None
+    return line[left + 1:right].strip()
+
+
+def read_output(stream, parser, callback):
+    """Parse a transmitter's stdout until it is closed.
+
+    Args:
+        stream (file): Stdout of the transmitter process.
+        parser (TransmitterOutputParser): Parser to use.
+        callback (func): Called with every event.
+
+    """
+    parse_line = parser.parse_line
+    for line in stream:
+        event = parse_line(line)
+        if event is not None:
+            callback(event)
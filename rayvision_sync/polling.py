@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""Schedule the status checks of the auto-downloaded tasks.
+
+``auto_download`` used to check every task after a fixed ``sleep_time``.
+``PollScheduler`` keeps the time of the next check of every task in a heap,
+and derives it from the progress of the task: the measured time per
+finished frame tells when the next frame is expected, so a task about to
+finish a frame is checked soon, while a waiting or stalled task is checked
+less and less often.
+
+A check used to start a transmitter for every task, which walks the whole
+output folder on the server. ``ProgressGate`` remembers the done frames and
+the status of the tasks at their last download, so only the tasks with new
+frames are downloaded.
+
+"""
+
+# Import built-in modules
+import heapq
+import itertools
+import time
+
+# Status code of a task rendering frames.
+RENDERING_STATUS_CODE = "5"
+
+
+def task_progress(task_status_list):
+    """Sum the frames of a task, over its sub tasks if any.
+
+    Args:
+        task_status_list (list): Information of the task, see
+            ``RayvisionManageTask.get_task_status``.
+
+    Returns:
+        tuple: Done frames, total frames, executing frames, and whether a
+            part of the task is rendering.
+
+    """
+    done_frames = total_frames = executing_frames = 0
+    rendering = False
+    for task_status_dict in task_status_list:
+        sub_task_status = task_status_dict.get('sub_task_status', [])
+        if str(task_status_dict.get('is_opener')) == "1" and sub_task_status:
+            progress = task_progress(sub_task_status)
+        else:
+            progress = (task_status_dict.get('done_frames') or 0, task_status_dict.get('total_frames') or 0,
+                        task_status_dict.get('executing_frames') or 0,
+                        task_status_dict.get('task_status_code') == RENDERING_STATUS_CODE)
+        done_frames += progress[0]
+        total_frames += progress[1]
+        executing_frames += progress[2]
+        rendering = rendering or progress[3]
+    return done_frames, total_frames, executing_frames, rendering
+
+
+def _progress_signature(task_status_list):
+    """Get the status code and the done frames of every part of a task."""
+    signature = []
+    for task_status_dict in task_status_list:
+        sub_task_status = task_status_dict.get('sub_task_status', [])
+        if str(task_status_dict.get('is_opener')) == "1" and sub_task_status:
+            signature.extend(_progress_signature(sub_task_status))
+        else:
+            signature.append((task_status_dict.get('task_id'), task_status_dict.get('task_status_code'),
+                              task_status_dict.get('done_frames')))
+    return sorted(signature, key=str)
+
+
+class ProgressGate(object):
+    """Tell which tasks have something new to download.
+
+    Examples::
+
+        gate = ProgressGate()
+        if gate.changed(task_id, task_status_list):
+            download.download([task_id])
+            gate.mark(task_id, task_status_list)
+
+    """
+
+    def __init__(self):
+        self._signatures = {}
+
+    def changed(self, task_id, task_status_list):
+        """Check whether a task progressed since its last download.
+
+        A task seen for the first time changed once it has done frames.
+        The done frames of some tasks are unknown, those always changed.
+
+        Args:
+            task_id (int): Task id.
+            task_status_list (list): Information of the task, see
+                ``RayvisionManageTask.get_task_status``.
+
+        Returns:
+            bool: True when the task has to be downloaded.
+
+        """
+        signature = _progress_signature(task_status_list)
+        if any(done_frames is None for _, _, done_frames in signature):
+            return True
+        if task_id not in self._signatures:
+            return any(done_frames for _, _, done_frames in signature)
+        return self._signatures[task_id] != signature
+
+    def mark(self, task_id, task_status_list):
+        """Remember the progress of a downloaded task."""
+        self._signatures[task_id] = _progress_signature(task_status_list)
+
+    def forget(self, task_id):
+        """Forget a task."""
+        self._signatures.pop(task_id, None)
+
+
+class _TaskState(object):
+    """Progress of one task seen by the checks."""
+
+    def __init__(self):
+        self.done_frames = None
+        self.changed = None
+        self.frame_seconds = None
+        self.interval = None
+
+
+class PollScheduler(object):
+    """Heap of the next status check of every task.
+
+    Examples::
+
+        scheduler = PollScheduler(interval=10, min_interval=2, max_interval=300)
+        download.auto_download([41372307, 41372308], poll_scheduler=scheduler)
+
+    """
+
+    def __init__(self, interval=10.0, min_interval=2.0, max_interval=300.0, backoff=2.0, stall_factor=3.0,
+                 smoothing=0.5, clock=time.time):
+        """Initialize the scheduler.
+
+        Args:
+            interval (float): Seconds between the checks of a task whose
+                frame time is not known yet.
+            min_interval (float): Shortest seconds between two checks.
+            max_interval (float): Longest seconds between two checks.
+            backoff (float): Factor applied to the interval of a waiting
+                or stalled task at every check.
+            stall_factor (float): A rendering task is stalled once its next
+                frame is late by this many frame times.
+            smoothing (float): Weight of the last measured frame time.
+            clock (func): Time function, replaceable in tests.
+
+        """
+        self.interval = float(interval)
+        self.min_interval = float(min_interval)
+        self.max_interval = max(float(max_interval), self.min_interval)
+        self.backoff = backoff
+        self.stall_factor = stall_factor
+        self.smoothing = smoothing
+        self.clock = clock
+        self._heap = []
+        self._scheduled = {}
+        self._states = {}
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._states)
+
+    def __contains__(self, task_id):
+        return task_id in self._states
+
+    def add(self, task_id, delay=None):
+        """Watch a task.
+
+        Args:
+            task_id (int): Task id.
+            delay (float, optional): Seconds before its first check, default
+                is ``interval``.
+
+        """
+        self._states.setdefault(task_id, _TaskState())
+        self._push(task_id, self.interval if delay is None else delay)
+
+    def remove(self, task_id):
+        """Stop watching a task."""
+        self._states.pop(task_id, None)
+        self._scheduled.pop(task_id, None)
+
+    def next_delay(self):
+        """Get the seconds until the next check.
+
+        Returns:
+            float: Seconds, 0 when a check is due; None without check.
+
+        """
+        while self._heap and self._scheduled.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - self.clock())
+
+    def pop_due(self):
+        """Take the tasks whose check is due.
+
+        Every task taken is checked then given back with ``update``, or
+        forgotten with ``remove``.
+
+        Returns:
+            list: Task ids, the earliest first.
+
+        """
+        now = self.clock()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, number, task_id = heapq.heappop(self._heap)
+            if self._scheduled.get(task_id) == number:
+                del self._scheduled[task_id]
+                due.append(task_id)
+        return due
+
+    def update(self, task_id, task_status_list):
+        """Record the status of a checked task and schedule its next check.
+
+        Args:
+            task_id (int): Task id.
+            task_status_list (list): Information of the task, see
+                ``RayvisionManageTask.get_task_status``.
+
+        Returns:
+            float: Seconds until the next check of the task.
+
+        """
+        now = self.clock()
+        state = self._states.setdefault(task_id, _TaskState())
+        done_frames, _, executing_frames, rendering = task_progress(task_status_list)
+        if state.done_frames is None:
+            state.changed = now
+            state.frame_seconds = self._started_frame_seconds(task_status_list, done_frames, now)
+        elif done_frames > state.done_frames:
+            frame_seconds = (now - state.changed) / float(done_frames - state.done_frames)
+            if state.frame_seconds is not None:
+                frame_seconds = (self.smoothing * frame_seconds +
+                                 (1 - self.smoothing) * state.frame_seconds)
+            state.frame_seconds = frame_seconds
+            state.changed = now
+        state.done_frames = done_frames
+        state.interval = self._interval(state, now, rendering or executing_frames > 0)
+        self._push(task_id, state.interval)
+        return state.interval
+
+    def _interval(self, state, now, rendering):
+        """Get the seconds until the next check of a task."""
+        if not rendering:
+            return self._back_off(state)
+        if state.frame_seconds is None:
+            return self._bound(self.interval)
+        next_frame = state.changed + state.frame_seconds - now
+        if next_frame < -self.stall_factor * state.frame_seconds:
+            return self._back_off(state)
+        if next_frame <= 0:
+            # The frame is late, check a few times per frame time.
+            next_frame = state.frame_seconds / 4.0
+        return self._bound(next_frame)
+
+    def _back_off(self, state):
+        """Get a longer interval than the last one, for waiting or stalled tasks."""
+        if state.interval is None:
+            return self._bound(self.interval)
+        return self._bound(max(state.interval, self.interval) * self.backoff)
+
+    def _bound(self, interval):
+        """Keep an interval between ``min_interval`` and ``max_interval``."""
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    @staticmethod
+    def _started_frame_seconds(task_status_list, done_frames, now):
+        """Estimate the frame time from the start time of the task, in ms."""
+        start_time = task_status_list[0].get('start_time') if task_status_list else None
+        if not start_time or not done_frames:
+            return None
+        elapsed = now - start_time / 1000.0
+        return elapsed / done_frames if elapsed > 0 else None
+
+    def _push(self, task_id, delay):
+        """Schedule the next check of a task, replacing the previous one."""
+        number = next(self._counter)
+        self._scheduled[task_id] = number
+        heapq.heappush(self._heap, (self.clock() + delay, number, task_id))
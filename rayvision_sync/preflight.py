@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""Check the files of an upload.json before uploading them.
+
+A missing file makes the transmitter exit with status code 11 after a full
+run. The pre-flight stats every local path on a thread pool first, which
+hides most of the latency of NFS/SMB shares, expands the folders into their
+files with ``os.scandir`` when Python has it, and drops or reports the
+missing files. A folder reached twice through symbolic links is expanded
+once, so a link loop ends. The
+sizes are attached to the files for the scheduling done afterwards, see
+``utils.cutting_upload``.
+
+"""
+
+# Import built-in modules
+import collections
+import logging
+import os
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Import local modules
+from rayvision_sync.exception import RayvisionError
+from rayvision_sync.manifest import AssetWriter
+from rayvision_sync.manifest import iter_asset
+
+PreflightReport = collections.namedtuple(
+    "PreflightReport", ["upload_json_path", "file_count", "missing", "expanded_folders", "total_bytes",
+                        "elapsed"])
+
+# Python 2 has no os.scandir.
+_scandir = getattr(os, "scandir", None)
+
+
+def _folder_entries(folder):
+    """List the folders and the files of a folder.
+
+    ``os.scandir`` saves the stat of the folders on most systems, without it
+    every entry is stated.
+
+    Yields:
+        tuple: Name, path, whether the entry is a folder, and the size of a
+            file.
+
+    """
+    if _scandir is not None:
+        for entry in _scandir(folder):
+            if entry.is_dir():
+                yield entry.name, entry.path, True, None
+            elif entry.is_file():
+                yield entry.name, entry.path, False, entry.stat().st_size
+        return
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        try:
+            status = os.stat(path)
+        except OSError:
+            # A broken symbolic link, neither a folder nor a file.
+            continue
+        if stat.S_ISDIR(status.st_mode):
+            yield name, path, True, None
+        elif stat.S_ISREG(status.st_mode):
+            yield name, path, False, status.st_size
+
+
+def _walk_files(local, server):
+    """List the files under a folder.
+
+    Yields:
+        tuple: Local path, server path and size of every file.
+
+    """
+    folders = [(local, server.rstrip("/"))]
+    visited = set()
+    while folders:
+        local_folder, server_folder = folders.pop()
+        status = os.stat(local_folder)
+        # Python 2 on Windows reports no inode, the links are rare there.
+        if status.st_ino:
+            if (status.st_dev, status.st_ino) in visited:
+                continue
+            visited.add((status.st_dev, status.st_ino))
+        for name, path, is_folder, size in _folder_entries(local_folder):
+            server_path = "%s/%s" % (server_folder, name)
+            if is_folder:
+                folders.append((path, server_path))
+            else:
+                yield path, server_path, size
+
+
+def stat_item(item):
+    """Stat the local path of one upload.json file.
+
+    Args:
+        item (dict): File of the upload.json, with "local" and "server".
+
+    Returns:
+        list of dict: The file with its size, or the files of the folder;
+            None if the local path is missing.
+
+    """
+    try:
+        status = os.stat(item["local"])
+    except OSError:
+        return None
+    if not stat.S_ISDIR(status.st_mode):
+        return [dict(item, size=status.st_size)]
+    try:
+        return [dict(item, local=local, server=server, size=size)
+                for local, server, size in _walk_files(item["local"], item["server"])]
+    except OSError:
+        return None
+
+
+def preflight_asset(upload_json_path, to_path=None, workers=32, drop_missing=True, attach_sizes=True,
+                    batch_size=4096, logger=None):
+    """Stat, expand and clean the files of an upload.json.
+
+    Examples::
+
+        report = preflight_asset(r"D:/project/upload.json")
+        UPLOAD.upload_asset(report.upload_json_path)
+
+    Args:
+        upload_json_path (str): Path to the upload.json file.
+        to_path (str, optional): Path of the checked upload.json, default is
+            "<name>_preflight.json" next to ``upload_json_path``.
+        workers (int): Number of threads reading the file status.
+        drop_missing (bool): Drop the missing files, raise when False.
+        attach_sizes (bool): Add the "size" of every file to the checked
+            upload.json.
+        batch_size (int): Files stated together.
+        logger (logging.Logger, optional): Log object.
+
+    Returns:
+        PreflightReport: Path of the checked upload.json, number of files,
+            local paths of the missing files, number of expanded folders,
+            total size and seconds spent.
+
+    Raises:
+        RayvisionError: Files are missing and ``drop_missing`` is False.
+
+    """
+    logger = logger or logging.getLogger(__name__)
+    start = time.time()
+    if to_path is None:
+        to_path = "%s_preflight.json" % os.path.splitext(upload_json_path)[0]
+    missing = []
+    counts = collections.Counter()
+
+    def write_batch(batch, writer):
+        """Stat a batch of files and write the found ones."""
+        for item, found in zip(batch, executor.map(stat_item, batch)):
+            if found is None:
+                missing.append(item["local"])
+                continue
+            if len(found) != 1 or found[0]["local"] != item["local"]:
+                counts["folders"] += 1
+            for file_item in found:
+                counts["bytes"] += file_item["size"]
+                if not attach_sizes:
+                    file_item.pop("size")
+                writer.write(file_item)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor, AssetWriter(to_path) as writer:
+        batch = []
+        for item in iter_asset(upload_json_path):
+            batch.append(item)
+            if len(batch) >= batch_size:
+                write_batch(batch, writer)
+                batch = []
+        write_batch(batch, writer)
+    if missing:
+        if not drop_missing:
+            os.remove(to_path)
+            raise RayvisionError(200025, "%s files of %s are missing, e.g. %s" % (
+                len(missing), upload_json_path, missing[0]))
+        logger.warning("%s missing files are not uploaded: %s", len(missing), missing[:10])
+    return PreflightReport(to_path, writer.count, missing, counts["folders"], counts["bytes"],
+                           time.time() - start)
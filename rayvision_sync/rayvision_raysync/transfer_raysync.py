@@ -5,6 +5,7 @@ import os
 import json
 import codecs
 import subprocess
+import threading
 import zipfile
 import platform as plm
 from pprint import pformat
@@ -12,6 +13,7 @@ from tqdm.auto import tqdm
 from xml.etree.ElementTree import parse
 from rayvision_sync.rayvision_raysync.url import ApiUrl
 from rayvision_sync.rayvision_raysync.constants import RAYSYNC_NAME, RAYSYNCEXE, HEADERS, DOMAIN, RESPONSE, STATU_SLEEP
+from rayvision_sync.exception import TransferCancelled
 from rayvision_sync.rayvision_raysync.exception import TaskidNotexsit, DownloadRaysyncFailed, RaysyncAPIError, \
     NotfoundRaysyncInI, NotSupportfiletype, CreatTaskFailed, TransferTimeout, LaunchRaysyncfailed, NotSupportTasktype
 
@@ -48,13 +50,19 @@ class RayvisionTransferRaysync():
             self._raysyncdirpath, RAYSYNCEXE[self._system])
         self._url = ApiUrl
         self._task_failed_dict = {}
-        self.password = "%s&1&%s&12345678" % (user_key, platform)
+        # The service and its settings are global, they are set up by one transfer at a time.
+        self._service_lock = threading.RLock()
+        self.set_user_key(user_key, platform)
         self.task_domain = task_domain
         self.user_id = user_id
         self.user_name = user_name
         self.service_statu = False
         self.timeout = timeout
 
+    def set_user_key(self, user_key, platform):
+        """ Use a new Raysync key for the next transfer tasks, the running ones are kept. """
+        self.password = "%s&1&%s&12345678" % (user_key, platform)
+
     def auto_download(self):
         """The static raysync package is automatically downloaded"""
         try:
@@ -201,6 +209,11 @@ class RayvisionTransferRaysync():
 
     def listening_raysync_server(self):
         """Listening to the Raysync."""
+        with self._service_lock:
+            return self._listening_raysync_server()
+
+    def _listening_raysync_server(self):
+        """Start the Raysync service unless it is running."""
         try:
             self._base_url = "%s:%s" % (self._domain, self._port)
             if not self.service_statu:
@@ -306,7 +319,7 @@ class RayvisionTransferRaysync():
     def start_transfer(self, server_ip, server_port, local_path, server_path, storage_id, input_id=None, task_type=None,
                        task_id=None, user_id=None, file_type="normal", trans_storage="output", max_speed=None,
                        max_timeout=18000, network_mode=0, proxy_ip=None, proxy_port=None, enable_hash=False,
-                       upload_num=2, download_num=2):
+                       upload_num=2, download_num=2, failed_key=None):
         """
         @:param server_ip: The IP address of the transport server
         @:param server_port: The IP address of the transport port
@@ -325,15 +338,46 @@ class RayvisionTransferRaysync():
         @:param enable_hash: Enable hash verification.
         @:param upload_num: Maximum number of uploads, default is 2.
         @:param download_num: Maximum number of downloads, default is 2.
+        @:param failed_key: Key of the failed transfer task restarted by the next call, default is task_id,
+            the transfers of one render task in parallel need their own key.
         :return: statu code
         """
+        transfer_task_id = self.prepare_transfer(
+            server_ip, server_port, local_path, server_path, storage_id, input_id=input_id, task_type=task_type,
+            task_id=task_id, user_id=user_id, file_type=file_type, trans_storage=trans_storage,
+            max_speed=max_speed, network_mode=network_mode, proxy_ip=proxy_ip, proxy_port=proxy_port,
+            enable_hash=enable_hash, upload_num=upload_num, download_num=download_num, failed_key=failed_key)
+        res_code = self.look_task_status(transfer_task_id, task_id if failed_key is None else failed_key,
+                                         max_timeout, task_type)
+        return res_code
+
+    def prepare_transfer(self, server_ip, server_port, local_path, server_path, storage_id, input_id=None,
+                         task_type=None, task_id=None, user_id=None, file_type="normal", trans_storage="output",
+                         max_speed=None, network_mode=0, proxy_ip=None, proxy_port=None, enable_hash=False,
+                         upload_num=2, download_num=2, failed_key=None):
+        """Start the service and create, or restart, the transfer task.
+
+        The parameters are the same as ``start_transfer``.
+
+        :return: transfer task id
+        """
+        with self._service_lock:
+            return self._prepare_transfer(
+                server_ip, server_port, local_path, server_path, storage_id, input_id, task_type, task_id,
+                user_id, file_type, trans_storage, max_speed, network_mode, proxy_ip, proxy_port, enable_hash,
+                upload_num, download_num, task_id if failed_key is None else failed_key)
+
+    def _prepare_transfer(self, server_ip, server_port, local_path, server_path, storage_id, input_id, task_type,
+                          task_id, user_id, file_type, trans_storage, max_speed, network_mode, proxy_ip, proxy_port,
+                          enable_hash, upload_num, download_num, failed_key):
+        """Create, or restart, the transfer task under the service lock."""
         # start service
         self.auto_download()
         self.listening_raysync_server()
         self.set_transfer_speed(max_speed, network_mode)
         self.set_proxy_manager(proxy_ip, proxy_port)
         self.set_task_limit(upload_num, download_num)
-        if task_id not in self._task_failed_dict:  # first create task
+        if failed_key not in self._task_failed_dict:  # first create task
             path_dict = self.get_transfer_path(
                 task_type, local_path, server_path, storage_id, task_id, file_type, trans_storage, user_id)
             mode_dict = {0: "default", 1: "tcp-only", 2: "udp-only"}
@@ -360,18 +404,18 @@ class RayvisionTransferRaysync():
                 'Transfer task has been created. The Transfer task ID is %s' % transfer_task_id)
         else:  # 重新启动任务
             params = {
-                "task-id": self._task_failed_dict[task_id],
+                "task-id": self._task_failed_dict[failed_key],
             }
             response = self.post(self._url.start_task, params)
-            transfer_task_id = self._task_failed_dict[task_id]
+            transfer_task_id = self._task_failed_dict[failed_key]
             self.logger.info('Render task_id is %s,Transfer task id %s already try again......' % (
                 task_id, transfer_task_id))
-        res_code = self.look_task_status(transfer_task_id, task_id, max_timeout, task_type)
-        return res_code
+        return transfer_task_id
 
-    def look_task_status(self, transfer_task_id, task_id, max_timeout, task_type):
+    def look_task_status(self, transfer_task_id, task_id, max_timeout, task_type, cancel_event=None):
         """ look listening task status
             STATU_SLEEP: request task_status interface sleep(5s)
+            cancel_event: stop listening once it is set, raise TransferCancelled
         """
         now_seconds = 0
         while True:
@@ -379,33 +423,84 @@ class RayvisionTransferRaysync():
                 raise TransferTimeout(
                     "Transmission timeout! The maximum transmission time is 5 hours by default!")
             now_seconds += 1
-            time.sleep(STATU_SLEEP)
-            params = {"task-id": transfer_task_id}
-            response = self.post(self._url.get_task_status, params)
-            status = response["task-list"][0]["task-state"]
-            if status in ["start", "idle"]:
-                continue
-            elif status == "ready":
-                self.get_all_task_status(task_type)
-            else:
-                if status == "failed":
-                    self._task_failed_dict[task_id] = transfer_task_id
-                    file_params = {"task-id": transfer_task_id, "list-type": "error", "page-size": 10, "page-number": 1}
-                    file_response = self.post(self._url.get_file_list, file_params)
-                    file_list = file_response["file-list"] if file_response["file-list"] else []
-                    for error_dict in file_list:
-                        self.logger.error('file Transfer failed: %s code: %s' % (error_dict["local-path"], error_dict["error-code"]))
-                elif status == "successful":
-                    self._task_failed_dict.pop(task_id, None)
-                else:
-                    raise CreatTaskFailed(
-                        "create transfer task failed! message is %s" % status)
-                break
+            if cancel_event is None:
+                time.sleep(STATU_SLEEP)
+            elif cancel_event.wait(STATU_SLEEP):
+                raise TransferCancelled("Transfer task %s is cancelled" % transfer_task_id)
+            result_code = self.check_task_status(transfer_task_id, task_id, task_type)
+            if result_code is not None:
+                return result_code
+
+    def check_task_status(self, transfer_task_id, task_id, task_type):
+        """ Query the task status once.
+
+        :return: result code once the task has ended, None while it is running
+        """
+        params = {"task-id": transfer_task_id}
+        response = self.post(self._url.get_task_status, params)
+        status = response["task-list"][0]["task-state"]
+        if status in ["start", "idle"]:
+            return None
+        elif status == "ready":
+            self.get_all_task_status(task_type)
+            return None
+        if status == "failed":
+            self._task_failed_dict[task_id] = transfer_task_id
+            for error_dict in self.get_error_files(transfer_task_id, page_size=10, max_pages=1):
+                self.logger.error('file Transfer failed: %s code: %s' % (error_dict["local-path"], error_dict["error-code"]))
+        elif status == "successful":
+            self._task_failed_dict.pop(task_id, None)
+        else:
+            raise CreatTaskFailed(
+                "create transfer task failed! message is %s" % status)
         result_code = self._resultDict.get(status)
         self.logger.info('The transmission task is complete and the status of the task is %s, result_code is %s!' % (
             status, result_code))
         return result_code
 
+    def get_task_files(self, transfer_task_id, list_type, page_size=1000, max_pages=None):
+        """ Get the files of a transfer task in a list, page by page.
+
+        @:param transfer_task_id: Transfer task id
+        @:param list_type: File list of the task, "error" or "success"
+        @:param page_size: Number of files requested per page
+        @:param max_pages: Maximum number of pages, all pages by default
+        :return: list of file dicts with "local-path"
+        """
+        files = []
+        page_number = 1
+        while max_pages is None or page_number <= max_pages:
+            file_params = {"task-id": transfer_task_id, "list-type": list_type, "page-size": page_size,
+                           "page-number": page_number}
+            file_response = self.post(self._url.get_file_list, file_params)
+            file_list = file_response.get("file-list") or []
+            files.extend(file_list)
+            if len(file_list) < page_size:
+                break
+            page_number += 1
+        return files
+
+    def get_error_files(self, transfer_task_id, page_size=1000, max_pages=None):
+        """ Get the files that failed in a transfer task, page by page.
+
+        :return: list of error file dicts with "local-path" and "error-code"
+        """
+        return self.get_task_files(transfer_task_id, "error", page_size, max_pages)
+
+    def get_done_files(self, transfer_task_id, page_size=1000, max_pages=None):
+        """ Get the files transferred by a transfer task, page by page.
+
+        The service lists no unfinished files, the whole success list is
+        requested: one request per page_size transferred files.
+
+        :return: list of file dicts with "local-path"
+        """
+        return self.get_task_files(transfer_task_id, "success", page_size, max_pages)
+
+    def forget_failed_task(self, task_id):
+        """ Create a new transfer task next time instead of restarting the failed one. """
+        self._task_failed_dict.pop(task_id, None)
+
     def get_task_status(self, tranfer_task_id):
         """
             Querying Task Status
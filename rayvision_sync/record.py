@@ -0,0 +1,141 @@
+"""Record the uploaded files to Redis.
+
+The records are written by a background writer that groups them into
+pipelined ``HSET`` calls, so the loop draining the transmitter output never
+waits for a network round trip.
+
+"""
+
+# Import built-in modules
+import logging
+import threading
+import time
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_redis_client(host='localhost', port=6379, db=2, password=None,
+                     decode_responses=True):
+    """Get a Redis client backed by a connection pool shared in the process.
+
+    Args:
+        host (str): Redis host.
+        port (int): Redis port.
+        db (int): Redis database index.
+        password (str, optional): Redis password.
+        decode_responses (bool): Decode the responses to str.
+
+    Returns:
+        redis.Redis: Redis client.
+
+    """
+    import redis
+    key = (host, int(port), int(db), password, decode_responses)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = redis.ConnectionPool(host=host, port=int(port), db=int(db),
+                                        password=password or None,
+                                        decode_responses=decode_responses)
+            _POOLS[key] = pool
+    return redis.Redis(connection_pool=pool)
+
+
+class RedisRecordWriter(object):
+    """Buffer upload records and flush them to Redis in pipelines.
+
+    The buffer is flushed when it holds ``batch_size`` records or when
+    ``flush_interval`` seconds passed, and once more on ``close``.
+
+    """
+
+    def __init__(self, redis_db, redis_flag=None, batch_size=500,
+                 flush_interval=1.0, logger=None):
+        """Initialize the writer.
+
+        Args:
+            redis_db (redis.Redis): Redis client.
+            redis_flag (str, optional): Redis database tag, default is
+                "upload_done".
+            batch_size (int): Number of records that triggers a flush.
+            flush_interval (float): Maximum seconds a record stays buffered.
+            logger (logging.Logger, optional): Log object.
+
+        """
+        self.redis_db = redis_db
+        self.redis_flag = redis_flag if redis_flag else "upload_done"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.logger = logger or logging.getLogger(__name__)
+        self.error = None
+        self._buffer = {}
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def add(self, path, timestamp=None):
+        """Buffer one uploaded file.
+
+        Args:
+            path (str): Local path of the uploaded file.
+            timestamp (int, optional): Upload time, default is now.
+
+        """
+        with self._condition:
+            self._buffer[path] = int(timestamp or time.time())
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify()
+
+    def flush(self):
+        """Write the buffered records now."""
+        with self._condition:
+            records, self._buffer = self._buffer, {}
+        self._write(records)
+
+    def close(self):
+        """Stop the writer and flush the remaining records.
+
+        Raises:
+            Exception: The last error raised while writing to Redis.
+
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
+        if self.error is not None:
+            raise self.error
+
+    def _run(self):
+        """Flush by count or time window until closed."""
+        while True:
+            with self._condition:
+                if not self._closed and len(self._buffer) < self.batch_size:
+                    self._condition.wait(self.flush_interval)
+                if self._closed:
+                    return
+                records, self._buffer = self._buffer, {}
+            self._write(records)
+
+    def _write(self, records):
+        """Write the records with one pipeline."""
+        if not records:
+            return
+        try:
+            pipe = self.redis_db.pipeline(transaction=False)
+            pipe.hset(self.redis_flag, mapping=records)
+            pipe.execute()
+        except Exception as err:  # pylint: disable=broad-except
+            self.logger.warning("Record %s upload files to redis failed: %s",
+                                len(records), err)
+            self.error = err
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
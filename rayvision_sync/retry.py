@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""Retry policy of the transfers.
+
+A ``RetryPolicy`` decides from the status code of a transfer whether to
+retry it, waits between the attempts with an exponential backoff and
+jitter, and gives up once its attempt or time budget is spent.
+
+"""
+
+# Import built-in modules
+import logging
+import random
+import time
+
+# Import local modules
+from rayvision_sync.constants import COMMAND_NOT_FOUND_CODE
+from rayvision_sync.exception import TransferCancelled
+
+RETRY = "retry"
+FAIL = "fail"
+
+# Status codes of the transmitter, see ``utils.handle_cmd_result``.
+TRANSFER_ACTIONS = {
+    1: FAIL, 2: FAIL, 3: FAIL, 4: FAIL, 5: FAIL, 6: FAIL, 7: FAIL, 8: FAIL,
+    9: FAIL,
+    10: RETRY,
+    11: FAIL,
+    COMMAND_NOT_FOUND_CODE: FAIL,
+}
+
+
+class RetryPolicy(object):
+    """Retry a transfer according to its status code.
+
+    Examples::
+
+        policy = RetryPolicy(max_attempts=5, base_delay=2)
+        result = policy.call(run_cmd, cmd, flag=True)
+
+    """
+
+    def __init__(self, actions=None, default_action=RETRY, max_attempts=10,
+                 max_elapsed=None, base_delay=5, max_delay=600, multiplier=2,
+                 jitter=0.5, before_retry=None, on_giveup=None, logger=None,
+                 sleep=time.sleep, clock=time.time):
+        """Initialize the policy.
+
+        Args:
+            actions (dict, optional): ``RETRY`` or ``FAIL`` by status code,
+                default is ``TRANSFER_ACTIONS``.
+            default_action (str): Action of the status codes not in
+                ``actions``. Negative codes, a process killed by a signal,
+                always fail.
+            max_attempts (int): Maximum number of attempts, None is no limit.
+            max_elapsed (float, optional): Maximum seconds spent on the
+                attempts and the waits, None is no limit.
+            base_delay (float): Seconds to wait before the first retry.
+            max_delay (float): Maximum seconds to wait between two attempts.
+            multiplier (float): Growth of the wait after every retry.
+            jitter (float): Fraction of the wait removed at random, so many
+                failed transfers do not retry at the same time.
+            before_retry (func, optional): Called with the status code, the
+                attempt number and the wait before every retry.
+            on_giveup (func, optional): Called with the status code and the
+                attempt number when the policy gives up.
+            logger (logging.Logger, optional): Log object.
+            sleep (func): Wait function, replaceable in tests.
+            clock (func): Time function, replaceable in tests.
+
+        """
+        self.actions = TRANSFER_ACTIONS if actions is None else actions
+        self.default_action = default_action
+        self.max_attempts = max_attempts
+        self.max_elapsed = max_elapsed
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.before_retry = before_retry
+        self.on_giveup = on_giveup
+        self.logger = logger or logging.getLogger(__name__)
+        self.sleep = sleep
+        self.clock = clock
+
+    def action(self, code):
+        """Get the action of a status code.
+
+        Args:
+            code (int): Status code of the failed attempt.
+
+        Returns:
+            str: ``RETRY`` or ``FAIL``.
+
+        """
+        if code is None or code < 0:
+            return FAIL
+        return self.actions.get(code, self.default_action)
+
+    def delay(self, attempt):
+        """Get the seconds to wait after a failed attempt.
+
+        Args:
+            attempt (int): Number of the failed attempt, starting at 1.
+
+        Returns:
+            float: Seconds to wait.
+
+        """
+        delay = min(self.base_delay * self.multiplier ** (attempt - 1), self.max_delay)
+        return delay * (1 - self.jitter * random.random())
+
+    def call(self, func, *args, **kwargs):
+        """Call a transfer until it succeeds or the policy gives up.
+
+        Args:
+            func (func): Transfer returning a status code, 0 is success.
+            args (set): Positional arguments of ``func``.
+            kwargs (dict): Keyword arguments of ``func``.
+
+        Returns:
+            int: Status code of the last attempt.
+
+        """
+        return self.call_cancellable(None, func, *args, **kwargs)
+
+    def call_cancellable(self, cancel_event, func, *args, **kwargs):
+        """Call a transfer like ``call``, until a cancel event is set.
+
+        The wait between two attempts ends as soon as the event is set.
+
+        Args:
+            cancel_event (threading.Event): Stop retrying once it is set,
+                None never stops.
+            func (func): Transfer returning a status code, 0 is success.
+            args (set): Positional arguments of ``func``.
+            kwargs (dict): Keyword arguments of ``func``.
+
+        Returns:
+            int: Status code of the last attempt.
+
+        Raises:
+            TransferCancelled: ``cancel_event`` was set before an attempt.
+
+        """
+        start = self.clock()
+        attempt = 0
+        while True:
+            attempt += 1
+            if cancel_event is not None and cancel_event.is_set():
+                raise TransferCancelled("The transfer is cancelled before attempt %s" % attempt)
+            result = func(*args, **kwargs)
+            if result == 0:
+                return result
+            delay = self.retry_delay(result, attempt, start)
+            if delay is None:
+                return result
+            if cancel_event is None:
+                self.sleep(delay)
+            elif cancel_event.wait(delay):
+                raise TransferCancelled("The transfer is cancelled after attempt %s" % attempt)
+
+    def retry_delay(self, result, attempt, start):
+        """Decide what follows a failed attempt, for callers waiting by themselves.
+
+        The hooks of the policy are called and the decision is logged.
+
+        Args:
+            result (int): Status code of the failed attempt.
+            attempt (int): Number of the failed attempt, starting at 1.
+            start (float): ``clock`` time of the first attempt.
+
+        Returns:
+            float: Seconds to wait before the next attempt, None to give up.
+
+        """
+        delay = self.delay(attempt)
+        if self._give_up(result, attempt, start, delay):
+            self.logger.info("Give up the transfer after %s attempts, status code is %s",
+                             attempt, result)
+            if self.on_giveup:
+                self.on_giveup(result, attempt)
+            return None
+        self.logger.info("Retrying the transfer in %.1f seconds, status code is %s",
+                         delay, result)
+        if self.before_retry:
+            self.before_retry(result, attempt, delay)
+        return delay
+
+    def _give_up(self, result, attempt, start, delay):
+        """Check whether the failed attempt is the last one."""
+        if self.action(result) == FAIL:
+            return True
+        if self.max_attempts is not None and attempt >= self.max_attempts:
+            return True
+        if self.max_elapsed is not None and self.clock() - start + delay > self.max_elapsed:
+            return True
+        return False
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""Upload the files of an upload.json from a shared work queue.
+
+Instead of cutting the manifest into fixed chunks up front, every free
+worker takes the next small batch of files from a queue. The batch size
+follows the measured time per file, the last batches shrink so the tail of
+the queue is spread over all workers, and the rest of a batch running much
+longer than expected is put back in the queue for the idle workers. The
+manifest is read lazily, only a few batches ahead of the workers, and the
+failed files wait the backoff of the retry policy before they are queued
+again. The transmitters run under a ``TransmitterSupervisor``, so the workers are not
+threads.
+
+"""
+
+# Import built-in modules
+import collections
+import heapq
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import wait
+
+# Import local modules
+from rayvision_sync.bandwidth import acquire_bandwidth
+from rayvision_sync.manifest import AssetWriter
+from rayvision_sync.manifest import iter_asset
+from rayvision_sync.output_parser import EVENT_FILE_DONE
+from rayvision_sync.retry import FAIL
+from rayvision_sync.utils import normalize_local_path
+
+WorkQueueReport = collections.namedtuple(
+    "WorkQueueReport", ["done_files", "failed_files", "batches", "elapsed"])
+
+
+class _Batch(object):
+    """Files uploaded by one transmitter."""
+
+    def __init__(self, number, items, path):
+        self.number = number
+        self.items = items
+        self.path = path
+        self.done = set()
+        self.job = None
+        self.start = None
+        self.split = False
+
+    def on_event(self, event):
+        """Remember the uploaded files."""
+        if event.type == EVENT_FILE_DONE:
+            self.done.add(normalize_local_path(event.path))
+
+    def remaining(self):
+        """Get the files not uploaded yet."""
+        return [item for item in self.items if normalize_local_path(item["local"]) not in self.done]
+
+
+class _WorkQueue(object):
+    """Files waiting for a batch, read from the manifest on demand."""
+
+    def __init__(self, items, clock=time.time):
+        """Initialize the queue.
+
+        Args:
+            items (iterable): Entries of the manifest.
+            clock (func): Time function of the retry delays.
+
+        """
+        self._items = iter(items)
+        self._files = collections.deque()
+        self._delayed = []
+        self._counter = itertools.count()
+        self.clock = clock
+        self.exhausted = False
+
+    def __len__(self):
+        return len(self._files)
+
+    def fill(self, count):
+        """Read the manifest until ``count`` files are waiting."""
+        now = self.clock()
+        while self._delayed and self._delayed[0][0] <= now:
+            self._files.extend(heapq.heappop(self._delayed)[2])
+        while not self.exhausted and len(self._files) < count:
+            try:
+                self._files.append(next(self._items))
+            except StopIteration:
+                self.exhausted = True
+
+    def pending(self):
+        """Check whether some files are still to be uploaded."""
+        return bool(self._files or self._delayed) or not self.exhausted
+
+    def take(self, count):
+        """Take the next files."""
+        return [self._files.popleft() for _ in range(min(count, len(self._files)))]
+
+    def put_first(self, items):
+        """Queue files before all the others."""
+        self._files.extendleft(reversed(items))
+
+    def put_later(self, items, delay):
+        """Queue files once ``delay`` seconds passed."""
+        heapq.heappush(self._delayed, (self.clock() + delay, next(self._counter), items))
+
+    def next_ready(self):
+        """Get the seconds until the next delayed files are queued, None without any."""
+        if not self._delayed:
+            return None
+        return max(0.0, self._delayed[0][0] - self.clock())
+
+
+class WorkQueueUploader(object):
+    """Upload an upload.json with workers pulling batches from a queue.
+
+    Examples::
+
+        uploader = WorkQueueUploader(RayvisionUpload(api), workers=20)
+        report = uploader.run(r"D:/project/upload.json")
+
+    """
+
+    def __init__(self, upload, workers=10, initial_batch=50, min_batch=1, max_batch=5000, target_seconds=60.0,
+                 slow_factor=3.0, max_retries=2, poll_interval=1.0, work_dir=None, retry_policy=None,
+                 clock=time.time):
+        """Initialize the uploader.
+
+        Args:
+            upload (RayvisionUpload): Upload object providing the transmitter
+                commands.
+            workers (int): Number of transmitters running at the same time.
+            initial_batch (int): Files of a batch before any is measured.
+            min_batch (int): Fewest files of a batch.
+            max_batch (int): Most files of a batch.
+            target_seconds (float): Wanted duration of one batch.
+            slow_factor (float): A batch running this many times longer than
+                expected is split once the queue is empty.
+            max_retries (int): Attempts of a file after the first one.
+            poll_interval (float): Seconds between two checks of the batches.
+            work_dir (str, optional): Folder of the batch files, a temporary
+                folder by default.
+            retry_policy (RetryPolicy, optional): Tells which status codes
+                are retried and the wait before the files are queued again,
+                default is the retry policy of ``upload``.
+            clock (func): Time function, replaceable in tests.
+
+        """
+        self.upload = upload
+        self.logger = upload.logger or logging.getLogger(__name__)
+        self.workers = max(1, workers)
+        self.min_batch = max(1, min_batch)
+        self.max_batch = max(self.min_batch, max_batch)
+        self.batch_size = min(max(initial_batch, self.min_batch), self.max_batch)
+        self.target_seconds = target_seconds
+        self.slow_factor = slow_factor
+        self.max_retries = max_retries
+        self.poll_interval = poll_interval
+        self.work_dir = work_dir
+        self.retry_policy = retry_policy or upload.retry_policy
+        self.clock = clock
+        self.file_seconds = None
+
+    def run(self, upload_json_path, max_speed=None, server_ip=None, server_port=None, network_mode=0):
+        """Upload all the files of an upload.json.
+
+        Args:
+            upload_json_path (str): Path to the upload.json file.
+            max_speed (str): Maximum transmission speed, default value
+                is 1048576 KB/S.
+            server_ip (str): Transport server IP.
+            server_port (str): Transport server port.
+            network_mode (int): network mode: 0: auto selected, default;
+                                               1: tcp;
+                                               2: udp;
+
+        Returns:
+            WorkQueueReport: Number of uploaded files, paths of the failed
+                files, number of batches and seconds spent.
+
+        """
+        start = self.clock()
+        max_speed = max_speed if max_speed is not None else "1048576"
+        main_input_bid, main_user_id = self.upload.share_info.resolve()
+        work_dir = self.work_dir or tempfile.mkdtemp(prefix="rayvision_batches_")
+        if not os.path.exists(work_dir):
+            os.makedirs(work_dir)
+        env = self.upload.trans.runtime.env()
+
+        def launch(batch):
+            """Start the transmitter of a batch."""
+            lease = acquire_bandwidth(self.upload.bandwidth, max_speed, network_mode=network_mode)
+            cmd = self.upload.asset_cmd(batch.path, lease.speed, False, "aspera", server_ip, server_port,
+                                        "upload_json", network_mode, main_input_bid, main_user_id)
+            batch.start = self.clock()
+            batch.job = supervisor.submit(cmd, env=env, callback=batch.on_event)
+            batch.job.future.add_done_callback(lambda _: lease.release())
+
+        queue = _WorkQueue(iter_asset(upload_json_path), self.clock)
+        attempts = collections.Counter()
+        failed_files = []
+        done_files = 0
+        running = {}
+        batch_count = 0
+        # Imported here, the supervisor needs selectors that Python 2 lacks.
+        from rayvision_sync.supervisor import TransmitterSupervisor  # pylint: disable=import-outside-toplevel
+        supervisor = TransmitterSupervisor(self.logger)
+        try:
+            while running or queue.pending():
+                while len(running) < self.workers:
+                    queue.fill(self.batch_size * self.workers)
+                    if not queue:
+                        break
+                    batch_count += 1
+                    batch = self._next_batch(queue, batch_count, work_dir)
+                    launch(batch)
+                    running[batch.job.future] = batch
+                if not running:
+                    # Only files waiting for their retry delay are left.
+                    time.sleep(min(self.poll_interval, queue.next_ready() or 0))
+                    continue
+                done, _ = wait(list(running), timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = running.pop(future)
+                    done_files += self._finish(batch, future.result(), queue, attempts, failed_files)
+                if queue.exhausted and not queue and len(running) < self.workers:
+                    self._split_slow(running.values())
+        finally:
+            for batch in running.values():
+                batch.job.cancel()
+            supervisor.shutdown(wait=True)
+            if not self.work_dir:
+                shutil.rmtree(work_dir, ignore_errors=True)
+        return WorkQueueReport(done_files, failed_files, batch_count, self.clock() - start)
+
+    def _next_batch(self, queue, number, work_dir):
+        """Take the next batch from the queue and write its upload.json."""
+        size = self.batch_size
+        if queue.exhausted:
+            # The whole tail is read, it is shared by all workers.
+            size = min(size, max(self.min_batch, -(-len(queue) // self.workers)))
+        items = queue.take(size)
+        path = os.path.join(work_dir, "batch_%s.json" % number)
+        with AssetWriter(path) as writer:
+            for item in items:
+                writer.write(item)
+        return _Batch(number, items, path)
+
+    def _finish(self, batch, result, queue, attempts, failed_files):
+        """Measure a finished batch and queue its remaining files again.
+
+        The files of a failed batch are queued once the retry policy
+        backoff passed, unless the policy does not retry its status code.
+
+        Returns:
+            int: Number of files uploaded by the batch.
+
+        """
+        elapsed = self.clock() - batch.start
+        remaining = [] if result == 0 else batch.remaining()
+        uploaded = len(batch.items) - len(remaining)
+        if uploaded:
+            self._measure(elapsed / uploaded)
+        if batch.split:
+            # The files of a split batch go first, they are the tail of the work.
+            queue.put_first(remaining)
+        elif remaining:
+            give_up = self.retry_policy.action(result) == FAIL
+            retried = []
+            for item in remaining:
+                key = normalize_local_path(item["local"])
+                attempts[key] += 1
+                if give_up or attempts[key] > self.max_retries:
+                    failed_files.append(item["local"])
+                else:
+                    retried.append(item)
+            delay = 0
+            if retried:
+                delay = self.retry_policy.delay(max(attempts[normalize_local_path(item["local"])]
+                                                    for item in retried))
+                queue.put_later(retried, delay)
+            self.logger.info("Batch %s ended with status code %s, %s files are queued again in %.1fs",
+                             batch.number, result, len(retried), delay)
+        try:
+            os.remove(batch.path)
+        except OSError:
+            pass
+        return uploaded
+
+    def _measure(self, file_seconds):
+        """Update the time per file and the batch size."""
+        if self.file_seconds is None:
+            self.file_seconds = file_seconds
+        else:
+            self.file_seconds = 0.7 * self.file_seconds + 0.3 * file_seconds
+        size = int(self.target_seconds / max(self.file_seconds, 1e-6))
+        self.batch_size = min(max(size, self.min_batch), self.max_batch)
+
+    def _split_slow(self, batches):
+        """Stop the batches running much longer than expected."""
+        if self.file_seconds is None:
+            return
+        now = self.clock()
+        for batch in batches:
+            if batch.split or len(batch.items) - len(batch.done) < 2:
+                continue
+            expected = len(batch.items) * self.file_seconds
+            if now - batch.start > self.slow_factor * expected:
+                self.logger.info("Batch %s is slow, its remaining files are shared with the idle workers",
+                                 batch.number)
+                batch.split = True
+                batch.job.cancel()
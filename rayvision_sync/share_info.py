@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Cache the main account information of the transfers.
+
+``utils.get_share_info`` asks the API for the main account of a shared
+account, every upload and every downloaded output used to ask again.
+``ShareInfoResolver`` keeps the answer for a while; concurrent callers
+finding it expired wait for one request instead of sending their own.
+
+"""
+
+# Import built-in modules
+import threading
+import time
+
+# Import local modules
+from rayvision_sync.utils import get_share_info
+
+
+class ShareInfoResolver(object):
+    """Thread-safe TTL cache of ``utils.get_share_info``.
+
+    Examples::
+
+        resolver = ShareInfoResolver(api, ttl=300)
+        main_input_bid, main_user_id = resolver.resolve()
+
+    """
+
+    def __init__(self, api, ttl=300, clock=time.time):
+        """Initialize the resolver.
+
+        Args:
+            api (object): rayvision api object.
+            ttl (float): Seconds the main account information is kept.
+            clock (func): Time function, replaceable in tests.
+
+        """
+        self.api = api
+        self.ttl = ttl
+        self.clock = clock
+        self._value = None
+        self._expires = 0
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+
+    def resolve(self):
+        """Get the main account information.
+
+        Returns:
+            tuple: Main account input bid and user id.
+
+        """
+        value = self._cached()
+        if value is not None:
+            return value
+        # Only one caller fetches, the others find its answer once they get the lock.
+        with self._fetch_lock:
+            value = self._cached()
+            if value is not None:
+                return value
+            value = get_share_info(self.api)
+            with self._lock:
+                self._value = value
+                self._expires = self.clock() + self.ttl
+            return value
+
+    def invalidate(self):
+        """Forget the main account information, the next call asks again."""
+        with self._lock:
+            self._value = None
+            self._expires = 0
+
+    def _cached(self):
+        """Get the cached information, None once it expired."""
+        with self._lock:
+            if self._value is not None and self.clock() < self._expires:
+                return self._value
+            return None
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""Supervise many transmitter processes from one thread.
+
+Every process gets its own ``TransmitterOutputParser`` and completion
+future, but all their pipes are read by a single thread multiplexing them
+with ``selectors``. Windows cannot select on pipes, there each process is
+read by its own thread instead.
+
+"""
+
+# Import built-in modules
+import collections
+import logging
+import os
+import selectors
+import subprocess
+import threading
+from concurrent.futures import Future
+
+# Import local modules
+from rayvision_sync.constants import COMMAND_NOT_FOUND_CODE
+from rayvision_sync.output_parser import TransmitterOutputParser
+from rayvision_sync.utils import handle_cmd_result
+
+READ_SIZE = 65536
+
+
+class TransmitterJob(object):
+    """One transmitter process watched by the supervisor."""
+
+    def __init__(self, argv, parser, flag, callback):
+        """Initialize the job.
+
+        Args:
+            argv (list): Transmitter executable followed by its arguments.
+            parser (TransmitterOutputParser): Parser of the output.
+            flag (bool): Passed to ``utils.handle_cmd_result``.
+            callback (func): Called with every ``TransmitterEvent``.
+
+        """
+        self.argv = argv
+        self.parser = parser
+        self.flag = flag
+        self.callback = callback
+        self.future = Future()
+        self.process = None
+        self._buffer = b""
+
+    def cancel(self):
+        """Kill the process, the future gets its status code."""
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+
+    def feed(self, data, log):
+        """Parse the complete lines of a chunk of output."""
+        lines = (self._buffer + data).split(b"\n")
+        self._buffer = lines.pop()
+        for line in lines:
+            self.handle_line(line, log)
+
+    def finish(self, log):
+        """Parse the last line and resolve the future."""
+        if self._buffer:
+            self.handle_line(self._buffer, log)
+            self._buffer = b""
+        returncode = self.process.wait()
+        try:
+            self.future.set_result(handle_cmd_result(self.flag, returncode, self.parser.errors, log))
+        except Exception as err:  # pylint: disable=broad-except
+            self.future.set_exception(err)
+
+    def handle_line(self, line, log):
+        """Log and forward one line."""
+        event = self.parser.parse_line(line)
+        if event is None:
+            return
+        log(event.line)
+        if self.callback:
+            self.callback(event)
+
+
+class TransmitterSupervisor(object):
+    """Spawn transmitter processes and read all their output on one thread.
+
+    Examples::
+
+        supervisor = TransmitterSupervisor(logger)
+        jobs = [supervisor.submit(argv, env=env) for argv in argv_list]
+        codes = [job.future.result() for job in jobs]
+        supervisor.shutdown()
+
+    """
+
+    def __init__(self, logger=None, print_log=True):
+        """Initialize the supervisor.
+
+        Args:
+            logger (logging.Logger, optional): Log object.
+            print_log (bool, optional): Print log, True: print, False: not
+                print.
+
+        """
+        logger = logger or logging.getLogger(__name__)
+        self._log = logger.info if print_log else logger.debug
+        self._use_selector = os.name != "nt"
+        self._lock = threading.Lock()
+        self._pending = collections.deque()
+        self._running = 0
+        self._closed = False
+        self._thread = None
+        if self._use_selector:
+            self._selector = selectors.DefaultSelector()
+            self._wake_read, self._wake_write = os.pipe()
+            os.set_blocking(self._wake_read, False)
+            self._selector.register(self._wake_read, selectors.EVENT_READ)
+
+    def submit(self, argv, env=None, answer="y", flag=True, parser=None, callback=None):
+        """Start a transmitter process.
+
+        Args:
+            argv (list): Transmitter executable followed by its arguments.
+            env (dict, optional): Environment of the process.
+            answer (str, optional): Written to the stdin of the process.
+            flag (bool, optional): Passed to ``utils.handle_cmd_result``.
+            parser (TransmitterOutputParser, optional): Parser of the output.
+            callback (func, optional): Called with every ``TransmitterEvent``
+                on the reading thread.
+
+        Returns:
+            TransmitterJob: The job, ``job.future`` gets the status code.
+
+        """
+        if self._closed:
+            raise RuntimeError("cannot submit after shutdown")
+        job = TransmitterJob(argv, parser or TransmitterOutputParser(), flag, callback)
+        self._log(u'cmd...%s', subprocess.list2cmdline(argv))
+        try:
+            job.process = subprocess.Popen(argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                           stderr=subprocess.STDOUT, env=env)
+        except OSError as err:
+            job.future.set_result(handle_cmd_result(flag, COMMAND_NOT_FOUND_CODE, [str(err)], self._log))
+            return job
+        try:
+            if answer:
+                job.process.stdin.write((answer + "\n").encode("utf-8"))
+            job.process.stdin.close()
+        except (IOError, OSError):
+            pass
+
+        if not self._use_selector:
+            self._watch_with_thread(job)
+            return job
+        with self._lock:
+            if self._closed:
+                job.process.kill()
+                job.process.wait()
+                raise RuntimeError("cannot submit after shutdown")
+            self._pending.append(job)
+            self._running += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+        os.write(self._wake_write, b"x")
+        return job
+
+    def shutdown(self, wait=True):
+        """Stop accepting processes, optionally wait for the running ones."""
+        with self._lock:
+            closed, self._closed = self._closed, True
+            thread = self._thread
+        if self._use_selector and not closed:
+            if thread is None:
+                self._close_selector()
+            else:
+                os.write(self._wake_write, b"x")
+        if wait and thread is not None:
+            thread.join()
+
+    def _watch_with_thread(self, job):
+        """Read the output of one process on its own thread."""
+
+        def read():
+            """Drain the output then resolve the future."""
+            try:
+                for line in iter(job.process.stdout.readline, b""):
+                    job.handle_line(line, self._log)
+            finally:
+                job.finish(self._log)
+
+        thread = threading.Thread(target=read)
+        thread.daemon = True
+        thread.start()
+
+    def _run(self):
+        """Multiplex the pipes of all running processes."""
+        while True:
+            with self._lock:
+                while self._pending:
+                    job = self._pending.popleft()
+                    stdout = job.process.stdout
+                    os.set_blocking(stdout.fileno(), False)
+                    self._selector.register(stdout.fileno(), selectors.EVENT_READ, job)
+                if self._closed and not self._running:
+                    break
+            for key, _ in self._selector.select():
+                if key.data is None:
+                    try:
+                        os.read(self._wake_read, READ_SIZE)
+                    except BlockingIOError:
+                        pass
+                    continue
+                self._read(key)
+        self._close_selector()
+
+    def _close_selector(self):
+        """Release the selector and the wake-up pipe."""
+        self._selector.close()
+        os.close(self._wake_read)
+        os.close(self._wake_write)
+
+    def _read(self, key):
+        """Read the available output of one process."""
+        job = key.data
+        try:
+            data = os.read(key.fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        if data:
+            try:
+                job.feed(data, self._log)
+            except Exception as err:  # pylint: disable=broad-except
+                self._log("Handle the transmitter output failed: %s", err)
+            return
+        self._selector.unregister(key.fd)
+        job.process.stdout.close()
+        job.finish(self._log)
+        with self._lock:
+            self._running -= 1
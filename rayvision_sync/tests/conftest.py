@@ -48,6 +48,42 @@ def user_info():
     }
 
 
+@pytest.fixture()
+def task_info_list():
+    """Get the task_info_list information."""
+    return [
+        {
+            "id": 6419169,
+            "taskStatus": 30,
+            "statusText": "render_task_status_0",
+            "isOpen": 0,
+            "outputFileName": "test_info_1",
+            "userId": "1001",
+            "bid": "121"
+        },
+        {
+            "id": 647611,
+            "taskStatus": 35,
+            "statusText": "render_task_status_-1",
+            "isOpen": 1,
+            "outputFileName": "test_info_2",
+            "respRenderingTaskList": [
+                {
+                    "id": 6416355,
+                    "taskStatus": 45,
+                    "statusText": "render_task_status_-2",
+                    "isOpen": 1,
+                    "outputFileName": "test_info_3",
+                    "userId": "1002",
+                    "bid": "122"
+                }
+            ],
+            "userId": "1002",
+            "bid": "122"
+        }
+    ]
+
+
 @pytest.fixture()
 def expected_result():
     """Get the expected_result information."""
@@ -61,7 +97,11 @@ def expected_result():
             'task_status_code': '30',
             'output_file_name': 'test_info_1',
             'userId': '1001',
-            'bid': "121"
+            'bid': "121",
+            'total_frames': None,
+            'done_frames': None,
+            'executing_frames': None,
+            'start_time': None
         },
         {
             'task_id': '647611',
@@ -75,7 +115,11 @@ def expected_result():
                     'task_status_code': '45',
                     'output_file_name': 'test_info_3',
                     'userId': '1002',
-                    "bid": "122"
+                    "bid": "122",
+                    'total_frames': None,
+                    'done_frames': None,
+                    'executing_frames': None,
+                    'start_time': None
                 }
             ],
             'task_status_description': 'Abort',
@@ -84,7 +128,11 @@ def expected_result():
             'task_status_code': '35',
             'output_file_name': 'test_info_2',
             'userId': '1002',
-            "bid": "122"
+            "bid": "122",
+            'total_frames': None,
+            'done_frames': None,
+            'executing_frames': None,
+            'start_time': None
         }
     ]
 
@@ -0,0 +1,90 @@
+"""Test the rayvision_sync async_transfer functions."""
+
+import asyncio
+import sys
+import time
+
+# pylint: disable=import-error
+import pytest
+
+from rayvision_sync import async_transfer
+from rayvision_sync.async_transfer import AsyncRayvisionDownload
+from rayvision_sync.async_transfer import AsyncRayvisionUpload
+from rayvision_sync.exception import DownloadFailed
+from rayvision_sync.exception import RayvisionError
+from rayvision_sync.retry import RetryPolicy
+
+
+def test_run_cmd_async():
+    """Test the answer is written to stdin and the status code returned."""
+    argv = [sys.executable, "-c", "import sys; sys.exit(0 if input() == 'y' else 1)"]
+    assert asyncio.run(async_transfer.run_cmd_async(argv)) == 0
+
+
+def test_run_cmd_async_not_found():
+    """Test a missing executable gives the shell status code."""
+    assert asyncio.run(async_transfer.run_cmd_async(["/not/exists/transmitter"])) == 127
+
+
+def test_run_cmd_async_cancel():
+    """Test cancelling a transfer kills its process."""
+    argv = [sys.executable, "-c", "import time; time.sleep(30)"]
+
+    async def cancel_soon():
+        task = asyncio.ensure_future(async_transfer.run_cmd_async(argv))
+        await asyncio.sleep(0.5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    start = time.time()
+    asyncio.run(cancel_soon())
+    assert time.time() - start < 10
+
+
+def test_upload_asset_concurrent(rayvision_upload, tmpdir):
+    """Test many uploads run on one event loop."""
+    upload = AsyncRayvisionUpload(rayvision_upload, max_concurrency=4)
+    upload_json_path = str(tmpdir.join("upload.json"))
+
+    async def upload_all():
+        return await asyncio.gather(*[
+            upload.upload_asset(upload_json_path, is_db=False) for _ in range(8)], return_exceptions=True)
+
+    results = asyncio.run(upload_all())
+    assert [err.error_code for err in results] == [200026] * 8
+
+
+def test_upload_asset_raysync(rayvision_upload, tmpdir, mocker):
+    """Test the Raysync task is polled until it ends."""
+    mocker.patch.object(async_transfer, "STATU_SLEEP", 0.01)
+    engine = mocker.patch.object(rayvision_upload, "raysync_engine")
+    engine.prepare_transfer.return_value = 7
+    engine.check_task_status.side_effect = [None, None, 0]
+    upload = AsyncRayvisionUpload(rayvision_upload)
+    result = asyncio.run(upload.upload_asset(str(tmpdir.join("upload.json")),
+                                             engine_type="raysyncproxy",
+                                             server_ip="127.0.0.1", server_port="10200"))
+    assert result is True
+    assert engine.check_task_status.call_count == 3
+
+
+def test_upload_asset_retry(rayvision_upload, tmpdir, mocker):
+    """Test a failed upload is retried with the retry policy."""
+    mocker.patch.object(async_transfer, "STATU_SLEEP", 0.01)
+    engine = mocker.patch.object(rayvision_upload, "raysync_engine")
+    engine.check_task_status.side_effect = [10, 11]
+    rayvision_upload.retry_policy = RetryPolicy(base_delay=0.01)
+    upload = AsyncRayvisionUpload(rayvision_upload)
+    with pytest.raises(RayvisionError) as err:
+        asyncio.run(upload.upload_asset(str(tmpdir.join("upload.json")), engine_type="raysyncproxy",
+                                        server_ip="127.0.0.1", server_port="10200"))
+    assert err.value.error_code == 200025
+    assert engine.prepare_transfer.call_count == 2
+
+
+def test_download_failed(rayvision_download, tmpdir):
+    """Test a failed output raises DownloadFailed."""
+    download = AsyncRayvisionDownload(rayvision_download)
+    with pytest.raises(DownloadFailed):
+        asyncio.run(download.download(server_path="1_test", local_path=str(tmpdir)))
@@ -0,0 +1,90 @@
+"""Test the rayvision_sync bandwidth functions."""
+
+import threading
+import time
+
+from rayvision_sync.bandwidth import BandwidthCoordinator
+from rayvision_sync.bandwidth import acquire_bandwidth
+
+
+def test_equal_shares():
+    """Test the total speed is split between the active transfers."""
+    bandwidth = BandwidthCoordinator(total_speed=10000, min_speed=100)
+    leases = [bandwidth.acquire() for _ in range(4)]
+    assert [lease.speed for lease in leases] == ["2500"] * 4
+    leases[0].release()
+    assert sorted(lease.speed for lease in leases[1:]) == ["3333", "3333", "3334"]
+    assert bandwidth.active == 3
+
+
+def test_small_asks_keep_their_limit():
+    """Test a transfer asking for less leaves the rest to the others."""
+    bandwidth = BandwidthCoordinator(total_speed=10000, min_speed=100)
+    small = bandwidth.acquire(max_speed="1000")
+    large = bandwidth.acquire()
+    assert small.speed == "1000"
+    assert large.speed == "9000"
+
+
+def test_ask_below_min_speed():
+    """Test a transfer asking for less than the minimum keeps its limit."""
+    bandwidth = BandwidthCoordinator(total_speed=10000)
+    small = bandwidth.acquire(max_speed="100")
+    large = bandwidth.acquire()
+    assert small.speed == "100"
+    assert large.speed == "9900"
+
+
+def test_min_speed():
+    """Test a share never goes below the minimum the total allows."""
+    bandwidth = BandwidthCoordinator(total_speed=1000, min_speed=400)
+    leases = [bandwidth.acquire() for _ in range(2)]
+    assert set(lease.speed for lease in leases) == {"500"}
+    leases.extend(bandwidth.acquire() for _ in range(3))
+    assert set(lease.speed for lease in leases) == {"200"}
+
+
+def test_raysync_speed_pushed(mocker):
+    """Test the Raysync client gets the sum of the shares of its tasks."""
+    engine = mocker.Mock()
+    bandwidth = BandwidthCoordinator(total_speed=9000, min_speed=100)
+    first = bandwidth.acquire(engine=engine)
+    engine.set_transfer_speed.assert_called_with(9000, 0)
+    second = bandwidth.acquire(engine=engine, network_mode=1)
+    engine.set_transfer_speed.assert_called_with(9000, 1)
+    with acquire_bandwidth(bandwidth):
+        engine.set_transfer_speed.assert_called_with(6000, 1)
+        assert first.engine_speed == "6000"
+    engine.set_transfer_speed.assert_called_with(9000, 1)
+    second.release()
+    first.release()
+    assert bandwidth.active == 0
+
+
+def test_raysync_speed_pushes_serialized(mocker):
+    """Test the speeds are set one at a time and the latest one wins."""
+    calls = []
+    running = []
+
+    def set_transfer_speed(speed, network_mode):
+        running.append(speed)
+        time.sleep(0.01)
+        calls.append((len(running), speed))
+        running.pop()
+
+    engine = mocker.Mock()
+    engine.set_transfer_speed.side_effect = set_transfer_speed
+    bandwidth = BandwidthCoordinator(total_speed=9000, min_speed=100)
+    threads = [threading.Thread(target=bandwidth.acquire, kwargs={"engine": engine}) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [count for count, _ in calls] == [1] * 4
+    assert calls[-1][1] == 9000
+
+
+def test_without_coordinator():
+    """Test the asked speed is used as is without coordinator."""
+    assert acquire_bandwidth(None, "2048").speed == "2048"
+    assert acquire_bandwidth(None).speed == "1048576"
@@ -0,0 +1,82 @@
+"""Test the rayvision_sync bootstrap_cache functions."""
+
+import os
+import stat
+import sys
+
+# pylint: disable=import-error
+import pytest
+
+from rayvision_sync.bootstrap_cache import BootstrapCache
+from rayvision_sync.context import TransferContext
+from rayvision_sync.transfer import RayvisionTransfer
+
+
+@pytest.fixture()
+def cache(tmpdir, mocker):
+    """Create a cache in a new folder."""
+    return BootstrapCache(str(tmpdir.join("sdk", "bootstrap_cache.json")), ttl=60,
+                          clock=mocker.Mock(return_value=1000))
+
+
+def test_put_get(cache):
+    """Test the entries expire after the TTL."""
+    key = BootstrapCache.key("task.renderbus.com", "2", "100")
+    assert cache.get(key, "raysync_user_key") is None
+    cache.put(key, "raysync_user_key", "secret")
+    assert BootstrapCache(cache.path, clock=cache.clock).get(key, "raysync_user_key") == "secret"
+    cache.clock.return_value = 1060
+    assert cache.get(key, "raysync_user_key") is None
+
+
+def test_invalidate(cache):
+    """Test the entries of a user are forgotten."""
+    cache.put("a", "lines", {"aspera": {}})
+    cache.put("b", "lines", {"aspera": {}})
+    cache.invalidate("a")
+    assert cache.get("a", "lines") is None
+    assert cache.get("b", "lines") == {"aspera": {}}
+    cache.invalidate()
+    assert cache.get("b", "lines") is None
+
+
+@pytest.mark.skipif(sys.platform.startswith("win"), reason="POSIX permissions")
+def test_file_private(cache):
+    """Test the file is replaced atomically and readable by the user only."""
+    cache.put("a", "raysync_user_key", "secret")
+    assert stat.S_IMODE(os.stat(cache.path).st_mode) == 0o600
+    assert os.listdir(os.path.dirname(cache.path)) == ["bootstrap_cache.json"]
+
+
+def test_broken_file(cache):
+    """Test a broken file is an empty cache."""
+    cache.put("a", "lines", {})
+    with open(cache.path, "w") as cache_file:
+        cache_file.write("{broken")
+    assert cache.get("a", "lines") is None
+
+
+def test_context_uses_cache(api, cache, mocker):
+    """Test a second process skips the bootstrap requests until a transfer fails."""
+    user_key = mocker.patch.object(api.query, "get_raysync_user_key", return_value={"raySyncUserKey": "key"})
+    lines = mocker.patch.object(RayvisionTransfer, "parse_service_transfe_line",
+                                return_value={"aspera": {"server_ip": "1.2.3.4"}})
+    for _ in range(2):
+        context = TransferContext(api, bootstrap_cache=cache)
+        assert context.trans.transport_info == {"aspera": {"server_ip": "1.2.3.4"}}
+        assert context.raysync_engine is not None
+    assert lines.call_count == 1
+    assert user_key.call_count == 1
+
+    context.transfer_failed(11)
+    assert context.trans.transport_info is not None
+    assert lines.call_count == 1
+    engine = context.raysync_engine
+    user_key.return_value = {"raySyncUserKey": "new_key"}
+    context.transfer_failed(10)
+    assert context.trans.transport_info is not None
+    assert lines.call_count == 2
+    # The client and its running tasks are kept, only its key changes.
+    assert context.raysync_engine is engine
+    assert engine.password.startswith("new_key&")
+    assert user_key.call_count == 2
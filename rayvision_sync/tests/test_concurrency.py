@@ -0,0 +1,60 @@
+"""Test the rayvision_sync concurrency functions."""
+
+from rayvision_sync.concurrency import AdaptiveConcurrency
+
+
+class FakeClock(object):
+    """Clock moved by hand."""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def measure(controller, clock, size):
+    """Report some bytes over one interval and close the window."""
+    controller.record_bytes(size)
+    clock.now += controller.interval
+    return controller.update()
+
+
+def test_additive_increase():
+    """Test the limit grows while the throughput holds."""
+    clock = FakeClock()
+    controller = AdaptiveConcurrency(initial=2, max_workers=5, clock=clock)
+    assert [measure(controller, clock, 100 * index) for index in range(1, 6)] == [3, 4, 5, 5, 5]
+
+
+def test_decrease_on_throughput_drop():
+    """Test the limit shrinks when the throughput drops."""
+    clock = FakeClock()
+    controller = AdaptiveConcurrency(initial=4, clock=clock)
+    assert measure(controller, clock, 1000) == 5
+    assert measure(controller, clock, 500) == 4
+
+
+def test_multiplicative_decrease():
+    """Test failures halve the limit once per interval."""
+    clock = FakeClock()
+    controller = AdaptiveConcurrency(initial=16, min_workers=2, clock=clock)
+    controller.record_failure()
+    controller.record_failure()
+    assert controller.limit == 8
+    assert measure(controller, clock, 1000) == 8
+    controller.record_failure()
+    assert controller.limit == 4
+    clock.now += controller.interval
+    controller.record_failure()
+    controller.record_failure()
+    assert controller.limit == 2
+
+
+def test_update_within_interval():
+    """Test the limit does not move before the window closes."""
+    clock = FakeClock()
+    controller = AdaptiveConcurrency(initial=3, clock=clock)
+    controller.record_bytes(1000)
+    assert controller.update() == 3
+    assert controller.history == []
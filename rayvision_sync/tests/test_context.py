@@ -0,0 +1,59 @@
+"""Test the rayvision_sync context functions."""
+
+import threading
+
+from rayvision_sync import upload as upload_module
+from rayvision_sync.context import TransferContext
+from rayvision_sync.download import RayvisionDownload
+from rayvision_sync.transfer import RayvisionTransfer
+from rayvision_sync.upload import RayvisionUpload
+
+
+def test_construction_is_lazy(api, mocker):
+    """Test building the transfers asks nothing to the API."""
+    user_key = mocker.patch.object(api.query, "get_raysync_user_key", return_value={"raySyncUserKey": "key"})
+    lines = mocker.patch.object(RayvisionTransfer, "parse_service_transfe_line", return_value={})
+    context = TransferContext(api)
+    upload = RayvisionUpload(api, context=context)
+    download = RayvisionDownload(api, context=context)
+    assert not user_key.called
+    assert not lines.called
+
+    assert upload.trans is download.trans
+    assert not lines.called
+    assert upload.trans.transport_info == {}
+    assert upload.raysync_engine is download.raysync_engine
+    assert user_key.call_count == 1
+    assert lines.call_count == 1
+    assert upload.share_info is download.share_info
+
+
+def test_resolve_once(api, mocker):
+    """Test concurrent threads share one Raysync client."""
+    user_key = mocker.patch.object(api.query, "get_raysync_user_key", return_value={"raySyncUserKey": "key"})
+    context = TransferContext(api)
+    engines = []
+    threads = [threading.Thread(target=lambda: engines.append(context.raysync_engine)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(id(engine) for engine in engines)) == 1
+    assert user_key.call_count == 1
+
+
+def test_override(rayvision_upload, mocker):
+    """Test a transfer attribute can still be replaced."""
+    engine = mocker.Mock()
+    rayvision_upload.raysync_engine = engine
+    assert rayvision_upload.raysync_engine is engine
+    del rayvision_upload.raysync_engine
+    assert rayvision_upload.raysync_engine is rayvision_upload.context.raysync_engine
+
+
+def test_setx_only_on_windows(rayvision_upload, mocker, tmpdir):
+    """Test the transfer log path is not saved with setx on Linux."""
+    popen = mocker.patch.object(upload_module.subprocess, "Popen")
+    mocker.patch.object(upload_module.sys, "platform", "linux")
+    rayvision_upload.check_transfer_log_path(str(tmpdir))
+    assert not popen.called
@@ -1,10 +1,17 @@
 """Test the rayvision_sync download functions."""
 
+import threading
+import time
+
 # pylint: disable=import-error
 import pytest
 
 from rayvision_sync.manage import RayvisionManageTask
 from rayvision_sync.exception import DownloadFailed
+from rayvision_sync.polling import PollScheduler
+from rayvision_sync.rayvision_raysync.transfer_raysync import RayvisionTransferRaysync
+from rayvision_sync.rayvision_raysync.url import ApiUrl
+from rayvision_sync.retry import RetryPolicy
 
 
 @pytest.mark.parametrize('task_id_list,max_speed,sleep_time', [
@@ -49,4 +56,135 @@ def test_auto_download_after_task_completed(rayvision_download, task_id_list,
                                          'get_task_status')
     mocker_task_id.return_value = expected_result
     with pytest.raises(DownloadFailed):
-        rayvision_download.download(task_id_list, max_speed, sleep_time)
\ No newline at end of file
+        rayvision_download.download(task_id_list, max_speed, sleep_time)
+
+
+def test_auto_download_batched_status(rayvision_download, task_info_list, mocker):
+    """Test auto_download asks the status of all the tasks once per cycle."""
+    mocker_task_info = mocker.patch.object(rayvision_download.api.query, 'task_info')
+    ended_task = task_info_list[0]
+    mocker_task_info.return_value = {'items': [ended_task, dict(ended_task, id=6419170)]}
+    mocker_download = mocker.patch.object(rayvision_download, '_download_output', return_value=0)
+    rayvision_download.auto_download([6419169, 6419170], sleep_time=0)
+    assert mocker_task_info.call_count == 1
+    assert mocker_download.call_count == 2
+
+
+def test_download_workers_report_failed_outputs(rayvision_download, expected_result, mocker, tmpdir):
+    """Test a failed output does not stop the others, and is reported."""
+    task_status_list = [expected_result[0], dict(expected_result[0], task_id='6419170',
+                                                 output_file_name='test_info_2')]
+    mocker.patch.object(RayvisionManageTask, 'get_task_status', return_value=task_status_list)
+    mocker.patch.object(rayvision_download.retry_policy, 'sleep')
+
+    def download_output(output_file_name, *args, **kwargs):
+        return 1 if output_file_name["output_name"] == "test_info_1" else 0
+
+    mocker_download = mocker.patch.object(rayvision_download, '_download_output', side_effect=download_output)
+    with pytest.raises(DownloadFailed) as err:
+        rayvision_download.download([6419169, 6419170], local_path=str(tmpdir), workers=4)
+    assert [(report.task_id, report.output_name, report.code) for report in err.value.failed_outputs] == [
+        (6419169, "test_info_1", 1)]
+    called = set(call[0][0]["output_name"] for call in mocker_download.call_args_list)
+    assert called == {"test_info_1", "test_info_2"}
+
+
+def test_auto_download_after_task_completed_isolates_tasks(rayvision_download, task_info_list, mocker, tmpdir):
+    """Test the tasks ending together are downloaded, only the failed ones are reported."""
+    ended_task = task_info_list[0]
+    mocker.patch.object(rayvision_download.api.query, 'task_info', return_value={
+        'items': [ended_task, dict(ended_task, id=6419170, outputFileName="test_info_2")]})
+    mocker.patch("rayvision_sync.download.time.sleep")
+    mocker.patch.object(rayvision_download.retry_policy, 'sleep')
+    mocker.patch.object(rayvision_download, '_download_output', side_effect=lambda output_file_name, *args,
+                        **kwargs: 1 if output_file_name["output_name"] == "test_info_2" else 0)
+    with pytest.raises(DownloadFailed) as err:
+        rayvision_download.auto_download_after_task_completed([6419169, 6419170], local_path=str(tmpdir),
+                                                              workers=2)
+    assert [report.task_id for report in err.value.failed_outputs] == [6419170]
+
+
+def test_auto_download_poll_scheduler(rayvision_download, task_info_list, mocker):
+    """Test auto_download only checks the tasks whose check is due."""
+    # One frame done in 4 seconds at the first check.
+    running_task = dict(task_info_list[0], taskStatus=5, doneFrames=1, executingFrames=1, startTime=6000)
+    mocker_task_info = mocker.patch.object(rayvision_download.api.query, 'task_info', side_effect=[
+        {'items': [running_task, dict(running_task, id=6419170, taskStatus=0, executingFrames=0)]},
+        {'items': [dict(running_task, taskStatus=25)]},
+        {'items': [dict(running_task, id=6419170, taskStatus=25)]},
+    ])
+    mocker.patch.object(rayvision_download, '_download_output', return_value=0)
+    clock = mocker.Mock(return_value=0.0)
+    mocker.patch("rayvision_sync.download.time.sleep", side_effect=lambda seconds: setattr(
+        clock, "return_value", clock.return_value + seconds))
+    scheduler = PollScheduler(interval=10, min_interval=2, max_interval=100, clock=clock)
+    rayvision_download.auto_download([6419169, 6419170], poll_scheduler=scheduler)
+    assert [call[0][0] for call in mocker_task_info.call_args_list] == [
+        [6419169, 6419170], [6419169], [6419170]]
+    assert clock.return_value == 20.0
+
+
+def test_auto_download_skip_unchanged(rayvision_download, task_info_list, mocker):
+    """Test auto_download skips the cycles without new frame, and sweeps the ended task."""
+    running_task = dict(task_info_list[0], taskStatus=5, doneFrames=1, executingFrames=1)
+    mocker.patch.object(rayvision_download.api.query, 'task_info', side_effect=[
+        {'items': [running_task]},
+        {'items': [running_task]},
+        {'items': [dict(running_task, doneFrames=2)]},
+        {'items': [dict(running_task, doneFrames=2, taskStatus=25)]},
+    ])
+    mocker_download = mocker.patch.object(rayvision_download, '_download_output', return_value=0)
+    rayvision_download.auto_download([6419169], sleep_time=0)
+    assert mocker_download.call_count == 3
+
+
+def test_download_raysync_failed_output_keys(rayvision_download, expected_result, mocker, tmpdir):
+    """Test every output of a task has its own Raysync task after a failure."""
+    engine = RayvisionTransferRaysync("task.renderbus.com", "100", "user", "key", "2", logger=mocker.Mock())
+    mocker.patch.object(engine, "auto_download")
+    mocker.patch.object(engine, "listening_raysync_server")
+    mocker.patch("rayvision_sync.rayvision_raysync.transfer_raysync.time.sleep")
+    created = []
+
+    def post(api_url, data):
+        if api_url == ApiUrl.create_task:
+            created.append(data["source-path"])
+            return {"task-id": len(created)}
+        if api_url == ApiUrl.get_task_status:
+            return {"task-list": [{"task-state": "failed" if data["task-id"] == 1 else "successful"}]}
+        return {}
+
+    mocker.patch.object(engine, "post", side_effect=post)
+    rayvision_download.raysync_engine = engine
+    rayvision_download.retry_policy = RetryPolicy(max_attempts=1)
+    task_status_list = [expected_result[0], dict(expected_result[0], output_file_name='test_info_2')]
+    mocker.patch.object(RayvisionManageTask, 'get_task_status', return_value=task_status_list)
+    with pytest.raises(DownloadFailed) as err:
+        rayvision_download.download([6419169], local_path=str(tmpdir), engine_type="raysyncproxy",
+                                    server_ip="127.0.0.1", server_port="5555")
+    assert [report.output_name for report in err.value.failed_outputs] == ["test_info_1"]
+    assert [path.rsplit("/", 1)[-1] for path in created] == ["test_info_1", "test_info_2"]
+
+
+def test_raysync_prepare_transfer_serialized(mocker):
+    """Test the Raysync service is set up by one transfer at a time."""
+    engine = RayvisionTransferRaysync("task.renderbus.com", "100", "user", "key", "2", logger=mocker.Mock())
+    mocker.patch.object(engine, "auto_download")
+    running = []
+    overlaps = []
+
+    def listening():
+        running.append(1)
+        overlaps.append(len(running))
+        time.sleep(0.05)
+        running.pop()
+
+    mocker.patch.object(engine, "_listening_raysync_server", side_effect=listening)
+    mocker.patch.object(engine, "post", return_value={"task-id": 1})
+    threads = [threading.Thread(target=engine.prepare_transfer, args=("127.0.0.1", "5555", "D:/out", "out", "10"),
+                                kwargs={"task_type": "download", "failed_key": index}) for index in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert overlaps == [1, 1, 1]
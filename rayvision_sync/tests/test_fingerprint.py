@@ -0,0 +1,62 @@
+"""Test the rayvision_sync fingerprint functions."""
+
+import hashlib
+
+# pylint: disable=import-error
+import pytest
+
+from rayvision_sync import fingerprint
+from rayvision_sync.fingerprint import FingerprintStore
+from rayvision_sync.fingerprint import fingerprint_asset
+from rayvision_sync.fingerprint import hash_file
+from rayvision_sync.utils import write_json
+
+
+@pytest.fixture()
+def asset(tmpdir):
+    """Create a small and a large local file."""
+    small = tmpdir.join("small.mb")
+    small.write(b"small scene", mode="wb")
+    large = tmpdir.join("large.abc")
+    large.write(b"x" * 4096, mode="wb")
+    return [{"local": str(small), "server": "/small.mb"}, {"local": str(large), "server": "/large.abc"}]
+
+
+def test_hash_file_mmap(asset):
+    """Test a mapped file gets the same digest as a read one."""
+    path = asset[1]["local"]
+    expected = hashlib.blake2b(b"x" * 4096, digest_size=16).hexdigest()
+    assert hash_file(path, "blake2b", mmap_threshold=1024) == expected
+    assert hash_file(path, "blake2b") == expected
+
+
+def test_fingerprint_asset(asset, tmpdir):
+    """Test the unchanged files are not hashed again."""
+    missing = {"local": str(tmpdir.join("missing.mb")), "server": "/missing.mb"}
+    store = FingerprintStore(str(tmpdir.join("fingerprint.db")))
+    report = fingerprint_asset(asset + [missing], store, workers=2, algorithm="blake2b", mmap_threshold=1024)
+    assert (report.hashed_files, report.skipped_files, report.missing_files) == (2, 0, 1)
+    assert report.hashed_bytes == 4096 + 11
+    assert report.fingerprints[asset[0]["local"]] == hash_file(asset[0]["local"], "blake2b")
+
+    tmpdir.join("small.mb").write(b"changed scene", mode="wb")
+    report = fingerprint_asset(asset, store, algorithm="blake2b")
+    assert (report.hashed_files, report.skipped_files) == (1, 1)
+    store.close()
+
+
+def test_fingerprint_upload_json(asset, tmpdir, mocker):
+    """Test an upload.json path is accepted and the throughput reported."""
+    upload_path = str(tmpdir.join("upload.json"))
+    write_json(upload_path, {"asset": asset + asset})
+    clock = mocker.Mock(side_effect=[0.0, 2.0])
+    report = fingerprint_asset(upload_path, clock=clock)
+    assert len(report.fingerprints) == 2
+    assert report.hashed_files == 2
+    assert report.throughput == pytest.approx((4096 + 11) / 1024.0 ** 3 / 2)
+
+
+def test_default_algorithm(mocker):
+    """Test blake2b is used without xxhash."""
+    mocker.patch.dict("sys.modules", {"xxhash": None})
+    assert fingerprint.default_algorithm() == "blake2b"
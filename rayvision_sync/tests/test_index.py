@@ -0,0 +1,62 @@
+"""Test the rayvision_sync index functions."""
+
+# pylint: disable=import-error
+import pytest
+
+from rayvision_sync.index import UploadIndex
+from rayvision_sync.index import file_identity
+
+
+@pytest.fixture()
+def asset(tmpdir):
+    """Create three local files."""
+    items = []
+    for index in range(3):
+        path = tmpdir.join("%s.mb" % index)
+        path.write("scene %s" % index)
+        items.append({"local": str(path), "server": "/work/%s.mb" % index})
+    return items
+
+
+@pytest.fixture()
+def index(tmpdir):
+    """Open an empty upload index."""
+    upload_index = UploadIndex(str(tmpdir.join("index.db")))
+    yield upload_index
+    upload_index.close()
+
+
+def test_changed(index, asset):
+    """Test the recorded files are skipped until they change."""
+    assert len(list(index.changed(asset, "100"))) == 3
+    index.record(index.changed(asset, "100"), "100")
+    assert list(index.changed(asset, "100")) == []
+    assert len(list(index.changed(asset, "200"))) == 3
+
+    with open(asset[1]["local"], "a") as file_:
+        file_.write(" changed")
+    assert [item for item, _ in index.changed(asset, "100")] == [asset[1]]
+
+
+def test_changed_server_path(index, asset):
+    """Test a file uploaded to another server path is uploaded again."""
+    index.record(index.changed(asset, "100"), "100")
+    moved = dict(asset[0], server="/other/0.mb")
+    assert [item for item, _ in index.changed([moved], "100")] == [moved]
+
+
+def test_missing_file(index, tmpdir):
+    """Test a missing file is never recorded."""
+    item = {"local": str(tmpdir.join("missing.mb")), "server": "/missing.mb"}
+    assert file_identity(item["local"]) is None
+    index.record(index.changed([item], "100"), "100")
+    assert list(index.changed([item], "100")) == [(item, None)]
+
+
+def test_invalidate(index, asset):
+    """Test forgotten files are uploaded again."""
+    index.record(index.changed(asset, "100"), "100")
+    index.invalidate([asset[0]["local"]])
+    assert [item for item, _ in index.changed(asset, "100")] == [asset[0]]
+    index.invalidate(storage_id="100")
+    assert len(list(index.changed(asset, "100"))) == 3
@@ -37,42 +37,6 @@ def task_status_list():
     ]
 
 
-@pytest.fixture()
-def task_info_list():
-    """Get the task_info_list information."""
-    return [
-        {
-            "id": 6419169,
-            "taskStatus": 30,
-            "statusText": "render_task_status_0",
-            "isOpen": 0,
-            "outputFileName": "test_info_1",
-            "userId": "1001",
-            "bid": "121"
-        },
-        {
-            "id": 647611,
-            "taskStatus": 35,
-            "statusText": "render_task_status_-1",
-            "isOpen": 1,
-            "outputFileName": "test_info_2",
-            "respRenderingTaskList": [
-                {
-                    "id": 6416355,
-                    "taskStatus": 45,
-                    "statusText": "render_task_status_-2",
-                    "isOpen": 1,
-                    "outputFileName": "test_info_3",
-                    "userId": "1002",
-                    "bid": "122"
-                }
-            ],
-            "userId": "1002",
-            "bid": "122"
-        }
-    ]
-
-
 def test_find_task_status_codes(manage, task_status_list):
     """Test find_task_status_codes, we can get a expected result."""
     result = manage.find_task_status_codes(task_status_list)
@@ -107,3 +71,22 @@ def test_is_task_end(manage, mocker, task_info_list, task_id, is_test_stop=False
     mocker_task_id.return_value = task_info
     result = manage.is_task_end(task_id, is_test_stop)
     assert isinstance(result, bool)
+
+
+def test_get_task_status_pages(manage, mocker, task_info_list):
+    """Test get_task_status asks the ids one page at a time."""
+    mocker_task_info = mocker.patch.object(QueryOperator, 'task_info')
+    mocker_task_info.return_value = {'items': task_info_list[:1]}
+    result = manage.get_task_status(list(range(250)))
+    assert [len(call[0][0]) for call in mocker_task_info.call_args_list] == [100, 100, 50]
+    assert len(result) == 3
+
+
+def test_get_task_status_by_id(manage, mocker, task_info_list):
+    """Test get_task_status_by_id, we can get the information by task id."""
+    mocker_task_info = mocker.patch.object(QueryOperator, 'task_info')
+    mocker_task_info.return_value = {'items': task_info_list}
+    result = manage.get_task_status_by_id([6419169, 647611, 1])
+    assert sorted(result) == ['6419169', '647611']
+    assert manage.task_status_end(result['6419169']) is True
+    assert manage.task_status_end(result.get('1', [])) is None
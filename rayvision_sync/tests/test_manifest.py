@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Test the rayvision_sync manifest functions."""
+
+import codecs
+import json
+
+# pylint: disable=import-error
+import pytest
+
+from rayvision_sync.manifest import AssetWriter
+from rayvision_sync.manifest import iter_asset
+
+
+@pytest.fixture()
+def asset():
+    """Get the files of an upload.json."""
+    return [{"local": u"D:/工程/%s.mb" % index, "server": "/D/%s.mb" % index, "size": 10 ** index}
+            for index in range(20)]
+
+
+@pytest.mark.parametrize("read_size", [1, 7, 1024 * 1024])
+def test_iter_asset(tmpdir, asset, read_size):
+    """Test the items are decoded whatever the buffer boundaries."""
+    upload_path = str(tmpdir.join("upload.json"))
+    with codecs.open(upload_path, "w", "utf-8") as f_upload:
+        json.dump({"scene": {"name": "a"}, "asset": asset, "count": 12345}, f_upload, indent=4,
+                  ensure_ascii=False)
+    assert list(iter_asset(upload_path, read_size=read_size)) == asset
+
+
+def test_iter_asset_empty(tmpdir):
+    """Test a manifest without files."""
+    upload_path = tmpdir.join("upload.json")
+    upload_path.write("{}")
+    assert list(iter_asset(str(upload_path))) == []
+    upload_path.write('{"asset": []}')
+    assert list(iter_asset(str(upload_path))) == []
+
+
+def test_iter_asset_invalid(tmpdir):
+    """Test a manifest that is not a JSON object."""
+    upload_path = tmpdir.join("upload.json")
+    upload_path.write('["asset"]')
+    with pytest.raises(ValueError):
+        list(iter_asset(str(upload_path)))
+
+
+def test_asset_writer(tmpdir, asset):
+    """Test the written upload.json is valid JSON."""
+    upload_path = str(tmpdir.join("upload.json"))
+    with AssetWriter(upload_path) as writer:
+        for item in asset:
+            writer.write(item)
+    assert writer.count == 20
+    with codecs.open(upload_path, "r", "utf-8") as f_upload:
+        assert json.load(f_upload) == {"asset": asset}
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Test the rayvision_sync output_parser functions."""
+
+import io
+
+# pylint: disable=import-error
+import pytest
+
+from rayvision_sync import output_parser
+
+
+@pytest.mark.parametrize("line, event_type, path", [
+    (b"upload file done (D:/work/a.mb)\n", output_parser.EVENT_FILE_DONE, "D:/work/a.mb"),
+    (b"upload file fail (D:/work/b.mb)\n", output_parser.EVENT_FILE_FAILED, "D:/work/b.mb"),
+    (b"get path D:/work/c.mb info failed\n", output_parser.EVENT_FILE_FAILED, "D:/work/c.mb"),
+    (u"upload file done (D:/天天.mb)".encode("gbk"), output_parser.EVENT_FILE_DONE, u"D:/天天.mb"),
+    (b"connecting server...\n", output_parser.EVENT_MESSAGE, None),
+    (b"Transfer Finished, Total: 3 files\n", output_parser.EVENT_SUMMARY, None),
+    (b"subtotals are pending\n", output_parser.EVENT_MESSAGE, None),
+])
+def test_parse_line(line, event_type, path):
+    """Test we can get a typed event from one line."""
+    event = output_parser.TransmitterOutputParser().parse_line(line)
+    assert event.type == event_type
+    assert event.path == path
+
+
+def test_parse_progress_line():
+    """Test the percent is extracted from a progress line."""
+    event = output_parser.TransmitterOutputParser().parse_line(b"progress: 42.5%")
+    assert event.type == output_parser.EVENT_PROGRESS
+    assert event.percent == 42.5
+
+
+def test_parse_blank_line():
+    """Test blank lines produce no event."""
+    assert output_parser.TransmitterOutputParser().parse_line(b"  \r\n") is None
+
+
+def test_error_messages_bounded():
+    """Test only the latest errors are kept but all of them are counted."""
+    parser = output_parser.TransmitterOutputParser(max_errors=2)
+    for index in range(5):
+        parser.parse_line("upload file fail ({})".format(index))
+    assert list(parser.errors) == ["upload file fail (3)", "upload file fail (4)"]
+    assert parser.errors.total == 5
+    assert parser.errors.dropped == 3
+    assert parser.errors.counts[output_parser.EVENT_FILE_FAILED] == 5
+
+
+def test_scan():
+    """Test a stream is parsed without events, only its files are recorded."""
+    stream = io.BytesIO(b"upload file done (a)\n\nprogress: 50%\nupload file fail (b)\n"
+                        b"get path c info failed\n")
+    lines = []
+    parser = output_parser.TransmitterOutputParser()
+    parser.scan(stream, lines.append)
+    assert len(lines) == 4
+    assert parser.done_paths == {"a"}
+    assert parser.errors.total == 2
+    parser = output_parser.TransmitterOutputParser(track_done=False)
+    parser.scan(io.BytesIO(b"upload file done (a)\n"))
+    assert parser.done_paths == set()
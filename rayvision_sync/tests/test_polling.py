@@ -0,0 +1,94 @@
+"""Test the rayvision_sync polling functions."""
+
+# pylint: disable=import-error
+import pytest
+
+from rayvision_sync.polling import PollScheduler
+from rayvision_sync.polling import ProgressGate
+from rayvision_sync.polling import task_progress
+
+
+def status(code="5", done=0, total=10, executing=2, start_time=None):
+    """Get the information of a task without sub task."""
+    return [{"task_status_code": code, "is_opener": "0", "sub_task_status": [], "done_frames": done,
+             "total_frames": total, "executing_frames": executing, "start_time": start_time}]
+
+
+@pytest.fixture()
+def clock(mocker):
+    """Get a fake clock."""
+    return mocker.Mock(return_value=1000.0)
+
+
+def test_task_progress_sub_tasks():
+    """Test the frames of the sub tasks are summed."""
+    task_status_list = [{"task_status_code": "5", "is_opener": "1",
+                         "sub_task_status": status("0", 1, 5, 0) + status("5", 2, 5, 1)}]
+    assert task_progress(task_status_list) == (3, 10, 1, True)
+
+
+def test_pop_due_order(clock):
+    """Test the tasks are due at their check time, the earliest first."""
+    scheduler = PollScheduler(interval=10, clock=clock)
+    scheduler.add(1, delay=5)
+    scheduler.add(2, delay=1)
+    scheduler.add(3)
+    assert scheduler.next_delay() == 1
+    assert scheduler.pop_due() == []
+    clock.return_value = 1005.0
+    assert scheduler.pop_due() == [2, 1]
+    scheduler.remove(3)
+    assert len(scheduler) == 2
+    assert scheduler.next_delay() is None
+
+
+def test_update_follows_frame_time(clock):
+    """Test a rendering task is checked when its next frame is expected."""
+    scheduler = PollScheduler(interval=10, min_interval=2, max_interval=300, clock=clock)
+    scheduler.add(1, delay=0)
+    assert scheduler.update(1, status(done=0)) == 10
+    clock.return_value = 1060.0
+    assert scheduler.update(1, status(done=2)) == 30
+    # Late frame: a few checks per frame time.
+    clock.return_value = 1100.0
+    assert scheduler.update(1, status(done=2)) == 7.5
+    # Stalled: back off.
+    clock.return_value = 1200.0
+    assert scheduler.update(1, status(done=2)) == 20
+    assert scheduler.update(1, status(done=2)) == 40
+
+
+def test_update_backs_off_waiting(clock):
+    """Test a waiting task is checked less and less often."""
+    scheduler = PollScheduler(interval=10, max_interval=50, clock=clock)
+    scheduler.add(1)
+    intervals = [scheduler.update(1, status("0", executing=0)) for _ in range(4)]
+    assert intervals == [10, 20, 40, 50]
+
+
+def test_update_start_time(clock):
+    """Test the frame time is estimated from the start time of the task."""
+    scheduler = PollScheduler(interval=10, clock=clock)
+    scheduler.add(1)
+    assert scheduler.update(1, status(done=4, start_time=880 * 1000)) == 30
+
+
+def test_fixed_interval(clock):
+    """Test the default schedule of auto_download, every task every interval."""
+    scheduler = PollScheduler(5, 5, 5, clock=clock)
+    scheduler.add(1)
+    assert scheduler.update(1, status("0", executing=0)) == 5
+    assert scheduler.update(1, status("0", executing=0)) == 5
+
+
+def test_progress_gate():
+    """Test a task is only downloaded again once it progressed."""
+    gate = ProgressGate()
+    assert gate.changed(1, status("0", done=0)) is False
+    assert gate.changed(1, status(done=1)) is True
+    gate.mark(1, status(done=1))
+    assert gate.changed(1, status(done=1)) is False
+    assert gate.changed(1, status("25", done=1)) is True
+    assert gate.changed(1, status(done=None)) is True
+    gate.forget(1)
+    assert gate.changed(1, status(done=1)) is True
@@ -0,0 +1,66 @@
+"""Test the rayvision_sync preflight functions."""
+
+import os
+import sys
+
+# pylint: disable=import-error
+import pytest
+
+from rayvision_sync import preflight
+from rayvision_sync.exception import RayvisionError
+from rayvision_sync.preflight import preflight_asset
+from rayvision_sync.utils import json_load
+from rayvision_sync.utils import write_json
+
+
+@pytest.fixture()
+def upload_path(tmpdir):
+    """Create an upload.json with a file, a folder and a missing file."""
+    tmpdir.join("scene.mb").write(b"scene", mode="wb")
+    tmpdir.join("textures", "wood.png").write(b"wood", mode="wb", ensure=True)
+    tmpdir.join("textures", "metal", "iron.png").write(b"iron!", mode="wb", ensure=True)
+    path = str(tmpdir.join("upload.json"))
+    write_json(path, {"asset": [
+        {"local": str(tmpdir.join("scene.mb")), "server": "/work/scene.mb"},
+        {"local": str(tmpdir.join("textures")), "server": "/work/textures"},
+        {"local": str(tmpdir.join("missing.mb")), "server": "/work/missing.mb"},
+    ]})
+    return path
+
+
+def test_preflight_asset(upload_path, tmpdir):
+    """Test the folders are expanded and the missing files dropped."""
+    report = preflight_asset(upload_path, workers=2, batch_size=2)
+    assert report.file_count == 3
+    assert report.missing == [str(tmpdir.join("missing.mb"))]
+    assert report.expanded_folders == 1
+    assert report.total_bytes == 14
+    asset = json_load(report.upload_json_path)["asset"]
+    assert sorted((item["server"], item["size"]) for item in asset) == [
+        ("/work/scene.mb", 5), ("/work/textures/metal/iron.png", 5), ("/work/textures/wood.png", 4)]
+
+
+@pytest.mark.parametrize("scandir", [True, False])
+def test_preflight_asset_link_loop(upload_path, tmpdir, mocker, scandir):
+    """Test a folder linked under itself is expanded once, with or without scandir."""
+    if sys.platform.startswith("win"):
+        pytest.skip("symbolic links need privileges on Windows")
+    os.symlink(str(tmpdir.join("textures")), str(tmpdir.join("textures", "metal", "loop")))
+    if not scandir:
+        mocker.patch.object(preflight, "_scandir", None)
+    report = preflight_asset(upload_path)
+    assert report.file_count == 3
+    assert report.total_bytes == 14
+
+
+def test_preflight_asset_without_sizes(upload_path, tmpdir):
+    """Test the sizes can be left out of the checked upload.json."""
+    report = preflight_asset(upload_path, to_path=str(tmpdir.join("checked.json")), attach_sizes=False)
+    assert report.total_bytes == 14
+    assert all("size" not in item for item in json_load(str(tmpdir.join("checked.json")))["asset"])
+
+
+def test_preflight_asset_missing(upload_path):
+    """Test the missing files raise without dropping them."""
+    with pytest.raises(RayvisionError):
+        preflight_asset(upload_path, drop_missing=False)
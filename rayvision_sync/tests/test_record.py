@@ -0,0 +1,51 @@
+"""Test the rayvision_sync record functions."""
+
+import io
+
+# pylint: disable=import-error
+import pytest
+
+from rayvision_sync import utils
+from rayvision_sync.record import RedisRecordWriter
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture()
+def redis_db():
+    """Create a fake Redis client."""
+    return fakeredis.FakeStrictRedis(decode_responses=True)
+
+
+def test_flush_by_count(redis_db, mocker):
+    """Test a full buffer is written with one pipeline."""
+    pipeline = mocker.spy(redis_db, "pipeline")
+    writer = RedisRecordWriter(redis_db, "test_flag", batch_size=1000,
+                               flush_interval=60)
+    for index in range(1000):
+        writer.add("D:/work/%s.mb" % index, 1)
+    writer.close()
+    assert redis_db.hlen("test_flag") == 1000
+    assert pipeline.call_count == 1
+
+
+def test_flush_on_close(redis_db):
+    """Test the remaining records are written when the writer closes."""
+    with RedisRecordWriter(redis_db, batch_size=1000, flush_interval=60) as writer:
+        writer.add("D:/work/a.mb", 10)
+    assert redis_db.hgetall("upload_done") == {"D:/work/a.mb": "10"}
+
+
+class FakeProcess(object):
+    """Stand-in for ``subprocess.Popen`` reading from memory."""
+
+    def __init__(self, data):
+        self.stdout = io.BytesIO(data)
+
+
+def test_print_to_log_record(redis_db):
+    """Test print_to_log records every uploaded file."""
+    data = b"upload file done (D:/a.mb)\nupload file done (D:/b.mb)\n"
+    utils.print_to_log(FakeProcess(data), None, is_record=True,
+                       redis_flag="test_flag", redis_obj=redis_db)
+    assert sorted(redis_db.hkeys("test_flag")) == ["D:/a.mb", "D:/b.mb"]
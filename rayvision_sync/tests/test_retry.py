@@ -0,0 +1,123 @@
+"""Test the rayvision_sync retry functions."""
+
+# pylint: disable=import-error
+import threading
+
+import pytest
+
+from rayvision_sync.exception import RayvisionError, TransferCancelled
+from rayvision_sync.retry import RetryPolicy
+from rayvision_sync.utils import upload_retry
+
+
+class FakeClock(object):
+    """Clock advanced by the sleeps of the policy."""
+
+    def __init__(self):
+        self.now = 0
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def time(self):
+        return self.now
+
+
+def make_policy(clock, **kwargs):
+    """Create a policy waiting on the fake clock."""
+    return RetryPolicy(sleep=clock.sleep, clock=clock.time, **kwargs)
+
+
+def test_retry_until_success():
+    """Test a retryable code is retried with a growing wait."""
+    clock = FakeClock()
+    results = iter([10, 10, 10, 0])
+    assert make_policy(clock, jitter=0).call(lambda: next(results)) == 0
+    assert clock.sleeps == [5, 10, 20]
+
+
+@pytest.mark.parametrize("code", [11, 9, 3, 127, -9])
+def test_fail_fast(code):
+    """Test the codes retrying cannot fix are not retried."""
+    clock = FakeClock()
+    calls = []
+    policy = make_policy(clock)
+    assert policy.call(lambda: calls.append(code) or code) == code
+    assert calls == [code]
+    assert clock.sleeps == []
+
+
+def test_max_attempts():
+    """Test the policy gives up after the attempt budget."""
+    clock = FakeClock()
+    giveups = []
+    policy = make_policy(clock, max_attempts=4, on_giveup=lambda code, attempt: giveups.append((code, attempt)))
+    assert policy.call(lambda: 10) == 10
+    assert len(clock.sleeps) == 3
+    assert giveups == [(10, 4)]
+
+
+def test_max_elapsed():
+    """Test the policy gives up before the time budget is spent."""
+    clock = FakeClock()
+    policy = make_policy(clock, max_attempts=None, max_elapsed=60, jitter=0, default_action="retry")
+    assert policy.call(lambda: 500) == 500
+    assert clock.sleeps == [5, 10, 20]
+
+
+def test_delay_bounds():
+    """Test the wait is capped and the jitter only shortens it."""
+    policy = RetryPolicy(base_delay=5, max_delay=600, jitter=0.5)
+    for attempt in range(1, 20):
+        expected = min(5 * 2 ** (attempt - 1), 600)
+        assert expected / 2 <= policy.delay(attempt) <= expected
+
+
+def test_before_retry():
+    """Test the hook is called before every retry."""
+    clock = FakeClock()
+    calls = []
+    results = iter([10, 0])
+    policy = make_policy(clock, before_retry=lambda code, attempt, delay: calls.append((code, attempt)))
+    policy.call(lambda: next(results))
+    assert calls == [(10, 1)]
+
+
+def test_call_cancellable():
+    """Test a cancel event ends the wait and stops the retries."""
+    clock = FakeClock()
+    cancel_event = threading.Event()
+    calls = []
+
+    def upload():
+        calls.append(1)
+        cancel_event.set()
+        return 10
+
+    policy = make_policy(clock, base_delay=3600)
+    with pytest.raises(TransferCancelled):
+        policy.call_cancellable(cancel_event, upload)
+    assert calls == [1]
+    assert clock.sleeps == []
+    with pytest.raises(TransferCancelled):
+        policy.call_cancellable(cancel_event, upload)
+    assert calls == [1]
+
+
+def test_upload_retry():
+    """Test the decorator maps the last status code to an error."""
+    clock = FakeClock()
+
+    @upload_retry(policy=make_policy(clock))
+    def upload(code):
+        return code
+
+    assert upload(0) is True
+    with pytest.raises(RayvisionError) as err:
+        upload(11)
+    assert err.value.error_code == 200025
+    with pytest.raises(RayvisionError) as err:
+        upload(127)
+    assert err.value.error_code == 200026
@@ -0,0 +1,141 @@
+"""Test the rayvision_sync scheduler functions."""
+
+import collections
+import sys
+
+# pylint: disable=import-error
+import pytest
+
+from rayvision_sync import scheduler
+from rayvision_sync.retry import RetryPolicy
+from rayvision_sync.scheduler import WorkQueueUploader
+from rayvision_sync.utils import write_json
+
+# Stand-in of the transmitter, uploads the files of its upload.json but the
+# ones whose name contains the failing marker.
+TRANSMITTER = """
+import json, sys
+input()
+failed = False
+for item in json.load(open(sys.argv[1]))["asset"]:
+    if sys.argv[2] and sys.argv[2] in item["local"]:
+        print("upload file fail (%s)" % item["local"])
+        failed = True
+    else:
+        print("upload file done (%s)" % item["local"])
+sys.exit(10 if failed else 0)
+"""
+
+
+@pytest.fixture()
+def upload_json_path(tmpdir):
+    """Create an upload.json of 40 files."""
+    path = str(tmpdir.join("upload.json"))
+    write_json(path, {"asset": [{"local": "D:/work/%s.mb" % index, "server": "/D/work/%s.mb" % index}
+                                for index in range(40)]})
+    return path
+
+
+def fake_transmitter(mocker, upload, marker=""):
+    """Replace the transmitter command of the upload."""
+    mocker.patch.object(upload.share_info, "resolve", return_value=("1", "2"))
+    mocker.patch.object(upload, "asset_cmd",
+                        side_effect=lambda path, *args: [sys.executable, "-c", TRANSMITTER, path, marker])
+
+
+def test_run(rayvision_upload, upload_json_path, tmpdir, mocker):
+    """Test every file is uploaded by small batches."""
+    fake_transmitter(mocker, rayvision_upload)
+    work_dir = tmpdir.join("batches")
+    uploader = WorkQueueUploader(rayvision_upload, workers=4, initial_batch=5, poll_interval=0.05,
+                                 work_dir=str(work_dir))
+    report = uploader.run(upload_json_path)
+    assert report.done_files == 40
+    assert report.failed_files == []
+    assert report.batches >= 8
+    assert work_dir.listdir() == []
+
+
+def test_run_failed_files(rayvision_upload, upload_json_path, mocker):
+    """Test the failed files are retried then reported."""
+    fake_transmitter(mocker, rayvision_upload, marker="/3")
+    delays = []
+    policy = RetryPolicy()
+    mocker.patch.object(policy, "delay", side_effect=lambda attempt: delays.append(attempt) or 0.05)
+    uploader = WorkQueueUploader(rayvision_upload, workers=4, initial_batch=5, max_retries=2,
+                                 poll_interval=0.05, retry_policy=policy)
+    report = uploader.run(upload_json_path)
+    assert sorted(report.failed_files) == ["D:/work/3.mb", "D:/work/30.mb", "D:/work/31.mb", "D:/work/32.mb",
+                                           "D:/work/33.mb", "D:/work/34.mb", "D:/work/35.mb", "D:/work/36.mb",
+                                           "D:/work/37.mb", "D:/work/38.mb", "D:/work/39.mb"]
+    assert report.done_files == 29
+    assert 2 in delays
+
+
+def test_run_not_retried(rayvision_upload, upload_json_path, mocker):
+    """Test the files of a status code the policy does not retry fail at once."""
+    fake_transmitter(mocker, rayvision_upload, marker="/3")
+    mocker.patch.object(rayvision_upload.retry_policy, "action", return_value="fail")
+    uploader = WorkQueueUploader(rayvision_upload, workers=4, initial_batch=5, poll_interval=0.05)
+    report = uploader.run(upload_json_path)
+    assert len(report.failed_files) == 11
+    assert report.done_files == 29
+
+
+def test_queue_reads_ahead(mocker):
+    """Test the manifest is read on demand and the delayed files wait."""
+    clock = mocker.Mock(return_value=0.0)
+    read = []
+
+    def items():
+        for index in range(100):
+            read.append(index)
+            yield {"local": "D:/%s.mb" % index}
+
+    queue = scheduler._WorkQueue(items(), clock)
+    queue.fill(10)
+    assert len(read) == 10
+    assert len(queue.take(4)) == 4
+    queue.put_later([{"local": "D:/late.mb"}], 5)
+    queue.fill(10)
+    assert len(read) == 14
+    assert queue.next_ready() == 5
+    clock.return_value = 5.0
+    queue.fill(10)
+    assert len(queue) == 11
+    assert not queue.exhausted
+
+
+def test_batch_size_follows_latency(rayvision_upload):
+    """Test the batch size targets the wanted batch duration."""
+    uploader = WorkQueueUploader(rayvision_upload, target_seconds=60, max_batch=1000)
+    uploader._measure(0.5)
+    assert uploader.batch_size == 120
+    uploader._measure(0.01)
+    assert 120 < uploader.batch_size <= 1000
+
+
+def test_tail_is_shared(rayvision_upload, tmpdir):
+    """Test the last files are spread over all workers."""
+    uploader = WorkQueueUploader(rayvision_upload, workers=4, initial_batch=100)
+    queue = scheduler._WorkQueue({"local": "D:/%s.mb" % index} for index in range(10))
+    queue.fill(400)
+    batch = uploader._next_batch(queue, 1, str(tmpdir))
+    assert len(batch.items) == 3
+
+
+def test_split_slow(rayvision_upload, mocker):
+    """Test a slow batch is stopped and its remaining files queued first."""
+    clock = mocker.Mock(return_value=100.0)
+    uploader = WorkQueueUploader(rayvision_upload, slow_factor=3, clock=clock)
+    uploader.file_seconds = 1.0
+    batch = scheduler._Batch(1, [{"local": "D:/%s.mb" % index} for index in range(5)], "batch_1.json")
+    batch.start = 80.0
+    batch.job = mocker.Mock()
+    batch.done.add("D:/0.mb")
+    uploader._split_slow([batch])
+    assert batch.job.cancel.called
+    queue = scheduler._WorkQueue([{"local": "D:/other.mb"}])
+    queue.fill(10)
+    assert uploader._finish(batch, -9, queue, collections.Counter(), []) == 1
+    assert [item["local"] for item in queue.take(10)] == ["D:/1.mb", "D:/2.mb", "D:/3.mb", "D:/4.mb", "D:/other.mb"]
@@ -0,0 +1,55 @@
+"""Test the rayvision_sync share_info functions."""
+
+import threading
+import time
+
+# pylint: disable=import-error
+import pytest
+
+from rayvision_sync import share_info
+from rayvision_sync.share_info import ShareInfoResolver
+
+
+def test_resolve_ttl(mocker):
+    """Test the information is asked again once expired or invalidated."""
+    fetch = mocker.patch.object(share_info, "get_share_info", return_value=("1", "2"))
+    clock = mocker.Mock(return_value=0)
+    resolver = ShareInfoResolver(mocker.Mock(), ttl=300, clock=clock)
+    assert resolver.resolve() == ("1", "2")
+    clock.return_value = 299
+    assert resolver.resolve() == ("1", "2")
+    assert fetch.call_count == 1
+    clock.return_value = 300
+    resolver.resolve()
+    assert fetch.call_count == 2
+    resolver.invalidate()
+    resolver.resolve()
+    assert fetch.call_count == 3
+
+
+def test_resolve_single_flight(mocker):
+    """Test concurrent callers share one request."""
+    def slow_fetch(api):
+        time.sleep(0.2)
+        return "1", "2"
+
+    fetch = mocker.patch.object(share_info, "get_share_info", side_effect=slow_fetch)
+    resolver = ShareInfoResolver(mocker.Mock())
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(resolver.resolve())) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [("1", "2")] * 10
+    assert fetch.call_count == 1
+
+
+def test_resolve_error_not_cached(mocker):
+    """Test a failed request is not cached."""
+    fetch = mocker.patch.object(share_info, "get_share_info", side_effect=[IOError("timeout"), ("1", "2")])
+    resolver = ShareInfoResolver(mocker.Mock())
+    with pytest.raises(IOError):
+        resolver.resolve()
+    assert resolver.resolve() == ("1", "2")
+    assert fetch.call_count == 2
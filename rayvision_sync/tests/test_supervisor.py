@@ -0,0 +1,72 @@
+"""Test the rayvision_sync supervisor functions."""
+
+import sys
+import threading
+
+# pylint: disable=import-error
+import pytest
+
+from rayvision_sync.supervisor import TransmitterSupervisor
+
+SCRIPT = """
+import sys
+answer = input()
+for index in range(int(sys.argv[1])):
+    print("upload file done (D:/%s/%s.mb)" % (sys.argv[2], index))
+print("upload file failed (D:/%s/bad.mb)" % sys.argv[2])
+sys.exit(0 if answer == "y" else 1)
+"""
+
+
+def test_submit_many():
+    """Test every process gets its own parser and status code."""
+    supervisor = TransmitterSupervisor()
+    jobs = [supervisor.submit([sys.executable, "-c", SCRIPT, str(index * 100), str(index)], flag=True)
+            for index in range(20)]
+    supervisor.shutdown(wait=True)
+    for index, job in enumerate(jobs):
+        assert job.future.result() == 0
+        assert job.parser.done_count == index * 100
+        assert list(job.parser.errors) == ["upload file failed (D:/%s/bad.mb)" % index]
+
+
+def test_single_reader_thread():
+    """Test the output of all processes is handled on one thread."""
+    threads = set()
+    supervisor = TransmitterSupervisor()
+    for index in range(5):
+        supervisor.submit([sys.executable, "-c", SCRIPT, "10", str(index)],
+                          callback=lambda event: threads.add(threading.current_thread()))
+    supervisor.shutdown(wait=True)
+    assert len(threads) == 1
+
+
+def test_submit_not_found():
+    """Test a missing executable resolves with the shell status code."""
+    supervisor = TransmitterSupervisor()
+    job = supervisor.submit(["/not/exists/transmitter"])
+    supervisor.shutdown(wait=True)
+    assert job.future.result() == 127
+
+
+def test_cancel():
+    """Test cancelling a job kills its process."""
+    supervisor = TransmitterSupervisor()
+    job = supervisor.submit([sys.executable, "-c", "import time; time.sleep(30)"])
+    job.cancel()
+    assert job.future.result(timeout=10) != 0
+    supervisor.shutdown(wait=True)
+
+
+def test_submit_after_shutdown():
+    """Test no process is accepted after shutdown."""
+    supervisor = TransmitterSupervisor()
+    supervisor.shutdown()
+    with pytest.raises(RuntimeError):
+        supervisor.submit([sys.executable, "-c", "pass"])
+
+
+def test_supervised_upload(rayvision_upload, tmpdir):
+    """Test every upload.json gets its status code."""
+    upload_pool = [str(tmpdir.join("upload%s.json" % index)) for index in range(3)]
+    assert rayvision_upload.supervised_upload(upload_pool, max_processes=2) == dict.fromkeys(upload_pool, 127)
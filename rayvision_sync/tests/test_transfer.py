@@ -1,8 +1,13 @@
 """Test the rayvison_sync.rayvision_transfer functions."""
 
+import os
+import sys
+
 # pylint: disable=import-error
 import pytest
 
+from rayvision_sync.transfer import TransmitterRuntime
+
 
 def test_transport_info(rayvision_transfer):
     """Test we can get transport info."""
@@ -39,4 +44,50 @@ def test_parse_transports_json(rayvision_transfer, transports_json,
     """Test we can get correct data."""
     result = rayvision_transfer.parse_transports_json(transports_json,
                                                       domain_name, platform)
-    assert sorted(list(result.keys())) == ['aspera', 'raysync']
\ No newline at end of file
+    assert sorted(list(result.keys())) == ['aspera', 'raysync']
+
+
+def test_create_cmd_argv(rayvision_transfer):
+    """Test we can get the argument list of the transmitter."""
+    cmd_params = [
+        "upload_path",
+        'D:/work/"quoted" scene.mb',
+        "/D/work/scene.mb",
+        "1048576",
+        "false", "config_bid"
+    ]
+    argv = rayvision_transfer.create_cmd_argv(cmd_params)
+    assert argv[0] == rayvision_transfer.transmitter_exe
+    assert argv[1:] == [
+        "-E", "aspera", "-H", "45.251.92.29", "-P", "10221", "-S", "54252",
+        "-U", "100093088", "-T", "upload_path", "-L", 'D:/work/"quoted" scene.mb',
+        "-R", "/D/work/scene.mb", "-r", "2", "-K", "false", "-s", "1048576",
+        "-C", "None", "-p", "0"
+    ]
+
+
+@pytest.mark.skipif(sys.platform.startswith("win"), reason="No chmod on Windows.")
+def test_transmitter_runtime_prepare(tmpdir, mocker):
+    """Test the transmitter directory is prepared once per version."""
+    transmitter_exe = tmpdir.join("rayvision_transmitter")
+    transmitter_exe.write("")
+    runtime = TransmitterRuntime(str(transmitter_exe))
+    chmod = mocker.spy(runtime, "_chmod_tree")
+    runtime.prepare()
+    runtime.prepare()
+    assert chmod.call_count == 1
+    assert tmpdir.join(TransmitterRuntime.STAMP_NAME).read() == runtime.version
+
+    TransmitterRuntime._prepared.clear()
+    other_process = TransmitterRuntime(str(transmitter_exe))
+    chmod = mocker.spy(other_process, "_chmod_tree")
+    other_process.prepare()
+    assert chmod.call_count == 0
+
+
+def test_transmitter_runtime_env(tmpdir):
+    """Test the library path is only set in the environment of the child."""
+    runtime = TransmitterRuntime(str(tmpdir.join("rayvision_transmitter")))
+    env = runtime.env({"LD_LIBRARY_PATH": "/usr/lib"})
+    if not sys.platform.startswith("win"):
+        assert env["LD_LIBRARY_PATH"] == os.pathsep.join([str(tmpdir), "/usr/lib"])
@@ -5,6 +5,12 @@ import os
 # pylint: disable=import-error
 import pytest
 from rayvision_sync.exception import RayvisionError
+from rayvision_sync.exception import TransferCancelled
+from rayvision_sync.index import UploadIndex
+from rayvision_sync.output_parser import TransmitterOutputParser
+from rayvision_sync.retry import RetryPolicy
+from rayvision_sync.utils import json_load
+from rayvision_sync.utils import write_json
 
 
 def test_upload_config(rayvision_upload, tmpdir):
@@ -20,8 +26,149 @@ def test_upload_config(rayvision_upload, tmpdir):
         rayvision_upload.upload_config(task_id, config_file_list)
 
 
+def test_upload_config_batch(rayvision_upload, tmpdir, mocker):
+    """Test the configuration files are uploaded together, the retry only uploads the ones not done."""
+    config_file_list = []
+    for name in ["task.json", "tips.json", "asset.json", "upload.json"]:
+        tmpdir.join(name).write("{}")
+        config_file_list.append(str(tmpdir.join(name)))
+    uploaded = []
+
+    def run_cmd(cmd, parser=None, **kwargs):
+        assert cmd[cmd.index("-T") + 1] == "upload_json"
+        uploaded.append([item["server"] for item in json_load(cmd[cmd.index("-L") + 1])["asset"]])
+        if len(uploaded) == 1:
+            parser.parse_line("upload file done (%s)" % config_file_list[0])
+            parser.parse_line("upload file fail (%s)" % config_file_list[1])
+            parser.parse_line("upload file done (%s)" % config_file_list[2])
+            return 10
+        return 0
+
+    mocker.patch("rayvision_sync.upload.run_cmd", side_effect=run_cmd)
+    rayvision_upload.retry_policy = RetryPolicy(sleep=lambda seconds: None)
+    assert rayvision_upload.upload_config("10101", config_file_list + [str(tmpdir.join("missing.json"))])
+    assert uploaded == [["/10101/cfg/task.json", "/10101/cfg/tips.json", "/10101/cfg/asset.json",
+                         "/10101/cfg/upload.json"], ["/10101/cfg/tips.json", "/10101/cfg/upload.json"]]
+
+
+def test_upload_pipelined(rayvision_upload, mocker):
+    """Test a failed upload cancels the other one."""
+    def upload_config(task_id, config_file_list, cancel_event=None, **kwargs):
+        raise RayvisionError(20004, "task.json upload failed")
+
+    def upload_asset(upload_json_path, cancel_event=None, **kwargs):
+        assert cancel_event.wait(10)
+        raise TransferCancelled("Upload cancelled")
+
+    mocker.patch.object(rayvision_upload, "upload_config", side_effect=upload_config)
+    mocker.patch.object(rayvision_upload, "upload_asset", side_effect=upload_asset)
+    with pytest.raises(RayvisionError):
+        rayvision_upload.upload("10101", "task.json", "tips.json", "asset.json", "upload.json", pipelined=True)
+
+
+def test_upload_pipelined_success(rayvision_upload, mocker):
+    """Test both uploads run and the combined result is returned."""
+    mocker.patch.object(rayvision_upload, "upload_config", return_value=True)
+    mocker.patch.object(rayvision_upload, "upload_asset", return_value=True)
+    assert rayvision_upload.upload("10101", "task.json", "tips.json", "asset.json", "upload.json",
+                                   pipelined=True) is True
+    assert rayvision_upload.upload_asset.call_args[1]["upload_json_path"] == "upload.json"
+
+
 def test_create_db_ini(rayvision_upload, tmpdir):
     """Test create_db_ini, we can get a db file."""
     upload_json_path = str(tmpdir.join("upload.json"))
     rayvision_upload.create_db_ini(upload_json_path)
     assert len(os.listdir(rayvision_upload.db_ini)) > 0
+
+
+def test_upload_asset_failed_files(rayvision_upload, tmpdir, mocker):
+    """Test the retry uploads the files not done, failed or never reached."""
+    upload_path = str(tmpdir.join("upload.json"))
+    asset = [{"local": "D:/work/%s.mb" % index, "server": "/D/work/%s.mb" % index} for index in range(4)]
+    write_json(upload_path, {"asset": asset})
+    uploaded = []
+
+    def run_cmd(cmd, parser=None, **kwargs):
+        uploaded.append(json_load(cmd[cmd.index("-L") + 1])["asset"])
+        if len(uploaded) == 1:
+            parser.parse_line(b"upload file done (D:/work/0.mb)")
+            parser.parse_line(b"upload file fail (D:/work/1.mb)")
+            return 10
+        if len(uploaded) == 2:
+            # Aborted before reporting anything, the same files are uploaded again.
+            return 10
+        return 0
+
+    mocker.patch("rayvision_sync.upload.run_cmd", side_effect=run_cmd)
+    rayvision_upload.retry_policy = RetryPolicy(sleep=lambda seconds: None)
+    assert rayvision_upload.upload_asset(upload_path, is_db=False) is True
+    assert uploaded == [asset, asset[1:], asset[1:]]
+    assert [path.basename for path in tmpdir.listdir("*.json")] == ["upload.json"]
+
+
+@pytest.mark.parametrize("adaptive", [False, True])
+def test_thread_pool_upload_report(rayvision_upload, tmpdir, mocker, adaptive):
+    """Test every upload.json gets a report."""
+    done_path = tmpdir.join("done.mb")
+    done_path.write(b"x" * 10, mode="wb")
+
+    def upload_asset(upload_json_path, callback=None, **kwargs):
+        if upload_json_path.endswith("bad.json"):
+            raise RayvisionError(200025, "missing files")
+        callback(TransmitterOutputParser().parse_line("upload file done (%s)" % done_path))
+        return True
+
+    mocker.patch.object(rayvision_upload, "upload_asset", side_effect=upload_asset)
+    reports = rayvision_upload.thread_pool_upload(["a.json", "bad.json", "c.json"], pool_size=2,
+                                                  adaptive=adaptive, interval=0.01, is_db=False)
+    assert [report.upload_json_path for report in reports] == ["a.json", "bad.json", "c.json"]
+    assert [report.success for report in reports] == [True, False, True]
+    assert isinstance(reports[1].error, RayvisionError)
+    assert [report.done_files for report in reports] == [1, 0, 1]
+    assert [report.done_bytes for report in reports] == ([10, 0, 10] if adaptive else [0, 0, 0])
+
+
+def test_upload_asset_index(rayvision_upload, tmpdir, mocker):
+    """Test only the new or changed files are uploaded again."""
+    asset = []
+    for index in range(3):
+        path = tmpdir.join("%s.mb" % index)
+        path.write("scene")
+        asset.append({"local": str(path), "server": "/work/%s.mb" % index})
+    upload_path = str(tmpdir.join("upload.json"))
+    write_json(upload_path, {"asset": asset})
+    uploaded = []
+
+    def run_cmd(cmd, **kwargs):
+        uploaded.append(json_load(cmd[cmd.index("-L") + 1])["asset"])
+        return 0
+
+    mocker.patch("rayvision_sync.upload.run_cmd", side_effect=run_cmd)
+    rayvision_upload.upload_index = UploadIndex(str(tmpdir.join("index.db")))
+    assert rayvision_upload.upload_asset(upload_path, is_db=False) is True
+    assert rayvision_upload.upload_asset(upload_path, is_db=False) is True
+    tmpdir.join("1.mb").write("changed scene")
+    assert rayvision_upload.upload_asset(upload_path, is_db=False) is True
+    assert rayvision_upload.upload_asset(upload_path, is_db=False, force=True) is True
+    assert uploaded == [asset, [asset[1]], asset]
+    assert [path.basename for path in tmpdir.listdir("*.json")] == ["upload.json"]
+
+
+def test_upload_asset_preflight(rayvision_upload, tmpdir, mocker):
+    """Test the missing files are dropped before the transmitter runs."""
+    tmpdir.join("scene.mb").write("scene")
+    asset = [{"local": str(tmpdir.join("scene.mb")), "server": "/work/scene.mb"},
+             {"local": str(tmpdir.join("missing.mb")), "server": "/work/missing.mb"}]
+    upload_path = str(tmpdir.join("upload.json"))
+    write_json(upload_path, {"asset": asset})
+    uploaded = []
+
+    def run_cmd(cmd, **kwargs):
+        uploaded.append(json_load(cmd[cmd.index("-L") + 1])["asset"])
+        return 0
+
+    mocker.patch("rayvision_sync.upload.run_cmd", side_effect=run_cmd)
+    assert rayvision_upload.upload_asset(upload_path, is_db=False, preflight=True) is True
+    assert uploaded == [asset[:1]]
+    assert [path.basename for path in tmpdir.listdir("*.json")] == ["upload.json"]
@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 """Test the rayvision_sync utils functions."""
 
+import os
+import sys
+import threading
+import time
 from builtins import str
 
 # pylint: disable=import-error
@@ -36,6 +40,22 @@ def test_run_cmd():
     assert isinstance(result, int)
 
 
+def test_run_cmd_argv():
+    """Test an argument list is executed without a shell and answered."""
+    argv = [sys.executable, "-c", "import sys; sys.exit(0 if input() == 'y' else 1)"]
+    assert utils.run_cmd(argv) == 0
+
+
+def test_run_cmd_cancel():
+    """Test the process is killed once the cancel event is set."""
+    cancel_event = threading.Event()
+    threading.Timer(0.2, cancel_event.set).start()
+    start = time.time()
+    argv = [sys.executable, "-c", "import time; time.sleep(30)"]
+    assert utils.run_cmd(argv, cancel_event=cancel_event) != 0
+    assert time.time() - start < 10
+
+
 @pytest.mark.parametrize("task_status_code,language ", [
     ("0", "1"),
     ("5", "0"),
@@ -50,3 +70,58 @@ def test_get_task_status_description(task_status_code, language):
         assert result == "渲染中"
     else:
         assert result == "Abort"
+
+
+def test_retry_upload_json(tmpdir):
+    """Test the new upload.json holds the files not done, reached or not."""
+    upload_path = str(tmpdir.join("upload.json"))
+    asset = [{"local": "D:\\work\\%s.mb" % index, "server": "/D/work/%s.mb" % index} for index in range(5)]
+    utils.write_json(upload_path, {"asset": asset})
+    retry_path = utils.retry_upload_json(upload_path, ["D:/work/0.mb", "D:/work/2.mb"])
+    assert retry_path == str(tmpdir.join("upload_retry.json"))
+    assert utils.json_load(retry_path) == {"asset": [asset[1], asset[3], asset[4]]}
+    assert utils.retry_upload_json(retry_path, ["D:/work/1.mb"]) == retry_path
+    assert utils.json_load(retry_path) == {"asset": [asset[3], asset[4]]}
+    assert utils.retry_upload_json(upload_path, ["D:/other.mb"]) is None
+    assert utils.retry_upload_json(upload_path, []) is None
+    assert utils.retry_upload_json(upload_path, [item["local"] for item in asset]) is None
+
+
+def test_cutting_upload_by_count(tmpdir):
+    """Test the chunks hold at most max_resources_number files."""
+    upload_path = str(tmpdir.join("upload.json"))
+    asset = [{"local": "D:/work/%s.mb" % index, "server": "/D/work/%s.mb" % index} for index in range(10)]
+    utils.write_json(upload_path, {"asset": asset})
+    pool = utils.cutting_upload(upload_path, max_resources_number=5)
+    assert [utils.json_load(path)["asset"] for path in pool] == [asset[:5], asset[5:]]
+
+
+def test_cutting_upload_by_size(tmpdir):
+    """Test the chunks are balanced by the size of their files."""
+    asset = []
+    for index, size in enumerate([900, 500, 400, 300, 300, 200, 100, 100, 100]):
+        path = tmpdir.join("file%s" % index)
+        path.write(b"x" * size, mode="wb")
+        asset.append({"local": str(path), "server": "/file%s" % index})
+    upload_path = str(tmpdir.join("upload.json"))
+    utils.write_json(upload_path, {"asset": asset})
+    pool = utils.cutting_upload(upload_path, by_size=True, pool_size=3)
+    totals = sorted(sum(os.path.getsize(item["local"]) for item in utils.json_load(path)["asset"])
+                    for path in pool)
+    assert totals == [900, 1000, 1000]
+
+
+def test_balance_by_size_max_resources():
+    """Test the chunk count follows the pool size and the file limit."""
+    asset = [{"local": "/not/exists/%s" % index} for index in range(25)]
+    chunks = utils.balance_by_size(asset, pool_size=2, max_resources_number=5)
+    assert len(chunks) == 6
+    assert max(len(chunk) for chunk in chunks) <= 5
+    assert sum(len(chunk) for chunk in chunks) == 25
+
+
+def test_balance_by_size_attached_sizes():
+    """Test the sizes attached by the pre-flight are used."""
+    asset = [{"local": "/not/exists/%s" % index, "size": size} for index, size in enumerate([900, 500, 400])]
+    chunks = utils.balance_by_size(asset, pool_size=2)
+    assert sorted(sum(item["size"] for item in chunk) for chunk in chunks) == [900, 900]
@@ -11,19 +11,117 @@ from __future__ import print_function
 
 import codecs
 import json
+import logging
 import os
 import sys
+import threading
 
+from rayvision_sync.bootstrap_cache import BootstrapCache
 from rayvision_sync.constants import ENGINE_TYPE, PLATFORM_ALIAS_MAP
 from rayvision_sync.exception import UnsupportedEngineType
 
 
+class TransmitterRuntime(object):
+    """Prepare the directory of the transmitter before it is executed.
+
+    On non-Windows hosts the files must be executable and the bundled
+    libraries must be found by the loader. The permissions are fixed once per
+    process and directory, and a stamp file records the prepared transmitter
+    version so later processes skip the tree walk entirely.
+
+    """
+
+    STAMP_NAME = ".rayvision_runtime"
+    _prepared = set()
+    _lock = threading.Lock()
+
+    def __init__(self, transmitter_exe):
+        """Initialize the runtime.
+
+        Args:
+            transmitter_exe (str): Absolute path of the transmitter.
+
+        """
+        self.transmitter_exe = transmitter_exe
+        self.directory = os.path.dirname(transmitter_exe)
+        self.stamp_path = os.path.join(self.directory, self.STAMP_NAME)
+
+    @property
+    def version(self):
+        """str: Identify the installed transmitter by its size and mtime."""
+        try:
+            exe_stat = os.stat(self.transmitter_exe)
+        except OSError:
+            return None
+        return "%s-%s" % (exe_stat.st_size, int(exe_stat.st_mtime))
+
+    def prepare(self):
+        """Make the transmitter directory executable, once."""
+        if sys.platform.startswith('win'):
+            return
+        with self._lock:
+            if self.directory in self._prepared:
+                return
+            version = self.version
+            if version is None or self._read_stamp() != version:
+                self._chmod_tree()
+                if version is not None:
+                    self._write_stamp(version)
+            self._prepared.add(self.directory)
+
+    def env(self, base_env=None):
+        """Get the environment of a transmitter process.
+
+        Args:
+            base_env (dict, optional): Environment to extend, default is
+                the environment of the current process.
+
+        Returns:
+            dict: Copy of the environment with the transmitter libraries
+                in ``LD_LIBRARY_PATH``.
+
+        """
+        env = dict(os.environ if base_env is None else base_env)
+        if not sys.platform.startswith('win'):
+            library_path = env.get("LD_LIBRARY_PATH")
+            env["LD_LIBRARY_PATH"] = (os.pathsep.join([self.directory, library_path])
+                                      if library_path else self.directory)
+        return env
+
+    def _chmod_tree(self):
+        """Same as ``chmod 777 -R <directory>/*`` without forking a shell."""
+        for root, dir_names, file_names in os.walk(self.directory):
+            for name in dir_names + file_names:
+                path = os.path.join(root, name)
+                try:
+                    os.chmod(path, 0o777)
+                except OSError as err:
+                    logging.getLogger(__name__).debug("chmod %s failed: %s", path, err)
+
+    def _read_stamp(self):
+        """Get the version recorded by the stamp file."""
+        try:
+            with open(self.stamp_path) as f_stamp:
+                return f_stamp.read().strip()
+        except (IOError, OSError):
+            return None
+
+    def _write_stamp(self, version):
+        """Record the prepared version, the directory may be read only."""
+        try:
+            with open(self.stamp_path, "w") as f_stamp:
+                f_stamp.write(version)
+        except (IOError, OSError):
+            pass
+
+
 class RayvisionTransfer(object):
     """Transfer including upload files and download files."""
 
     def __init__(self, api, config_bid, input_bid, domain, platform, local_os,
                  user_id, automatic_line, output_bid=None, manage_task=None,
                  transports_json="", transmitter_exe="", internet_provider="",
+                 bootstrap_cache=None,
                  ):
         """Initialize the configuration of the transfer.
 
@@ -40,8 +138,11 @@ class RayvisionTransfer(object):
                 parameter can not be passed. If it is downloaded, this
                 parameter must have.
             internet_provider (str): Network provider.
+            bootstrap_cache (BootstrapCache, optional): On-disk cache of the
+                transfer lines shared with other processes.
         """
         self.api = api
+        self.bootstrap_cache = bootstrap_cache
 
         self.config_bid = config_bid
         self.input_bid = input_bid
@@ -66,10 +167,54 @@ class RayvisionTransfer(object):
             self.transmitter_exe = transmitter_exe
         else:
             self.transmitter_exe = self.init_transmitter()
-        if automatic_line:
-            self.transport_info = self.parse_service_transfe_line(internet_provider)
+        self.runtime = TransmitterRuntime(self.transmitter_exe)
+        self.automatic_line = automatic_line
+        self.internet_provider = internet_provider
+        self._transport_info = None
+        self._transport_lock = threading.Lock()
+
+    @property
+    def transport_info(self):
+        """dict: Transfer server of every engine, obtained on first use."""
+        if self._transport_info is None:
+            with self._transport_lock:
+                if self._transport_info is None:
+                    self._transport_info = self._load_transport_info()
+        return self._transport_info
+
+    @transport_info.setter
+    def transport_info(self, transport_info):
+        self._transport_info = transport_info
+
+    @property
+    def bootstrap_key(self):
+        """str: Key of the user in the bootstrap cache."""
+        return BootstrapCache.key(self.domain, self.platform, self.user_id)
+
+    def _load_transport_info(self):
+        """Get the transfer servers from the bootstrap cache, or resolve them."""
+        if self.automatic_line:
+            name = "transfer_lines:%s" % (self.internet_provider or "")
         else:
-            self.transport_info = self.parse_transports_json(transports_json)
+            name = "transports_json:%s" % (self.transports_json or "")
+        if self.bootstrap_cache is not None:
+            transport_info = self.bootstrap_cache.get(self.bootstrap_key, name)
+            if transport_info is not None:
+                return transport_info
+        if self.automatic_line:
+            transport_info = self.parse_service_transfe_line(self.internet_provider)
+        else:
+            transport_info = self.parse_transports_json(self.transports_json)
+        if self.bootstrap_cache is not None:
+            self.bootstrap_cache.put(self.bootstrap_key, name, transport_info)
+        return transport_info
+
+    def forget_transport_info(self):
+        """Resolve the transfer servers again on next use, the cached ones included."""
+        with self._transport_lock:
+            self._transport_info = None
+        if self.bootstrap_cache is not None:
+            self.bootstrap_cache.invalidate(self.bootstrap_key)
 
     def init_transmitter(self):
         """Gets the path of the transfer software.
@@ -216,34 +361,81 @@ class RayvisionTransfer(object):
             str: Cmd command.
 
         """
+        self.runtime.prepare()
         if not sys.platform.startswith('win'):
-            os.environ["LD_LIBRARY_PATH"] = os.path.dirname(self.transmitter_exe)
-            chmod_str = "chmod 777 -R {}/*".format(os.path.dirname(self.transmitter_exe))
-            os.system(chmod_str)
+            # The shell command inherits the environment of this process.
+            os.environ["LD_LIBRARY_PATH"] = self.runtime.directory
+        options = self._transmit_options(cmd_params, db_ini_path, engine_type, server_ip, server_port,
+                                         main_user_id, main_input_bid, bid, network_mode)
+        transmit_cmd = 'echo y|"{}"'.format(self.transmitter_exe)
+        for option, value in options:
+            if option == "-p":
+                transmit_cmd += ' {} {}'.format(option, value)
+            else:
+                transmit_cmd += ' {} "{}"'.format(option, value)
+        return transmit_cmd + ' '
+
+    def create_cmd_argv(self, cmd_params, db_ini_path=None, engine_type="aspera", server_ip=None,
+                        server_port=None, main_user_id=None, main_input_bid=None, bid=None, network_mode=0):
+        """Build the argument list to exec the transmitter directly.
+
+        Unlike ``create_cmd`` no shell is involved, so paths containing
+        quotes are passed through unchanged. The "y" confirmation that
+        ``create_cmd`` pipes in with ``echo`` must be written to the stdin of
+        the process, ``utils.run_cmd`` does so for argument lists. The
+        process must be started with ``self.runtime.env()``, the
+        environment of the current process is left untouched.
+
+        Args:
+            cmd_params (list): Parameters required by the cmd command, same
+                as ``create_cmd``.
+            db_ini_path (str): Database path.
+            engine_type (str, optional): set engine type, support "aspera" and "raysyncproxy", Default "aspera".
+            server_ip (str, optional): transmit server host.
+            server_port (str, optional): transmit server port.
+            main_user_id (str): Main account user id.
+            main_input_bid (str): Main account input bid.
+            bid (str): Storage id.
+            network_mode (int): network mode, same as ``create_cmd``.
+
+        Returns:
+            list of str: Transmitter executable followed by its arguments.
+
+        """
+        self.runtime.prepare()
+        options = self._transmit_options(cmd_params, db_ini_path, engine_type, server_ip, server_port,
+                                         main_user_id, main_input_bid, bid, network_mode)
+        argv = [self.transmitter_exe]
+        for option, value in options:
+            argv.extend([option, "%s" % value])
+        return argv
+
+    def _transmit_options(self, cmd_params, db_ini_path, engine_type, server_ip, server_port,
+                          main_user_id, main_input_bid, bid, network_mode):
+        """Get the ordered options of the transmitter command line.
+
+        Returns:
+            list of tuple: Option and value pairs.
+
+        """
         if not bool(engine_type):
             engine_type = "aspera"
         if engine_type not in ENGINE_TYPE:
             msg = "{} is not a supported transport engine, " \
                   "currently only support 'aspera' and 'raysyncproxy'".format(engine_type)
             raise UnsupportedEngineType(msg)
-        transmit_cmd = ('echo y|"{exePath}" -E "{engineType}"'
-                        ' -H "{serverIp}" -P "{serverPort}" -S "{download_id}"'
-                        ' -U "{userId}" -T "{transmit_type}" -L "{local_path}"'
-                        ' -R "{server_path}" -r "{maxConnectFailureCount}"'
-                        ' -K "{keep_path}" -s "{max_speed}" -C "{database_config_path}" -p {network_mode}'
-                        ' ').format(
-            exePath=self.transmitter_exe,
-            engineType=engine_type,
-            serverIp=server_ip if server_ip else self.transport_info[engine_type]['server_ip'],
-            serverPort=server_port if server_port else self.transport_info[engine_type]['server_port'],
-            download_id=main_input_bid if main_input_bid else bid or self.user_info[cmd_params[5]],
-            userId=main_user_id if main_user_id else self.user_id ,
-            transmit_type=cmd_params[0],
-            local_path=cmd_params[1],
-            server_path=cmd_params[2],
-            maxConnectFailureCount='2',  # default is 2.
-            keep_path=cmd_params[4],
-            max_speed=cmd_params[3],
-            database_config_path=db_ini_path,
-            network_mode=int(network_mode))
-        return transmit_cmd
+        return [
+            ("-E", engine_type),
+            ("-H", server_ip if server_ip else self.transport_info[engine_type]['server_ip']),
+            ("-P", server_port if server_port else self.transport_info[engine_type]['server_port']),
+            ("-S", main_input_bid if main_input_bid else bid or self.user_info[cmd_params[5]]),
+            ("-U", main_user_id if main_user_id else self.user_id),
+            ("-T", cmd_params[0]),
+            ("-L", cmd_params[1]),
+            ("-R", cmd_params[2]),
+            ("-r", '2'),  # maxConnectFailureCount, default is 2.
+            ("-K", cmd_params[4]),
+            ("-s", cmd_params[3]),
+            ("-C", db_ini_path),
+            ("-p", int(network_mode)),
+        ]
@@ -5,24 +5,69 @@ Upload the scene's configuration file and asset file.
 """
 
 # Import built-in modules
+import collections
 import configparser
 import os
-import logging
+import shutil
 import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED
 from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from concurrent.futures import wait
 
 # Import local modules
-from rayvision_sync.rayvision_raysync.transfer_raysync import RayvisionTransferRaysync
-from rayvision_sync import RayvisionTransfer
 from rayvision_sync.constants import TRANSFER_LOG, RENDERFARM_SDK, WINDOWS_LOCAL_ENV, LINUX_LOCAL_ENV, RAYVISION_DB
-from rayvision_sync.exception import RayvisionError, UnsupportedDatabaseError, UnsupportedEngineType
-from rayvision_sync.utils import create_transfer_params, get_share_info
-from rayvision_sync.utils import read_ini_config
+from rayvision_sync.exception import RayvisionError, TransferCancelled, UnsupportedDatabaseError, \
+    UnsupportedEngineType
+from rayvision_sync.bandwidth import acquire_bandwidth
+from rayvision_sync.concurrency import AdaptiveConcurrency
+from rayvision_sync.concurrency import ChunkReport
+from rayvision_sync.context import ContextAttribute
+from rayvision_sync.context import TransferContext
+from rayvision_sync.context import load_db_config
+from rayvision_sync.index import UploadIndex
+from rayvision_sync.index import file_identity
+from rayvision_sync.manifest import AssetWriter
+from rayvision_sync.manifest import iter_asset
+from rayvision_sync.output_parser import EVENT_FILE_DONE
+from rayvision_sync.output_parser import EVENT_FILE_FAILED
+from rayvision_sync.output_parser import TransmitterOutputParser
+from rayvision_sync.preflight import preflight_asset
+from rayvision_sync.retry import RetryPolicy
+from rayvision_sync.scheduler import WorkQueueUploader
+from rayvision_sync.utils import check_upload_result
+from rayvision_sync.utils import retry_upload_json
+from rayvision_sync.utils import normalize_local_path
 from rayvision_sync.utils import run_cmd
 from rayvision_sync.utils import str2unicode
-from rayvision_sync.utils import upload_retry
-from rayvision_sync.constants import PACKAGE_NAME, ENGINE_TYPE
-from rayvision_log import init_logger
+from rayvision_sync.constants import ENGINE_TYPE
+
+
+_PERSISTED_ENV = set()
+
+
+def _persist_env(name, value):
+    """Save an environment variable for the next sessions, once per process.
+
+    Only Windows has ``setx``, elsewhere the variable of the current process
+    is enough.
+
+    """
+    if not sys.platform.startswith("win") or (name, value) in _PERSISTED_ENV:
+        return
+    _PERSISTED_ENV.add((name, value))
+    subprocess.Popen('setx %s "%s" /m' % (name, value), shell=True)
+
+
+def _check_cancelled(cancel_event):
+    """Raise TransferCancelled once the cancel event is set."""
+    if cancel_event is not None and cancel_event.is_set():
+        raise TransferCancelled("Upload cancelled")
+
 
 class RayvisionUpload(object):
     """Upload files.
@@ -31,6 +76,10 @@ class RayvisionUpload(object):
 
     """
 
+    # Resolved by the context when a transfer needs them.
+    trans = ContextAttribute("trans")
+    raysync_engine = ContextAttribute("raysync_engine")
+
     def __init__(self, api,
                  db_config_path=None,
                  transports_json="",
@@ -40,7 +89,12 @@ class RayvisionUpload(object):
                  logger=None,
                  log_folder=None,
                  log_name=None,
-                 log_level="DEBUG"
+                 log_level="DEBUG",
+                 retry_policy=None,
+                 bandwidth=None,
+                 upload_index=None,
+                 share_info=None,
+                 context=None
                  ):
         """Initialize instance.
 
@@ -55,33 +109,38 @@ class RayvisionUpload(object):
             log_folder (string): Customize the absolute path of the folder where logs are stored.
             log_name (string): Custom log file name, the system user name will be searched by default.
             log_level (string):  Set log level, example: "DEBUG","INFO","WARNING","ERROR"
+            retry_policy (RetryPolicy): Retry policy of the uploads, default is ``RetryPolicy()``.
+            bandwidth (BandwidthCoordinator): Bandwidth shared with other transfers, the
+                ``max_speed`` of every upload is then only an upper bound.
+            upload_index (UploadIndex or bool): Index of the uploaded files, ``upload_asset`` then
+                only uploads the new or changed files. True opens the default index in the db folder.
+            share_info (ShareInfoResolver): Cache of the main account information, may be
+                shared with other transfers of the same api.
+            context (TransferContext): Lazily resolved state shared with other transfers of the
+                same api, the transfer arguments and the log arguments are then ignored.
         """
-        self.logger = logger
-        if not self.logger:
-            init_logger(PACKAGE_NAME, log_folder, log_name)
-            self.logger = logging.getLogger(__name__)
-            self.logger.setLevel(level=log_level.upper())
-
-        params = create_transfer_params(api)
-        params["transports_json"] = transports_json
-        params["transmitter_exe"] = transmitter_exe
-        params["automatic_line"] = automatic_line
-        params["internet_provider"] = internet_provider
+        self.context = context or TransferContext(api, transports_json, transmitter_exe, automatic_line,
+                                                  internet_provider, logger, log_folder, log_name, log_level)
+        self.logger = self.context.get_logger(__name__)
+        self.retry_policy = retry_policy or RetryPolicy(logger=self.logger)
+        self.bandwidth = bandwidth
         self.api = api
-        self.trans = RayvisionTransfer(api, **params)
-        self.raysync_engine = RayvisionTransferRaysync(self.api.user_info.get("domain"), self.trans.user_id, self.api.user_info.get("user_name"),
-                                                       self.api.query.get_raysync_user_key().get('raySyncUserKey'),
-                                                       self.trans.platform, self.logger, timeout=self.api.connect.timeout)
+        self.share_info = share_info or self.context.share_info
 
         # load db config ini
         self.transfer_log_path, self.redis_config, self.sqlite_config, self.database_config = \
-            self.load_db_config(db_config_path)
+            self.context.db_config(db_config_path)
 
         custom_db_path = self.database_config.get("db_path")
         db_dir = self._check_and_mk(custom_db_path)
         self.check_transfer_log_path(self.transfer_log_path)
         self.db_ini = os.path.join(db_dir, 'db_ini')
         self._db = os.path.join(db_dir, 'db')
+        if upload_index is True:
+            if not os.path.exists(db_dir):
+                os.makedirs(db_dir)
+            upload_index = UploadIndex(os.path.join(db_dir, "upload_index.db"))
+        self.upload_index = upload_index or None
 
     def check_transfer_log_path(self, transfer_log_path):
         """Check the log location of the transport engine."""
@@ -90,7 +149,7 @@ class RayvisionUpload(object):
             transfer_path = transfer_log_path
             if rayvision_log_path != transfer_log_path:
                 os.environ.update({TRANSFER_LOG: transfer_path})
-                subprocess.Popen('setx %s "%s" /m' % (TRANSFER_LOG, transfer_path), shell=True)
+                _persist_env(TRANSFER_LOG, transfer_path)
         elif os.path.exists(rayvision_log_path):
             transfer_path = rayvision_log_path
         else:
@@ -100,7 +159,7 @@ class RayvisionUpload(object):
                 transfer_path = os.path.join(os.environ[LINUX_LOCAL_ENV], RENDERFARM_SDK)
 
             os.environ.update({TRANSFER_LOG: transfer_path})
-            subprocess.Popen('setx %s "%s" /m' % (TRANSFER_LOG, transfer_path), shell=True)
+            _persist_env(TRANSFER_LOG, transfer_path)
 
         return transfer_path
 
@@ -169,9 +228,14 @@ class RayvisionUpload(object):
 
     def upload(self, task_id, task_json_path, tips_json_path, asset_json_path, upload_json_path, max_speed=None,
                transmit_type="upload_json", engine_type="aspera", server_ip=None, server_port=None, network_mode=0,
-               is_record=False, redis_flag=None, redis_obj=None, proxy_ip=None, proxy_port=None, upload_num=2):
+               is_record=False, redis_flag=None, redis_obj=None, proxy_ip=None, proxy_port=None, upload_num=2,
+               pipelined=False):
         """Run the cmd command to upload the configuration file.
 
+        The configuration files and the assets go to different storages, with
+        ``pipelined`` they are uploaded at the same time and the upload still
+        running is cancelled as soon as the other one fails.
+
         Args:
             task_id (str, optional): Task id.
             task_json_path (str, optional): task.json file absolute path.
@@ -197,6 +261,7 @@ class RayvisionUpload(object):
             proxy_ip(str): proxy ip, only supports raysyncproxy engine eg:10.14.88.66.
             proxy_port(str): proxy port, only supports raysyncproxy engine eg:5555.
             upload_num(int): Maximum number of uploads, default is 2.
+            pipelined (bool): Upload the configuration files and the assets at the same time.
 
         Returns:
             bool: True is success, False is failure.
@@ -208,6 +273,15 @@ class RayvisionUpload(object):
             asset_json_path,
             upload_json_path
         ]
+        if pipelined:
+            return self._pipelined_upload(
+                dict(task_id=task_id, config_file_list=config_file_list, max_speed=max_speed,
+                     engine_type=engine_type, server_ip=server_ip, server_port=server_port,
+                     network_mode=network_mode, proxy_ip=proxy_ip, proxy_port=proxy_port, upload_num=upload_num),
+                dict(upload_json_path=upload_json_path, max_speed=max_speed, transmit_type=transmit_type,
+                     engine_type=engine_type, server_ip=server_ip, server_port=server_port,
+                     network_mode=network_mode, is_record=is_record, redis_flag=redis_flag, redis_obj=redis_obj,
+                     proxy_ip=proxy_ip, proxy_port=proxy_port, upload_num=upload_num))
         result_config = self.upload_config(task_id, config_file_list, max_speed=max_speed,
                                            engine_type=engine_type, server_ip=server_ip, server_port=server_port,
                                            network_mode=network_mode, proxy_ip=proxy_ip, proxy_port=proxy_port,
@@ -223,10 +297,42 @@ class RayvisionUpload(object):
             return False
         return True
 
+    def _pipelined_upload(self, config_kwargs, asset_kwargs):
+        """Upload the configuration files and the assets at the same time.
+
+        Returns:
+            bool: True is success, False is failure.
+
+        Raises:
+            Exception: The error of the upload that failed first.
+
+        """
+        cancel_event = threading.Event()
+        errors = []
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(self.upload_config, cancel_event=cancel_event, **config_kwargs),
+                       executor.submit(self.upload_asset, cancel_event=cancel_event, **asset_kwargs)]
+            for future in as_completed(futures):
+                error = future.exception()
+                if error is None and future.result():
+                    continue
+                if not cancel_event.is_set():
+                    self.logger.info("Upload failed, cancel the other upload of the task")
+                    cancel_event.set()
+                if error is not None and not isinstance(error, TransferCancelled):
+                    errors.append(error)
+        if errors:
+            raise errors[0]
+        return not cancel_event.is_set()
+
     def upload_config(self, task_id, config_file_list, max_speed=None, engine_type="aspera", server_ip=None,
-                      server_port=None, network_mode=0, proxy_ip=None, proxy_port=None, upload_num=2):
+                      server_port=None, network_mode=0, proxy_ip=None, proxy_port=None, upload_num=2,
+                      cancel_event=None):
         """Run the cmd command to upload configuration profiles.
 
+        All the files are uploaded by one transmitter run or one Raysync
+        upload-list task, a retry only uploads the files that failed.
+
         Args:
             task_id (str): Task id.
             config_file_list (list): Configuration file path list.
@@ -243,67 +349,143 @@ class RayvisionUpload(object):
             proxy_ip(str): proxy ip, only supports raysyncproxy engine eg:10.14.88.66.
             proxy_port(str): proxy port, only supports raysyncproxy engine eg:5555.
             upload_num(int): Maximum number of uploads, default is 2.
+            cancel_event (threading.Event): Stop the upload once it is set.
 
         Returns:
             bool: True is success, False is failure.
 
+        Raises:
+            RayvisionError: Configuration files failed to upload.
+            TransferCancelled: ``cancel_event`` was set.
+
         """
-        transmit_type = "upload_path"
         max_speed = max_speed if max_speed is not None else "1048576"
-
-        for config_path in config_file_list:
-            local_path = str2unicode(config_path)
-            config_basename = os.path.basename(config_path)
-            server_path = '/{0}/cfg/{1}'.format(task_id, config_basename)
-            server_path = str2unicode(server_path)
-
-            if not os.path.exists(local_path):
-                self.logger.info('%s is not exists.', local_path)
-                continue
-            cmd_params = [transmit_type, local_path, server_path, max_speed,
-                          'false', 'config_bid']
-
-            times = 0
-            while True:
+        work_dir = tempfile.mkdtemp(prefix="rayvision_config_")
+        try:
+            config_json_path = self.config_upload_json(task_id, config_file_list, work_dir)
+            if config_json_path is None:
+                return True
+            # The configuration files are uploaded by one transfer, the retries only upload the ones not done.
+            manifest = {"path": config_json_path}
+
+            def upload_once():
+                """Upload the current configuration upload.json once."""
+                _check_cancelled(cancel_event)
                 if engine_type == "aspera":
-                    cmd = self.trans.create_cmd(cmd_params, engine_type=engine_type, server_ip=server_ip,
-                                                server_port=server_port, network_mode=network_mode)
-                    result = run_cmd(cmd, flag=True, logger=self.logger)
+                    parser = TransmitterOutputParser()
+                    with acquire_bandwidth(self.bandwidth, max_speed, network_mode=network_mode) as lease:
+                        cmd = self.config_cmd(manifest["path"], lease.speed, engine_type, server_ip, server_port,
+                                              network_mode)
+                        result = run_cmd(cmd, flag=True, logger=self.logger, parser=parser,
+                                         env=self.trans.runtime.env(), cancel_event=cancel_event)
+                    done_paths = parser.done_paths
                 elif engine_type == "raysyncproxy":
-                    param_dict = {
-                        "server_ip": server_ip if server_ip else self.trans.transport_info[engine_type]['server_ip'],
-                        "server_port": server_port if server_port else self.trans.transport_info[engine_type]['server_port'],
-                        "local_path": local_path,
-                        "server_path": server_path,
-                        "storage_id": self.trans.config_bid,
-                        "input_id": self.trans.input_bid,
-                        "task_type": "upload",
-                        "file_type": "json",
-                        "task_id": task_id,
-                        "max_speed": max_speed,
-                        "network_mode": network_mode,
-                        "proxy_ip": proxy_ip,
-                        "proxy_port": proxy_port,
-                        "upload_num": upload_num
-                    }
-                    result = self.raysync_engine.start_transfer(**param_dict)
+                    with acquire_bandwidth(self.bandwidth, max_speed, self.raysync_engine, network_mode) as lease:
+                        param_dict = self.config_raysync_params(task_id, manifest["path"], lease.engine_speed,
+                                                                server_ip, server_port, network_mode, proxy_ip,
+                                                                proxy_port, upload_num)
+                        result, done_paths = self._raysync_upload_list(param_dict, cancel_event=cancel_event)
                 else:
                     msg = "{} is not a supported transport engine, " \
-                      "currently only support 'aspera' and 'raysyncproxy'".format(engine_type)
+                          "currently only support 'aspera' and 'raysyncproxy'".format(engine_type)
                     raise UnsupportedEngineType(msg)
                 if result:
-                    if times == 9:
-                        raise RayvisionError(20004, "%s upload failed" %
-                                             config_path)
-                    times += 1
-                else:
-                    break
+                    retry_path = retry_upload_json(manifest["path"], done_paths)
+                    if retry_path:
+                        manifest["path"] = retry_path
+                return result
+
+            result = self.retry_policy.call_cancellable(cancel_event, upload_once)
+            _check_cancelled(cancel_event)
+            if result:
+                self.context.transfer_failed(result)
+                raise RayvisionError(20004, "%s upload failed" % ", ".join(
+                    item["local"] for item in iter_asset(manifest["path"])))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
         return True
 
-    @upload_retry
+    def config_upload_json(self, task_id, config_file_list, work_dir):
+        """Write the upload.json uploading all the configuration files of a task.
+
+        Args:
+            task_id (int): Task id.
+            config_file_list (list): Paths of the configuration files.
+            work_dir (str): Folder of the upload.json.
+
+        Returns:
+            str: Path of the upload.json, None if no configuration file exists.
+
+        """
+        config_json_path = os.path.join(work_dir, "config_%s.json" % task_id)
+        with AssetWriter(config_json_path) as writer:
+            for config_path in config_file_list:
+                local_path = str2unicode(config_path)
+                if not os.path.exists(local_path):
+                    self.logger.info('%s is not exists.', local_path)
+                    continue
+                writer.write({"local": local_path, "server": self._config_server_path(task_id, local_path)})
+        return config_json_path if writer.count else None
+
+    @staticmethod
+    def _config_server_path(task_id, local_path):
+        """Get the server path of a configuration file."""
+        return str2unicode('/{0}/cfg/{1}'.format(task_id, os.path.basename(local_path)))
+
+    def config_cmd(self, config_json_path, max_speed, engine_type, server_ip, server_port, network_mode):
+        """Get the transmitter command uploading the configuration files of an upload.json.
+
+        The transport information may be requested from the API on first use.
+
+        Args:
+            config_json_path (str): Upload.json of the configuration files.
+            max_speed (str): Maximum transmission speed, in KB/S.
+            engine_type (str): Transport engine type.
+            server_ip (str): Transport server IP.
+            server_port (str): Transport server port.
+            network_mode (int): Network mode.
+
+        Returns:
+            list: Argument list of the transmitter.
+
+        """
+        cmd_params = ["upload_json", config_json_path, "/", max_speed, 'false', 'config_bid']
+        return self.trans.create_cmd_argv(cmd_params, engine_type=engine_type, server_ip=server_ip,
+                                          server_port=server_port, network_mode=network_mode)
+
+    def config_raysync_params(self, task_id, config_json_path, max_speed, server_ip, server_port, network_mode,
+                              proxy_ip, proxy_port, upload_num):
+        """Get the Raysync upload-list parameters uploading the configuration files of an upload.json.
+
+        The arguments are the same as ``config_cmd``, the transport
+        information may be requested from the API on first use.
+
+        Returns:
+            dict: Keyword arguments of ``RayvisionTransferRaysync.start_transfer``.
+
+        """
+        engine_type = "raysyncproxy"
+        return {
+            "server_ip": server_ip if server_ip else self.trans.transport_info[engine_type]['server_ip'],
+            "server_port": server_port if server_port else self.trans.transport_info[engine_type]['server_port'],
+            "local_path": config_json_path,
+            "server_path": "",
+            "storage_id": self.trans.config_bid,
+            "input_id": self.trans.input_bid,
+            "task_type": "upload-list",
+            "file_type": "json",
+            "task_id": task_id,
+            "max_speed": max_speed,
+            "network_mode": network_mode,
+            "proxy_ip": proxy_ip,
+            "proxy_port": proxy_port,
+            "upload_num": upload_num
+        }
+
     def upload_asset(self, upload_json_path, max_speed=None, is_db=True, engine_type="aspera", server_ip=None,
                      server_port=None, transmit_type="upload_json", network_mode=0, redis_flag=None, is_record=False,
-                     redis_obj=None, proxy_ip=None, proxy_port=None, upload_num=2):
+                     redis_obj=None, proxy_ip=None, proxy_port=None, upload_num=2, callback=None, force=False,
+                     preflight=False, cancel_event=None):
         """Run the cmd command to upload asset files.
 
         Args:
@@ -326,89 +508,354 @@ class RayvisionUpload(object):
             proxy_ip(str): proxy ip, only supports raysyncproxy engine eg:10.14.88.66.
             proxy_port(str): proxy port, only supports raysyncproxy engine eg:5555.
             upload_num(int): Maximum number of uploads, default is 2.
+            callback (func): Called with every ``TransmitterEvent`` of the aspera engine.
+            force (bool): Upload every file of the upload.json even if the upload index
+                knows it, the index is updated anyway.
+            preflight (bool): Stat the files before uploading them, see
+                ``preflight.preflight_asset``: the folders are expanded and the missing
+                files dropped instead of failing the transmitter with status code 11.
+            cancel_event (threading.Event): Stop the upload once it is set.
 
         Returns:
-            bool: True is success, False is failure.
+            bool: True is success.
+
+        Raises:
+            RayvisionError: The upload failed, see ``utils.check_upload_result``.
+            TransferCancelled: ``cancel_event`` was set.
 
         """
         max_speed = max_speed if max_speed is not None else "1048576"
+        main_input_bid, main_user_id = self.share_info.resolve()
+
+        # The manifests derived from upload_json_path are written there.
+        work_dir = tempfile.mkdtemp(prefix="rayvision_upload_")
+        try:
+            # The retries only upload the files not done by the previous attempt.
+            manifest = {"path": upload_json_path}
+            changed = None
+            uploaded = set()
+            if preflight and transmit_type == "upload_json":
+                report = preflight_asset(upload_json_path, os.path.join(work_dir, "preflight.json"),
+                                         attach_sizes=False, logger=self.logger)
+                if not report.file_count:
+                    self.logger.info("No file of %s exists, nothing to upload", upload_json_path)
+                    return True
+                manifest["path"] = report.upload_json_path
+            if self.upload_index is not None and transmit_type == "upload_json":
+                manifest["path"], changed = self._index_changes(manifest["path"], main_input_bid, work_dir, force)
+                if not changed:
+                    self.logger.info("All the files of %s are already uploaded", upload_json_path)
+                    return True
+
+            def on_event(event):
+                """Remember the uploaded files for the index."""
+                if event.type == EVENT_FILE_DONE:
+                    uploaded.add(normalize_local_path(event.path))
+                if callback:
+                    callback(event)
+
+            def upload_once():
+                """Upload the current upload.json once."""
+                _check_cancelled(cancel_event)
+                if engine_type == "aspera":
+                    parser = TransmitterOutputParser()
+                    with acquire_bandwidth(self.bandwidth, max_speed, network_mode=network_mode) as lease:
+                        cmd = self.asset_cmd(manifest["path"], lease.speed, is_db, engine_type, server_ip,
+                                             server_port, transmit_type, network_mode, main_input_bid, main_user_id)
+                        result = run_cmd(cmd, flag=True, logger=self.logger, is_record=is_record,
+                                         redis_flag=redis_flag, redis_obj=redis_obj, parser=parser,
+                                         env=self.trans.runtime.env(), callback=on_event,
+                                         cancel_event=cancel_event)
+                    done_paths = parser.done_paths
+                elif engine_type == "raysyncproxy":
+                    with acquire_bandwidth(self.bandwidth, max_speed, self.raysync_engine, network_mode) as lease:
+                        param_dict = self.asset_raysync_params(manifest["path"], lease.engine_speed, server_ip,
+                                                               server_port, network_mode, proxy_ip, proxy_port,
+                                                               upload_num, main_input_bid, main_user_id)
+                        result, done_paths = self._raysync_upload_list(param_dict, cancel_event=cancel_event)
+                    uploaded.update(normalize_local_path(path) for path in done_paths)
+                else:
+                    msg = "{} is not a supported transport engine, " \
+                          "currently only support 'aspera' and 'raysyncproxy'".format(engine_type)
+                    raise UnsupportedEngineType(msg)
+                if result and transmit_type == "upload_json":
+                    retry_path = retry_upload_json(manifest["path"], done_paths,
+                                                   os.path.join(work_dir, "retry.json"))
+                    if retry_path:
+                        self.logger.info("%s files are uploaded, the others will be uploaded again from %s",
+                                         len(done_paths), retry_path)
+                        manifest["path"] = retry_path
+                return result
+
+            try:
+                result = self.retry_policy.call_cancellable(cancel_event, upload_once)
+            except TransferCancelled:
+                # The files uploaded before the cancellation are recorded anyway.
+                result = None
+            if changed:
+                if result != 0:
+                    changed = [(item, identity) for item, identity in changed
+                               if normalize_local_path(item["local"]) in uploaded]
+                self.upload_index.record(changed, main_input_bid)
+            _check_cancelled(cancel_event)
+            if result:
+                self.context.transfer_failed(result)
+            return check_upload_result(result)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _index_changes(self, upload_json_path, storage_id, work_dir, force=False):
+        """Find the files of an upload.json missing from the upload index.
+
+        The changed files are written to "changed.json" in ``work_dir``.
+
+        Returns:
+            tuple: Path of the upload.json to upload, and the files to upload
+                with their identities.
+
+        """
+        if force:
+            return upload_json_path, [(item, file_identity(item["local"])) for item in iter_asset(upload_json_path)]
+        total = [0]
+
+        def counted():
+            """Count the files while they are compared."""
+            for item in iter_asset(upload_json_path):
+                total[0] += 1
+                yield item
+
+        changed = list(self.upload_index.changed(counted(), storage_id))
+        if not changed or len(changed) == total[0]:
+            return upload_json_path, changed
+        changed_path = os.path.join(work_dir, "changed.json")
+        with AssetWriter(changed_path) as writer:
+            for item, _ in changed:
+                writer.write(item)
+        self.logger.info("%s of %s files changed since the last upload, uploading %s",
+                         len(changed), total[0], changed_path)
+        return changed_path, changed
+
+    def _raysync_upload_list(self, param_dict, max_timeout=18000, cancel_event=None):
+        """Upload an upload-list with Raysync once.
+
+        ``/get-file-list`` only lists the failed or the transferred files of
+        a task, the files never reached are in neither. After a failure the
+        whole success list is requested, one request per 1000 transferred
+        files, to upload the files not done again.
+
+        Returns:
+            tuple: Status code, and the local paths of the uploaded files when
+                the upload failed.
+
+        """
+        engine = self.raysync_engine
+        transfer_task_id = engine.prepare_transfer(**param_dict)
+        result = engine.look_task_status(transfer_task_id, param_dict.get("task_id"), max_timeout,
+                                         param_dict["task_type"], cancel_event)
+        if not result:
+            return result, []
+        done_paths = [file_dict["local-path"] for file_dict in engine.get_done_files(transfer_task_id)]
+        if done_paths:
+            # A new task is created with the files not done instead of restarting the whole list.
+            engine.forget_failed_task(param_dict.get("task_id"))
+        return result, done_paths
+
+    def asset_cmd(self, upload_json_path, max_speed, is_db, engine_type, server_ip, server_port, transmit_type,
+                  network_mode, main_input_bid, main_user_id):
+        """Get the transmitter command uploading the assets of an upload.json.
+
+        The arguments are the same as ``upload_asset``, the transport
+        information may be requested from the API on first use.
+
+        Returns:
+            list: Argument list of the transmitter.
+
+        """
         cmd_params = [transmit_type, upload_json_path, '/', max_speed,
                       'false', 'input_bid']
         if is_db:
             db_ini_path = self.create_db_ini(upload_json_path)
         else:
             db_ini_path = None
-        main_input_bid, main_user_id = get_share_info(self.api)
-        if engine_type == "aspera":
-            cmd = self.trans.create_cmd(cmd_params, db_ini_path, engine_type, server_ip, server_port,
-                                        main_user_id=main_user_id, main_input_bid=main_input_bid,
-                                        network_mode=network_mode)
-            result = run_cmd(cmd, flag=True, logger=self.logger, is_record=is_record, redis_flag=redis_flag, redis_obj=redis_obj)
-        elif engine_type == "raysyncproxy":
-            param_dict = {
-                "server_ip": server_ip if server_ip else self.trans.transport_info[engine_type]['server_ip'],
-                "server_port": server_port if server_port else self.trans.transport_info[engine_type]['server_port'],
-                "local_path": upload_json_path,
-                "server_path": "",
-                "storage_id": main_input_bid,
-                "task_type": "upload-list",
-                "max_speed": max_speed,
-                "network_mode": network_mode,
-                "proxy_ip": proxy_ip,
-                "proxy_port": proxy_port,
-                "user_id": main_user_id,
-                "upload_num": upload_num
-            }
-            result = self.raysync_engine.start_transfer(**param_dict)
-        else:
-            msg = "{} is not a supported transport engine, " \
-                  "currently only support 'aspera' and 'raysyncproxy'".format(engine_type)
-            raise UnsupportedEngineType(msg)
-        return result
+        return self.trans.create_cmd_argv(cmd_params, db_ini_path, engine_type, server_ip, server_port,
+                                          main_user_id=main_user_id, main_input_bid=main_input_bid,
+                                          network_mode=network_mode)
 
-    def load_db_config(self, db_config_path=None):
-        if not bool(db_config_path) or not os.path.exists(db_config_path):
-            db_config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "db_config.ini"))
-        conf = read_ini_config(db_config_path)
-        on = conf.get("DATABASE_CONFIG", "on")
-        type = conf.get("DATABASE_CONFIG", "type")
-        db_path = conf.get("DATABASE_CONFIG", "db_path")
-        host = conf.get("REDIS", "host")
-        port = conf.get("REDIS", "port")
-        password = conf.get("REDIS", "password")
-        table_index = conf.get("REDIS", "table_index")
-        timeout = conf.get("REDIS", "timeout")
-        temporary = conf.get("SQLITE", "temporary")
-        transfer_log_path = conf.get("TRANSFER_LOG_PATH", "transfer_log_path")
-
-        database_config = {
-            "on": on,
-            "type": type,
-            "db_path": db_path
-        }
-        redis_config = {
-            "host": host,
-            "port": int(port),
-            "password": password,
-            "table_index": table_index,
-            "timeout": timeout
-        }
-        sqlite_config = {
-            "temporary": temporary
+    def asset_raysync_params(self, upload_json_path, max_speed, server_ip, server_port, network_mode, proxy_ip,
+                             proxy_port, upload_num, main_input_bid, main_user_id):
+        """Get the Raysync task parameters uploading the assets of an upload.json.
+
+        The arguments are the same as ``upload_asset``, the transport
+        information may be requested from the API on first use.
+
+        Returns:
+            dict: Keyword arguments of ``RayvisionTransferRaysync.start_transfer``.
+
+        """
+        engine_type = "raysyncproxy"
+        return {
+            "server_ip": server_ip if server_ip else self.trans.transport_info[engine_type]['server_ip'],
+            "server_port": server_port if server_port else self.trans.transport_info[engine_type]['server_port'],
+            "local_path": upload_json_path,
+            "server_path": "",
+            "storage_id": main_input_bid,
+            "task_type": "upload-list",
+            "max_speed": max_speed,
+            "network_mode": network_mode,
+            "proxy_ip": proxy_ip,
+            "proxy_port": proxy_port,
+            "user_id": main_user_id,
+            "upload_num": upload_num
         }
 
-        return transfer_log_path, redis_config, sqlite_config, database_config
+    def load_db_config(self, db_config_path=None):
+        """Read db_config.ini, see ``context.load_db_config``."""
+        return load_db_config(db_config_path)
 
-    def thread_pool_upload(self, upload_pool, pool_size=10, **kwargs):
+    def thread_pool_upload(self, upload_pool, pool_size=10, adaptive=False, min_workers=1, max_workers=None,
+                           interval=10.0, **kwargs):
         """Thread pool upload.
 
         Args:
             upload_pool (list or tuple): store a list or ancestor of uploaded files.
-            pool_size (int): thread pool size, default is 10 threads.
+            pool_size (int): thread pool size, default is 10 threads. With ``adaptive``
+                the number of parallel uploads to start with.
+            adaptive (bool): Adapt the number of parallel uploads to the throughput
+                reported by the transmitters, see ``AdaptiveConcurrency``.
+            min_workers (int): Lowest number of parallel uploads with ``adaptive``.
+            max_workers (int): Highest number of parallel uploads with ``adaptive``,
+                default is four times ``pool_size``.
+            interval (float): Seconds of one throughput measure with ``adaptive``.
+            kwargs (dict): Other keyword parameters of ``upload_asset``.
+
+        Returns:
+            list of ChunkReport: Result of every upload.json, in the order of ``upload_pool``.
+                The uploaded bytes are only measured with ``adaptive``, 0 otherwise.
+
+        """
+        kwargs.pop("is_db", None)
+        controller = None
+        if adaptive:
+            controller = AdaptiveConcurrency(pool_size, min_workers, max_workers or pool_size * 4, interval)
+        reports = [None] * len(upload_pool)
+        pending = collections.deque(enumerate(upload_pool))
+        running = {}
+        pool = ThreadPoolExecutor(controller.max_workers if controller else pool_size)
+        try:
+            while pending or running:
+                limit = controller.update() if controller else pool_size
+                while pending and len(running) < limit:
+                    index, upload_json_path = pending.popleft()
+                    running[pool.submit(self._upload_chunk, upload_json_path, controller, kwargs)] = index
+                done, _ = wait(list(running), timeout=interval if controller else None,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    reports[running.pop(future)] = future.result()
+        finally:
+            pool.shutdown(wait=True)
+        return reports
+
+    def _upload_chunk(self, upload_json_path, controller, kwargs):
+        """Upload one upload.json of ``thread_pool_upload`` and report it."""
+        done = {"files": 0, "bytes": 0}
+
+        def on_event(event):
+            """Count the uploaded files, measure their bytes for the controller."""
+            if event.type == EVENT_FILE_DONE:
+                done["files"] += 1
+                if controller:
+                    try:
+                        size = os.path.getsize(event.path)
+                    except OSError:
+                        size = 0
+                    done["bytes"] += size
+                    controller.record_bytes(size)
+            elif event.type == EVENT_FILE_FAILED and controller:
+                controller.record_failure()
+
+        start = time.time()
+        try:
+            self.upload_asset(upload_json_path=upload_json_path, is_db=False, callback=on_event, **kwargs)
+        except Exception as err:  # pylint: disable=broad-except
+            self.logger.error("%s upload failed: %s", upload_json_path, err)
+            if controller:
+                controller.record_failure()
+            return ChunkReport(upload_json_path, False, err, time.time() - start, done["files"], done["bytes"])
+        return ChunkReport(upload_json_path, True, None, time.time() - start, done["files"], done["bytes"])
+
+    def queue_upload(self, upload_json_path, workers=10, max_speed=None, server_ip=None, server_port=None,
+                     network_mode=0, **kwargs):
+        """Upload an upload.json with workers pulling batches from a queue.
+
+        Replaces ``cutting_upload`` followed by ``thread_pool_upload``, see
+        ``WorkQueueUploader``. Only the aspera engine is supported.
+
+        Args:
+            upload_json_path (str): Path to the upload.json file.
+            workers (int): Number of transmitters running at the same time.
+            max_speed (str): Maximum transmission speed, default value
+                is 1048576 KB/S.
+            server_ip (str): Transport server IP.
+            server_port (str): Transport server port.
+            network_mode (int): network mode: 0: auto selected, default;
+                                               1: tcp;
+                                               2: udp;
+            kwargs (dict): Other keyword parameters of ``WorkQueueUploader``.
+
+        Returns:
+            WorkQueueReport: Number of uploaded files, paths of the failed
+                files, number of batches and seconds spent.
 
         """
-        kwargs.pop("is_db")
-        pool = ThreadPoolExecutor(pool_size)
-        for i in range(len(upload_pool)):
-            pool.submit(self.upload_asset, upload_json_path=upload_pool[i], is_db=False, **kwargs)
-        pool.shutdown(wait=True)
+        uploader = WorkQueueUploader(self, workers=workers, **kwargs)
+        return uploader.run(upload_json_path, max_speed=max_speed, server_ip=server_ip, server_port=server_port,
+                            network_mode=network_mode)
+
+    def supervised_upload(self, upload_pool, max_processes=50, max_speed=None, engine_type="aspera",
+                          server_ip=None, server_port=None, transmit_type="upload_json", network_mode=0):
+        """Upload many upload.json files with transmitters read from one thread.
+
+        Unlike ``thread_pool_upload`` no thread is blocked per running
+        transmitter, the output of all of them is multiplexed by a
+        ``TransmitterSupervisor``. Only the aspera engine runs a transmitter.
+
+        Args:
+            upload_pool (list or tuple): Paths to the upload.json files.
+            max_processes (int): Maximum number of transmitters running at
+                the same time, default is 50.
+            max_speed (str): Maximum transmission speed, default value
+                is 1048576 KB/S.
+            engine_type (str): Transport engine type, only supports "aspera".
+            server_ip (str): Transport server IP.
+            server_port (str): Transport server port.
+            transmit_type (str): transmit type, "upload_json" or "upload_list".
+            network_mode (int): network mode: 0: auto selected, default;
+                                               1: tcp;
+                                               2: udp;
+
+        Returns:
+            dict: Status code of every upload.json, 0 is success.
+
+        """
+        if engine_type != "aspera":
+            raise UnsupportedEngineType("supervised_upload only supports the 'aspera' engine")
+        max_speed = max_speed if max_speed is not None else "1048576"
+        main_input_bid, main_user_id = self.share_info.resolve()
+        env = self.trans.runtime.env()
+        slots = threading.BoundedSemaphore(max_processes)
+        # selectors is Python 3 only, the other uploads still run on Python 2.
+        from rayvision_sync.supervisor import TransmitterSupervisor  # pylint: disable=import-outside-toplevel
+        supervisor = TransmitterSupervisor(self.logger)
+        jobs = {}
+        try:
+            for upload_json_path in upload_pool:
+                slots.acquire()
+                lease = acquire_bandwidth(self.bandwidth, max_speed, network_mode=network_mode)
+                cmd = self.asset_cmd(upload_json_path, lease.speed, False, engine_type, server_ip, server_port,
+                                     transmit_type, network_mode, main_input_bid, main_user_id)
+                job = supervisor.submit(cmd, env=env)
+                job.future.add_done_callback(lambda _, lease=lease: (lease.release(), slots.release()))
+                jobs[upload_json_path] = job
+        finally:
+            supervisor.shutdown(wait=True)
+        return dict((path, job.future.result()) for path, job in jobs.items())
@@ -3,28 +3,43 @@
 # Import built-in modules
 from __future__ import print_function
 
+import array
 import codecs
+import functools
+import heapq
 import json
 import logging
 import os
-import re
 import subprocess
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import configparser
 from builtins import str
 
 # Import local models
+from rayvision_sync.constants import COMMAND_NOT_FOUND_CODE
 from rayvision_sync.constants import TASK_STATUS_DESCRIPTION
 # Import third-party modules
 from rayvision_sync.exception import RayvisionError
-
-
-def print_to_log(cmd, logger, is_record=False, redis_flag=None, redis_obj=None):
+from rayvision_sync.manifest import AssetWriter
+from rayvision_sync.manifest import iter_asset
+from rayvision_sync.output_parser import EVENT_FILE_DONE
+from rayvision_sync.output_parser import TransmitterOutputParser
+from rayvision_sync.output_parser import read_output
+from rayvision_sync.record import RedisRecordWriter
+from rayvision_sync.record import get_redis_client
+from rayvision_sync.retry import RetryPolicy
+
+
+def print_to_log(cmd, logger, is_record=False, redis_flag=None, redis_obj=None,
+                 parser=None, callback=None, record_writer=None):
     """Output the CMD command information.
 
-    If there is an error in the log, it will be recorded in a list.
+    The output is drained and parsed as it is read, if there is an error in
+    the log, it will be recorded.
 
     Args:
         cmd (subprocess.Popen): The object obtained by executing the cmd
@@ -32,37 +47,54 @@ def print_to_log(cmd, logger, is_record=False, redis_flag=None, redis_obj=None):
         logger (func): The log function.
             .e.g:
                 SDK_LOG.info.
+        is_record (bool, optional): Whether to save upload records.
+        redis_flag (str, optional): Redis database tag.
+        redis_obj (object, optional): redis object.
+        parser (TransmitterOutputParser, optional): Parser of the output.
+        callback (func, optional): Called with every ``TransmitterEvent``.
+        record_writer (RedisRecordWriter, optional): Writer of the upload
+            records, it is flushed but not closed. Without it a writer is
+            created for this command when ``is_record`` is True.
 
     Returns:
-        list: All errors output by the cmd command.
+        ErrorMessages: All errors output by the cmd command.
 
     """
-    err_messages = []
-    if is_record and not redis_obj:
-        import redis
-        redis_obj = redis.Redis(host='localhost', port=6379, db=2, decode_responses=True)
-    while True:
-        result_line = cmd.stdout.readline()
-        if result_line:
-            result_line = result_line.strip()
-            if result_line:
-                result_line = str2unicode(result_line)
-                if is_record:
-                    complite = re.compile(".*?upload file done.*?\((.*?)\).*")
-                    obj = re.search(complite, result_line)
-                    if obj:
-                        upload_done_file = obj.group(1).strip()
-                        insert_redis(path=upload_done_file, redis_db=redis_obj, redis_flag=redis_flag)
-
-                if logger:
-                    logger(result_line)
-                    if ('upload file fail' in result_line or
-                            ('get path' in result_line and
-                             'info failed' in result_line)):
-                        err_messages.append(result_line)
+    parser = parser or TransmitterOutputParser(track_done=False)
+    own_writer = is_record and record_writer is None
+    if own_writer:
+        record_writer = RedisRecordWriter(redis_obj or get_redis_client(), redis_flag)
+
+    def handle_event(event):
+        """Record, log and forward one event."""
+        if is_record and event.type == EVENT_FILE_DONE:
+            record_writer.add(event.path)
+        if logger:
+            logger(event.line)
+        if callback:
+            callback(event)
+
+    try:
+        if is_record or callback:
+            read_output(cmd.stdout, parser, handle_event)
         else:
-            break
-    return err_messages
+            # Nobody consumes the events, do not build them.
+            parser.scan(cmd.stdout, logger)
+    finally:
+        if own_writer:
+            record_writer.close()
+        elif is_record:
+            record_writer.flush()
+    return parser.errors
+
+
+def _log_err_messages(err_messages, logger):
+    """Log the recorded error messages and how many were dropped."""
+    for err_message in err_messages:
+        logger("err_message: %s", err_message)
+    dropped = getattr(err_messages, "dropped", 0)
+    if dropped:
+        logger("%s more err_message were not kept", dropped)
 
 
 def handle_cmd_result(flag, returncode, err_messages, logger=None):
@@ -75,7 +107,7 @@ def handle_cmd_result(flag, returncode, err_messages, logger=None):
     Args:
         flag (bool): Used to identify uploads.
         returncode (int): The status code returned by cmd after execution.
-        err_messages (list of str): List of error messages.
+        err_messages (ErrorMessages or list of str): Error messages.
         logger (logging.info or logging.debug): Log output object method.
 
     Returns:
@@ -86,42 +118,64 @@ def handle_cmd_result(flag, returncode, err_messages, logger=None):
     if flag and returncode == 0:
         pass
     elif flag and returncode == 11:
-        for err_message in err_messages:
-            logger("err_message: %s", err_message)
+        _log_err_messages(err_messages, logger)
         logger("cmdp.returncode: %s", returncode)
         logger("Upload failed, there has non-uploadable files")
 
     elif flag and returncode == 10:
-        for err_message in err_messages:
-            logger("err_message: %s", err_message)
+        _log_err_messages(err_messages, logger)
         logger("cmdp.returncode: %s", returncode)
         logger("Err_message has files that have not been uploaded"
                " successfully, will enter retry upload ")
 
     elif flag and returncode == 9:
-        for err_message in err_messages:
-            logger("err_message: %s", err_message)
+        _log_err_messages(err_messages, logger)
         logger("cmdp.returncode: %s", returncode)
         logger("Parameter or domain name resolution error.")
 
     return returncode
 
 
+def _close_stdin(process, answer=None):
+    """Write the answer to the stdin of the process and close it."""
+    try:
+        if answer and not process.stdin.closed:
+            process.stdin.write((answer + "\n").encode("utf-8"))
+        process.stdin.close()
+    except (IOError, OSError):
+        # The process exited without reading its stdin.
+        pass
+
+
 def run_cmd(cmd_str, my_shell=True, print_log=True, flag=None, logger=None, is_record=False, redis_flag=None,
-            redis_obj=None):
+            redis_obj=None, parser=None, record_writer=None, answer="y", env=None, callback=None, cancel_event=None):
     """Run cmd.
 
     If the cmd runs with an error, it will print the error message and return
     to False.
 
     Args:
-        cmd_str (str): String of the cmd command.
+        cmd_str (str or list): String of the cmd command, or the argument
+            list of a program to execute directly without a shell.
         my_shell (bool, optional): Accept a string type variable as a command
-            and call the shell to execute the string.
+            and call the shell to execute the string, ignored for argument
+            lists.
         print_log (bool, optional): Print log, True: print, False: not print.
         flag (bool, optional): default is None.
         logger (logging, optional): Log object.
         redis_obj (object, optional): redis object
+        parser (TransmitterOutputParser, optional): Parser of the output,
+            pass one in to inspect the events after the run.
+        record_writer (RedisRecordWriter, optional): Writer of the upload
+            records shared by several commands.
+        answer (str, optional): Written to the stdin of an argument list
+            command before stdin is closed, it replaces the ``echo y|`` of
+            the shell commands.
+        env (dict, optional): Environment of the process, default is the
+            environment of the current process.
+        callback (func, optional): Called with every ``TransmitterEvent``.
+        cancel_event (threading.Event, optional): The process is killed once
+            it is set.
 
     Returns:
         bool: True is success, False is wrong.
@@ -135,55 +189,103 @@ def run_cmd(cmd_str, my_shell=True, print_log=True, flag=None, logger=None, is_r
     else:
         logger = logger.debug
 
-    logger(u'cmd...%s', str2unicode(cmd_str))
+    is_argv = isinstance(cmd_str, (list, tuple))
+    if is_argv:
+        logger(u'cmd...%s', subprocess.list2cmdline([str2unicode(arg) for arg in cmd_str]))
+        my_shell = False
+    else:
+        logger(u'cmd...%s', str2unicode(cmd_str))
 
     if sys.version_info[0] == 2:
-        cmd_str = str2unicode(cmd_str)
-        cmd_str = cmd_str.encode(sys.getfilesystemencoding())
-
-
-    cmd_result = subprocess.Popen(cmd_str, stdin=subprocess.PIPE,
-                                  stdout=subprocess.PIPE,
-                                  stderr=subprocess.STDOUT,
-                                  shell=my_shell)
+        if is_argv:
+            cmd_str = [str2unicode(arg).encode(sys.getfilesystemencoding()) for arg in cmd_str]
+        else:
+            cmd_str = str2unicode(cmd_str)
+            cmd_str = cmd_str.encode(sys.getfilesystemencoding())
 
-    err_messages = print_to_log(cmd_result, logger, is_record=is_record, redis_flag=redis_flag, redis_obj=redis_obj)
-    cmd_result.communicate()
+    try:
+        cmd_result = subprocess.Popen(cmd_str, stdin=subprocess.PIPE,
+                                      stdout=subprocess.PIPE,
+                                      stderr=subprocess.STDOUT,
+                                      shell=my_shell,
+                                      env=env)
+    except OSError as err:
+        if not is_argv:
+            raise
+        # Same status code as a shell reporting a command it cannot run.
+        return handle_cmd_result(flag, COMMAND_NOT_FOUND_CODE, [str(err)], logger)
+    if is_argv:
+        _close_stdin(cmd_result, answer)
+    if cancel_event is not None:
+        threading.Thread(target=_kill_on_cancel, args=(cmd_result, cancel_event)).start()
+
+    err_messages = print_to_log(cmd_result, logger, is_record=is_record, redis_flag=redis_flag, redis_obj=redis_obj,
+                                parser=parser, callback=callback, record_writer=record_writer)
+    _close_stdin(cmd_result)
+    cmd_result.wait()
     returncode = cmd_result.returncode
     return handle_cmd_result(flag, returncode, err_messages, logger)
 
 
-def upload_retry(func):
-    """Determine whether to retry according to the status code of cmd."""
+def _kill_on_cancel(process, cancel_event, poll_interval=0.5):
+    """Kill a process once the cancel event is set, return when it ends."""
+    while process.poll() is None:
+        if cancel_event.wait(poll_interval):
+            if process.poll() is None:
+                process.kill()
+            return
+
+
+def check_upload_result(result):
+    """Raise the error of a failed upload.
+
+    Args:
+        result (int): Status code of the last upload attempt.
+
+    Returns:
+        bool: True if the upload succeeded.
+
+    Raises:
+        RayvisionError: The upload failed.
+        Exception: Parameter or domain name resolution error.
+
+    """
+    if result == 0:
+        return True
+    if result == 11:
+        raise RayvisionError(200025, "There are files that cannot"
+                                     "be uploaded, please check the file is exists.")
+    if result == 9:
+        raise Exception("Parameter or domain name resolution"
+                        "error.")
+    if result in [1, 2, 3, 4, 5, 6, 7, 8]:
+        raise RayvisionError(200024, "argument format invalid"
+                                     "please check the argument.")
+    raise RayvisionError(200026, "Upload failed, status code is %s." % result)
+
+
+def upload_retry(func=None, policy=None):
+    """Retry an upload according to the status code of cmd.
+
+    Args:
+        func (func): Upload returning a status code.
+        policy (RetryPolicy, optional): Retry policy, default is
+            ``RetryPolicy()``.
 
+    Examples::
+
+        @upload_retry(policy=RetryPolicy(max_attempts=3))
+        def upload():
+            ...
+
+    """
+    if func is None:
+        return functools.partial(upload_retry, policy=policy)
+
+    @functools.wraps(func)
     def inner(*args, **kwargs):
         """Handle."""
-        time_interval = 5
-        times = 0
-        logger = logging.getLogger(__name__)
-        while True:
-            result = func(*args, **kwargs)
-            if result == 0:
-                return True
-            if times > 10:
-                if result == 11:
-                    raise RayvisionError(200025, "There are files that cannot"
-                                                 "be uploaded, please check the file is exists.")
-                if result == 10:
-                    time.sleep(time_interval)
-                    time_interval += 10
-                    if time_interval > 600:
-                        time_interval = 600
-                    logger.info("Retrying upload......")
-                elif result == 9:
-                    raise Exception("Parameter or domain name resolution"
-                                    "error.")
-                elif result in [1, 2, 3, 4, 5, 6, 7, 8]:
-                    raise RayvisionError(200024, "argument format invalid"
-                                                 "please check the argument.")
-            else:
-                times += 1
-                logger.info("Retrying upload......")
+        return check_upload_result((policy or RetryPolicy()).call(func, *args, **kwargs))
 
     return inner
 
@@ -327,13 +429,23 @@ def write_json(path, info):
         json.dump(info, f_tips_json, indent=4, ensure_ascii=False)
 
 
-def cutting_upload(upload_path, max_resources_number=None, after_cutting_position=None):
+def cutting_upload(upload_path, max_resources_number=None, after_cutting_position=None, by_size=False,
+                   pool_size=10, stat_workers=32):
     """Cut upload.json according to the number of custom files.
 
+    The manifest is streamed with ``manifest.iter_asset``, only the first
+    chunk is held in memory. With ``by_size`` the files are packed by total
+    bytes instead, so the chunks uploaded in parallel by
+    ``thread_pool_upload`` finish at about the same time.
+
     Args:
         upload_path (str): upload.json absolute path.
         max_resources_number (int): Maximum number of resources in each upload file.
         after_cutting_position (str): save location of upload file generated after cutting.
+        by_size (bool): Balance the chunks by the size of their files.
+        pool_size (int): Number of parallel uploads, with ``by_size`` the
+            number of chunks is a multiple of it.
+        stat_workers (int): Number of threads reading the file sizes.
 
     Returns:
         list: Absolute path of all upload files generated after cutting, excluding original upload files.
@@ -344,28 +456,212 @@ def cutting_upload(upload_path, max_resources_number=None, after_cutting_positio
     """
     if not os.path.exists(upload_path):
         raise RayvisionError(200001, "upload file is not exist: {}".format(upload_path))
-    if max_resources_number is None:
+    if max_resources_number is None and not by_size:
         return [upload_path]
     if after_cutting_position is None or not os.path.exists(after_cutting_position):
         after_cutting_position = os.path.dirname(upload_path)
 
-    upload_info = json_load(upload_path)
-    asset = upload_info.get("asset", [])
-    if max_resources_number >= len(asset):
-        return [upload_path]
-    count = 1
+    def chunk_path(count):
+        """Get the path of a chunk."""
+        return os.path.normpath(os.path.join(after_cutting_position, "upload_{}.json".format(str(count))))
+
+    if by_size:
+        return _cut_by_size(upload_path, chunk_path, pool_size, max_resources_number, stat_workers)
+
+    # The first chunk is kept in memory until the manifest proves to be
+    # longer, a manifest that fits in one chunk is not copied.
+    first_chunk = []
     cut_json_pool = []
-    for per_index in range(0, len(asset) + 1, max_resources_number):
-        if per_index == 0:
-            cut_per_info = asset[0:max_resources_number]
-        else:
-            cut_per_info = asset[per_index:per_index + max_resources_number]
-        cut_info = {"asset": cut_per_info}
-        to_path = os.path.normpath(os.path.join(after_cutting_position, "upload_{}.json".format(str(count))))
-        write_json(to_path, cut_info)
-        count += 1
-        cut_json_pool.append(to_path)
-    return cut_json_pool
+    writer = None
+    try:
+        for item in iter_asset(upload_path):
+            if writer is None and len(first_chunk) < max_resources_number:
+                first_chunk.append(item)
+                continue
+            if writer is None:
+                with AssetWriter(chunk_path(1)) as first_writer:
+                    for first_item in first_chunk:
+                        first_writer.write(first_item)
+                cut_json_pool.append(first_writer.path)
+                first_chunk = None
+            if writer is None or writer.count >= max_resources_number:
+                if writer is not None:
+                    writer.close()
+                writer = AssetWriter(chunk_path(len(cut_json_pool) + 1))
+                cut_json_pool.append(writer.path)
+            writer.write(item)
+    finally:
+        if writer is not None:
+            writer.close()
+    return cut_json_pool or [upload_path]
+
+
+def _file_size(path):
+    """Get the size of a file, 0 if it cannot be read."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _item_size(item):
+    """Get the size of an upload.json file, the one attached by the pre-flight first."""
+    if "size" in item:
+        return item["size"]
+    return _file_size(item["local"])
+
+
+def _stat_sizes(asset, stat_workers=32, batch_size=4096):
+    """Get the sizes of the files on a thread pool, a batch at a time."""
+    sizes = array.array("q")
+    with ThreadPoolExecutor(max(1, stat_workers)) as executor:
+        batch = []
+        for item in asset:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                sizes.extend(executor.map(_item_size, batch))
+                batch = []
+        sizes.extend(executor.map(_item_size, batch))
+    return sizes
+
+
+def _chunk_count(file_count, pool_size, max_resources_number=None):
+    """Get the number of balanced chunks, a multiple of the pool size."""
+    pool_size = max(1, int(pool_size))
+    chunk_count = pool_size
+    if max_resources_number:
+        needed = -(-file_count // max_resources_number)
+        chunk_count = pool_size * -(-needed // pool_size)
+    return min(chunk_count, file_count)
+
+
+def _assign_by_size(sizes, chunk_count, max_resources_number=None):
+    """Assign every file to a chunk, longest processing time first.
+
+    The files are sorted from the largest and each one goes to the chunk
+    with the fewest bytes so far.
+
+    Returns:
+        array.array: Chunk index of every file.
+
+    """
+    assignment = array.array("i", [0]) * len(sizes)
+    # Ties on bytes, e.g. unreadable files, go to the chunk with fewer files.
+    heap = [(0, 0, index) for index in range(chunk_count)]
+    for position in sorted(range(len(sizes)), key=sizes.__getitem__, reverse=True):
+        total, count, index = heapq.heappop(heap)
+        assignment[position] = index
+        # A full chunk leaves the heap, there is always room left elsewhere.
+        if not max_resources_number or count + 1 < max_resources_number:
+            heapq.heappush(heap, (total + sizes[position], count + 1, index))
+    return assignment
+
+
+def balance_by_size(asset, pool_size=10, max_resources_number=None, stat_workers=32):
+    """Pack the files of an upload.json into chunks of about the same size.
+
+    Args:
+        asset (list of dict): Files of the upload.json.
+        pool_size (int): Number of parallel uploads, the number of chunks is
+            a multiple of it.
+        max_resources_number (int, optional): Maximum number of files in
+            each chunk.
+        stat_workers (int): Number of threads reading the file sizes.
+
+    Returns:
+        list of list: Files of every chunk.
+
+    """
+    chunk_count = _chunk_count(len(asset), pool_size, max_resources_number)
+    if not chunk_count:
+        return []
+    sizes = _stat_sizes(asset, stat_workers)
+    chunks = [[] for _ in range(chunk_count)]
+    for item, index in zip(asset, _assign_by_size(sizes, chunk_count, max_resources_number)):
+        chunks[index].append(item)
+    return chunks
+
+
+def _cut_by_size(upload_path, chunk_path, pool_size, max_resources_number, stat_workers):
+    """Cut an upload.json into chunks balanced by size, in two streaming passes."""
+    sizes = _stat_sizes(iter_asset(upload_path), stat_workers)
+    chunk_count = _chunk_count(len(sizes), pool_size, max_resources_number)
+    if chunk_count <= 1:
+        return [upload_path]
+    assignment = _assign_by_size(sizes, chunk_count, max_resources_number)
+    writers = [AssetWriter(chunk_path(index + 1)) for index in range(chunk_count)]
+    try:
+        for position, item in enumerate(iter_asset(upload_path)):
+            writers[assignment[position]].write(item)
+    finally:
+        for writer in writers:
+            writer.close()
+    return [writer.path for writer in writers]
+
+
+def normalize_local_path(path):
+    """Normalize a local path so the transmitter and upload.json paths compare."""
+    return os.path.normcase(path.replace("\\", "/"))
+
+
+def replace_file(src, dst):
+    """Move a file over another one.
+
+    ``os.replace`` is Python 3 only, on Python 2 the target is removed
+    first, so it is missing for a moment.
+
+    Args:
+        src (str): Path of the new file.
+        dst (str): Path of the replaced file.
+
+    """
+    if sys.version_info[0] == 2:
+        if os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+    else:
+        os.replace(src, dst)
+
+
+def retry_upload_json(upload_path, done_paths, to_path=None):
+    """Write an upload.json holding the files of an upload not done yet.
+
+    The files an aborted transfer never reached are neither done nor failed,
+    they are kept with the failed ones. The whole upload.json is read and
+    written again.
+
+    Args:
+        upload_path (str): upload.json absolute path.
+        done_paths (iterable of str): Local paths of the uploaded files.
+        to_path (str, optional): Path of the new upload.json, default is
+            "<name>_retry.json" next to ``upload_path``.
+
+    Returns:
+        str: Path of the new upload.json, None if no file of ``upload_path``
+            is done, or all of them: ``upload_path`` is uploaded again.
+
+    """
+    done = set(normalize_local_path(path) for path in done_paths)
+    if not done:
+        return None
+    if to_path is None:
+        name = os.path.splitext(os.path.basename(upload_path))[0]
+        if not name.endswith("_retry"):
+            name += "_retry"
+        to_path = os.path.join(os.path.dirname(upload_path), "%s.json" % name)
+    # ``to_path`` may be ``upload_path`` itself, it is replaced once written.
+    temp_path = "%s.tmp" % to_path
+    total = 0
+    with AssetWriter(temp_path) as writer:
+        for item in iter_asset(upload_path):
+            total += 1
+            if normalize_local_path(item["local"]) not in done:
+                writer.write(item)
+    if not writer.count or writer.count == total:
+        os.remove(temp_path)
+        return None
+    replace_file(temp_path, to_path)
+    return to_path
 
 
 def insert_redis(path, redis_db, redis_flag=None):